@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+# CSCI 384
+# usage: ./benchmarks/assembly.py [-h] [--timeout SECONDS] [paths ...]
+
+"""
+Compares the nested and the shared assembly of the main clause: for every
+program, the reduction steps, the size of the initial term counted as a
+tree and as a graph of distinct nodes, its length as sml source and in the
+compact encoding, the peak term size along the de Bruijn reduction, and
+the seconds the de Bruijn and the named reducers take. Exits with status
+1 if the two assemblies reduce any program to different normal forms.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_ROOT))
+
+import codec  # noqa: E402
+import debruijn  # noqa: E402
+import profiler  # noqa: E402
+import reducer  # noqa: E402
+from budget import Budget, LimitExceeded, term_size  # noqa: E402
+from parser import ASTBase, Abstraction, Application, Definition, ASSEMBLIES  # noqa: E402
+
+
+def graph_size(t: ASTBase) -> int:
+    """ the number of distinct nodes of a term, counting shared subterms once """
+    seen = set()
+    pending = [t]
+    while pending:
+        node = pending.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        if isinstance(node, Abstraction):
+            pending.append(node.body)
+        elif isinstance(node, Application):
+            pending.append(node.applier)
+            pending.append(node.appliee)
+    return len(seen)
+
+
+def _timed(engine, t: ASTBase, timeout: float) -> Optional[float]:
+    """ the seconds a reduction takes, None if it takes longer than timeout """
+    start = time.perf_counter()
+    try:
+        engine(t, budget=Budget(timeout=timeout))
+    except LimitExceeded:
+        return None
+    return time.perf_counter() - start
+
+
+def measure(src: str, assembly: str, timeout: float) -> Dict[str, object]:
+    """ measure the reduction of a program in one assembly
+
+    :param src: the program src
+    :param assembly: how the main clause is assembled
+    :param timeout: seconds a reduction may take
+    :return: the measurements by name, and the normal form as `result`
+    """
+    df = Definition(src, assembly=assembly)
+    df.parse()
+    main = df.formatted_main
+    profile = profiler.profile(df, Budget(timeout=timeout))
+    return {
+        'steps': profile.steps if profile.limit is None else None,
+        'tree': term_size(main),
+        'graph': graph_size(main),
+        'sml chars': len(str(main)),
+        'compact chars': len(codec.encode(main)),
+        'peak': profile.peak_size,
+        'debruijn s': _timed(debruijn.reduce, main, timeout),
+        'python s': _timed(reducer.reduce, main, timeout),
+        'result': None if profile.limit is not None else debruijn.from_named(profile.term),
+    }
+
+
+def _format(value: object) -> str:
+    if value is None:
+        return 'timeout'
+    return f'{value:.4f}' if isinstance(value, float) else str(value)
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('paths', nargs='*', type=Path, default=[_ROOT / 'examples'],
+                            help='lc files or folders of them (default: examples/)')
+    arg_parser.add_argument('--timeout', type=float, default=10, help='seconds a reduction may take (default: 10)')
+    args = arg_parser.parse_args()
+
+    programs: Dict[str, str] = {}
+    for path in args.paths:
+        for file in sorted(path.glob('*.lc')) if path.is_dir() else [path]:
+            programs[file.name] = file.read_text()
+
+    columns: List[str] = ['steps', 'tree', 'graph', 'sml chars', 'compact chars', 'peak', 'debruijn s', 'python s']
+    print(f'{"program":<18} {"assembly":<8} ' + ' '.join(f'{c:>13}' for c in columns))
+    failed = 0
+    for name, src in programs.items():
+        results = {assembly: measure(src, assembly, args.timeout) for assembly in ASSEMBLIES}
+        for assembly, result in results.items():
+            print(f'{name:<18} {assembly:<8} ' + ' '.join(f'{_format(result[c]):>13}' for c in columns))
+        normal_forms = [r['result'] for r in results.values()]
+        if None not in normal_forms and not all(debruijn.equal(normal_forms[0], r) for r in normal_forms[1:]):
+            print(f'{name}: the assemblies reduce to different normal forms')
+            failed += 1
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+# CSCI 384
+# usage: ./benchmarks/check.py [-h] [checks ...]
+
+"""
+Runs the checks of the benchmarks folder, the regression tests of the
+reducers: native numerals, readback, the optimizer, the assemblies, the
+in-process engines against the de Bruijn reducer, and the start-up
+imports. Each runs in its own interpreter on examples/ and its own
+cases; prints whether each passed and the seconds it took, and the
+output of those that failed. Exits with status 1 if any failed.
+"""
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+_BENCHMARKS = Path(__file__).resolve().parent
+
+# name: the script, each exiting with status 1 on a mismatch
+_CHECKS: Dict[str, str] = {
+    'native': 'native_check.py',
+    'readback': 'readback_check.py',
+    'optimizer': 'optimizer.py',
+    'assembly': 'assembly.py',
+    'engines': 'engine_check.py',
+    'startup': 'startup.py',
+}
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('checks', nargs='*', help=f'checks to run, of {", ".join(_CHECKS)} (default: all)')
+    checks: List[str] = arg_parser.parse_args().checks or list(_CHECKS)
+    unknown = [name for name in checks if name not in _CHECKS]
+    if unknown:
+        arg_parser.error(f'unknown checks: {", ".join(unknown)}')
+
+    failed = []
+    for name in checks:
+        start = time.perf_counter()
+        run = subprocess.run([sys.executable, str(_BENCHMARKS / _CHECKS[name])], capture_output=True, text=True)
+        seconds = time.perf_counter() - start
+        print(f'{name:<10} {"passed" if run.returncode == 0 else "FAILED":<6} {seconds:>8.2f}s', flush=True)
+        if run.returncode != 0:
+            failed.append(name)
+            print(run.stdout + run.stderr)
+
+    if failed:
+        print(f'{len(failed)} check(s) failed: {", ".join(failed)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
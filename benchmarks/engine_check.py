@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# CSCI 384
+# usage: ./benchmarks/engine_check.py [-h] [--engines ENGINE [ENGINE ...]] [--timeout SECONDS] [paths ...]
+
+"""
+Checks the in-process reducers against the de Bruijn one: every program
+is reduced by each engine, and its normal form must be alpha equivalent
+to the de Bruijn reducer's, the free names in it kept apart from the
+bound ones. Besides the given *.lc files or folders, a few programs with
+free names (a name left free under a binder, an undefined definition
+applied, a free name a binder's name must be kept apart from) and a term
+without a normal form, which every engine must stop at the step limit,
+are checked too. A reduction running past the timeout, as the named
+python reducer does on the larger examples, is shown and not compared.
+Exits with status 1 on any mismatch.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import debruijn  # noqa: E402
+import lc  # noqa: E402
+from budget import Budget, LimitExceeded  # noqa: E402
+from parser import Definition  # noqa: E402
+
+_CASES: Dict[str, str] = {
+    'free under a binder': 'main := fn x => foo x;',
+    'undefined definition': 'main := fact 1;',
+    'free name like a binder': 'main := (fn x => fn y => x y) y;',
+    'free name copied': 'main := (fn f => f (f foo)) (fn y => pair y y);',
+    'no normal form': 'main := (fn x => x x) (fn x => x x);',
+}
+
+# steps after which a reduction is taken not to end
+_MAX_STEPS = 100000
+
+# a reduction cut off by the step limit, or running past the timeout
+_CUT_OFF = 'cut off'
+_TIMED_OUT = 'timeout'
+
+
+def reduce(src: str, engine: str, timeout: float) -> Tuple[Optional[debruijn.Term], str, float]:
+    """ reduce a program
+
+    :param src: the program src
+    :param engine: one of the in-process reducers
+    :param timeout: the seconds the reduction may take
+    :return: the nameless normal form, None if the reduction was stopped, the steps taken or
+             why it was stopped, and the seconds taken
+    """
+    df = Definition(src)
+    df.parse()
+    start = time.perf_counter()
+    try:
+        result, steps = lc._PYTHON_ENGINES[engine](df.formatted_main, budget=Budget(_MAX_STEPS, timeout=timeout))
+    except LimitExceeded as e:
+        return None, _TIMED_OUT if e.limit == 'timeout' else _CUT_OFF, time.perf_counter() - start
+    return debruijn.from_named(result), str(steps), time.perf_counter() - start
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('paths', nargs='*', type=Path,
+                            default=[Path(__file__).resolve().parent.parent / 'examples'],
+                            help='lc files or folders of them (default: examples/)')
+    arg_parser.add_argument('--engines', nargs='+', choices=[e for e in lc._PYTHON_ENGINES if e != 'debruijn'],
+                            default=['python', 'lazy', 'nbe'],
+                            help='reducers checked against the de Bruijn one (default: python lazy nbe)')
+    arg_parser.add_argument('--timeout', type=float, default=10, help='seconds a reduction may take (default: 10)')
+    args = arg_parser.parse_args()
+
+    programs = dict(_CASES)
+    for path in args.paths:
+        for file in sorted(path.glob('*.lc')) if path.is_dir() else [path]:
+            programs[file.name] = file.read_text()
+
+    failed = 0
+    print(f'{"program":<26} {"engine":<9} {"steps":>8} {"debruijn":>9} {"s":>8}  same')
+    for name, src in programs.items():
+        expected, expected_steps, _ = reduce(src, 'debruijn', args.timeout)
+        for engine in args.engines:
+            result, steps, seconds = reduce(src, engine, args.timeout)
+            if _TIMED_OUT in (steps, expected_steps):
+                same = None
+            elif result is None or expected is None:
+                # both cut off, as a term without a normal form must be
+                same = result is None and expected is None
+            else:
+                same = debruijn.equal(result, expected)
+            failed += same is False
+            print(f'{name:<26} {engine:<9} {steps:>8} {expected_steps:>9} {seconds:>8.4f}  '
+                  f'{"-" if same is None else same}')
+
+    if failed:
+        print(f'{failed} reduction(s) differ from the de Bruijn reducer')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
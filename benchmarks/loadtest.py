@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+# CSCI 384
+# usage: ./benchmarks/loadtest.py [-h] [--address ADDRESS] [--jobs N] [--clients N] [--requests N]
+#                                 [--engine ENGINE] [--timeout SECONDS] [programs ...]
+
+"""
+Load tests the evaluation server: a number of clients, each on its own
+connection, send requests one after another, cycling through a mix of
+small programs, and the latency of every request is measured from the
+client. Prints the throughput and the p50, p90, p99 and max latency, and
+the requests that failed. The server is started on a unix socket for the
+test unless the address of a running one is given.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_ROOT))
+
+import server  # noqa: E402
+
+_PROGRAMS = [
+    'main := plus 3 2;',
+    'main := times 3 4;',
+    'main := pred 7;',
+    'main := less 7 10;',
+    'main := equal 7 4;',
+    'main := pair (div2 8) (is_zero 0);',
+    'main := fibbit 6;',
+    'main := gcd 18 15;',
+]
+
+
+def percentile(latencies: List[float], p: float) -> float:
+    """ the latency p percent of the requests took at most, nearest rank
+
+    :param latencies: the latencies, sorted
+    :param p: the percentage
+    :return: the latency
+    """
+    return latencies[min(len(latencies) - 1, max(0, int(len(latencies) * p / 100 + 0.5) - 1))]
+
+
+def start_server(address: str, jobs: Optional[int]) -> subprocess.Popen:
+    """ start lc.py --serve and wait until it accepts connections """
+    command = [sys.executable, str(_ROOT / 'lc.py'), '--serve', address]
+    if jobs is not None:
+        command += ['-j', str(jobs)]
+    process = subprocess.Popen(command, cwd=_ROOT, stdout=subprocess.DEVNULL)
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('the server exited')
+        try:
+            server.Client(address).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('the server did not start')
+
+
+def run_client(address: str, programs: List[str], requests: int, offset: int, options: dict,
+               latencies: List[float], failures: List[str]) -> None:
+    """ send requests one after another, recording their latencies and failures """
+    with server.Client(address) as client:
+        for i in range(requests):
+            src = programs[(offset + i) % len(programs)]
+            start = time.perf_counter()
+            response = client.request(src, **options)
+            latencies.append(time.perf_counter() - start)
+            if 'error' in response or 'limit' in response:
+                failures.append(f'{src}: {response.get("error") or response.get("limit")}')
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('programs', nargs='*', type=Path,
+                            help='lc files to send (default: a mix of small programs)')
+    arg_parser.add_argument('--address', default=None,
+                            help='HOST:PORT or unix socket of a running server (default: start one)')
+    arg_parser.add_argument('--jobs', type=int, default=None, help='worker processes of the server started')
+    arg_parser.add_argument('--clients', type=int, default=8, help='concurrent connections (default: 8)')
+    arg_parser.add_argument('--requests', type=int, default=200, help='requests per client (default: 200)')
+    arg_parser.add_argument('--engine', default='lazy', help='engine of the requests (default: lazy)')
+    arg_parser.add_argument('--timeout', type=float, default=10, help='seconds a reduction may take (default: 10)')
+    args = arg_parser.parse_args()
+
+    programs = [p.read_text() for p in args.programs] or _PROGRAMS
+    options = {'engine': args.engine, 'timeout': args.timeout}
+
+    process = None
+    address = args.address
+    with tempfile.TemporaryDirectory() as tmp:
+        if address is None:
+            address = os.path.join(tmp, 'lc.sock')
+            process = start_server(address, args.jobs)
+        try:
+            latencies: List[float] = []
+            failures: List[str] = []
+            clients = [threading.Thread(target=run_client,
+                                        args=(address, programs, args.requests, i, options, latencies, failures))
+                       for i in range(args.clients)]
+            start = time.perf_counter()
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    latencies.sort()
+    print(f'{len(latencies)} requests from {args.clients} clients in {elapsed:.3f}s, '
+          f'{len(latencies) / elapsed:.1f} requests/s')
+    for name, p in (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100)):
+        print(f'{name}: {percentile(latencies, p) * 1000:9.3f} ms')
+    if failures:
+        print(f'{len(failures)} failed, as {failures[0]}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
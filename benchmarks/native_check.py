@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+# CSCI 384
+# usage: ./benchmarks/native_check.py [-h] [paths ...]
+
+"""
+Checks native numeral mode against the pure lambda terms: every program
+is reduced by the lazy reducer in both modes, and the two normal forms
+must be alpha equivalent. Besides the given *.lc files or folders, a few
+programs exercising the fallbacks (a numeral used as a function, a
+partially applied primitive, a primitive given a hand-written church
+numeral, a redefined helper of a primitive, a primitive not using an
+argument without a normal form, or not getting to it as its second
+argument is no numeral) are checked too. A reduction is cut off
+after a step limit, so a mode stricter than the other fails rather than
+diverges. Exits with status 1 on any mismatch.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import debruijn  # noqa: E402
+import lazy  # noqa: E402
+from budget import Budget, LimitExceeded  # noqa: E402
+from parser import Definition  # noqa: E402
+
+_FALLBACKS: Dict[str, str] = {
+    'numeral as function': 'main := 3 (fn x => pair x x) zero;',
+    'partial primitive': 'twice := fn f => fn x => f (f x); main := twice (plus 2) 3;',
+    'church numeral argument': 'main := times (fn f => fn a => f (f a)) 3;',
+    'mixed arguments': 'main := equal (minus 5 (fn f => fn a => f a)) 4;',
+    'equal zero zero': 'main := equal 0 0;',
+    'boolean results': 'main := if (less 2 3) (pred 0) (div2 9);',
+    'redefined primitive': 'succ := fn n => n; main := plus 2 3;',
+    'redefined helper': 'pair := fn t => fn e => fn c => c e t; main := pred 3;',
+    'times diverging 0': 'main := times (Y (fn x => x)) 0;',
+    'power diverging 0': 'main := power (Y (fn x => x)) 0;',
+    'second not a numeral': 'main := plus (Y (fn x => x)) (fn s => fn z => s);',
+}
+
+# steps after which a reduction is taken not to end
+_MAX_STEPS = 1000000
+
+
+def reduce(src: str, native_numerals: bool) -> Tuple[Optional[debruijn.Term], int, float]:
+    """ reduce a program with the lazy reducer
+
+    :param src: the program src
+    :param native_numerals: reduce in native numeral mode
+    :return: the nameless normal form, None if the step limit was reached, the step count
+             and the seconds taken
+    """
+    df = Definition(src, native_numerals)
+    df.parse()
+    start = time.perf_counter()
+    budget = Budget(_MAX_STEPS)
+    try:
+        if native_numerals:
+            result, steps = lazy.reduce(df.formatted_main, False, df.supporting_defs, df.primitives, budget)
+        else:
+            result, steps = lazy.reduce(df.formatted_main, budget=budget)
+    except LimitExceeded as e:
+        return None, e.steps, time.perf_counter() - start
+    return debruijn.from_named(result), steps, time.perf_counter() - start
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('paths', nargs='*', type=Path,
+                            default=[Path(__file__).resolve().parent.parent / 'examples'],
+                            help='lc files or folders of them (default: examples/)')
+    paths: List[Path] = arg_parser.parse_args().paths
+
+    programs = dict(_FALLBACKS)
+    for path in paths:
+        for file in sorted(path.glob('*.lc')) if path.is_dir() else [path]:
+            programs[file.name] = file.read_text()
+
+    failed = 0
+    print(f'{"program":<26} {"pure steps":>11} {"native steps":>13} {"pure s":>9} {"native s":>9}  same')
+    for name, src in programs.items():
+        pure, pure_steps, pure_time = reduce(src, False)
+        native, native_steps, native_time = reduce(src, True)
+        same = pure is not None and native is not None and debruijn.equal(pure, native)
+        failed += not same
+        print(f'{name:<26} {pure_steps:>11} {native_steps:>13} {pure_time:>9.4f} {native_time:>9.4f}  {same}')
+
+    if failed:
+        print(f'{failed} program(s) differ')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+# CSCI 384
+# usage: ./benchmarks/optimizer.py [-h] [--engines ENGINE [ENGINE ...]] [paths ...]
+
+"""
+Checks the optimizer against the programs as written: every program is
+reduced by each engine with and without optimizing its main clause, the
+two normal forms must be alpha equivalent, and optimizing must not add
+steps. Prints the steps taken either way, the assembled term sizes and
+the seconds the reduction and the optimizer took. Besides the given
+*.lc files or folders, a few programs exercising the cases the optimizer
+must leave alone (recursion through Y, definitions using later ones, a
+definition used once inside a function applied several times, a term
+without a normal form cut off by a step limit, native numerals) are
+checked too. Exits with status 1 on any mismatch.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import debruijn  # noqa: E402
+import lazy  # noqa: E402
+import lc  # noqa: E402
+from budget import Budget, LimitExceeded  # noqa: E402
+from parser import Definition  # noqa: E402
+
+_CASES: Dict[str, str] = {
+    'recursion through Y': 'main := fibrec 5;',
+    'later definitions': 'main := twice inc 1; twice := fn f => fn x => f (f x); inc := fn n => succ n;',
+    'partial application': 'main := map2 (plus 2) 3; map2 := fn f => fn x => f (f x);',
+    'unused argument': 'main := (fn x => fn y => y) (Y (fn f => f)) 4;',
+    'shared argument': 'main := (fn x => pair x x) (plus 2 3);',
+    'no normal form': 'main := (fn x => x x) (fn x => x x);',
+    'used once under a binder': 'main := thrice (fn x => plus x k) 1; k := fibrec 5; '
+                                'thrice := fn f => fn y => f (f (f y));',
+}
+
+# reductions of programs without a normal form are cut off here, with and without optimizing
+_MAX_STEPS = 100000
+
+
+def reduce(src: str, engine: str, optimize: bool,
+           native_numerals: bool = False) -> Tuple[Optional[debruijn.Term], int, int, float, float]:
+    """ reduce a program
+
+    :param src: the program src
+    :param engine: one of the in-process reducers
+    :param optimize: optimize the main clause first
+    :param native_numerals: reduce in native numeral mode, with the lazy reducer
+    :return: the nameless normal form, None if the step limit was reached, the step count,
+             the size of the main clause reduced, and the seconds optimizing and reducing took
+    """
+    df = Definition(src, native_numerals, entry='main', optimize=optimize)
+    df.parse()
+    start = time.perf_counter()
+    main = df.formatted_main
+    assembled = time.perf_counter()
+    budget = Budget(_MAX_STEPS)
+    try:
+        if native_numerals:
+            result, steps = lazy.reduce(main, False, df.supporting_defs, df.primitives, budget)
+        else:
+            result, steps = lc._PYTHON_ENGINES[engine](main, budget=budget)
+    except LimitExceeded as e:
+        return None, e.steps, debruijn.size(debruijn.from_named(main)), assembled - start, \
+            time.perf_counter() - assembled
+    return debruijn.from_named(result), steps, debruijn.size(debruijn.from_named(main)), assembled - start, \
+        time.perf_counter() - assembled
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('paths', nargs='*', type=Path,
+                            default=[Path(__file__).resolve().parent.parent / 'examples'],
+                            help='lc files or folders of them (default: examples/)')
+    arg_parser.add_argument('--engines', nargs='+', choices=list(lc._PYTHON_ENGINES),
+                            default=['debruijn', 'lazy', 'nbe'],
+                            help='reducers the programs are run on (default: debruijn lazy nbe)')
+    args = arg_parser.parse_args()
+
+    programs = dict(_CASES)
+    for path in args.paths:
+        for file in sorted(path.glob('*.lc')) if path.is_dir() else [path]:
+            programs[file.name] = file.read_text()
+
+    runs: List[Tuple[str, str, bool]] = [(name, engine, False) for engine in args.engines for name in programs]
+    runs += [(name, 'lazy', True) for name in programs]
+
+    failed = 0
+    totals: Dict[str, List[int]] = {}
+    print(f'{"program":<26} {"engine":<11} {"steps":>8} {"optimized":>10} {"size":>6} {"optimized":>10} '
+          f'{"opt s":>7} {"reduce s":>9} {"optimized":>10}  same')
+    for name, engine, native in runs:
+        label = f'{engine} native' if native else engine
+        plain, plain_steps, plain_size, _, plain_time = reduce(programs[name], engine, False, native)
+        optimized, steps, optimized_size, opt_time, optimized_time = reduce(programs[name], engine, True, native)
+        if plain is None or optimized is None:
+            # both cut off, as a term without a normal form must be
+            same = plain is None and optimized is None
+        else:
+            same = debruijn.equal(plain, optimized)
+        # a copy of work inlined under an abstraction would be taken again on every application
+        failed += not same or steps > plain_steps
+        if plain is not None:
+            total = totals.setdefault(label, [0, 0])
+            total[0] += plain_steps
+            total[1] += steps
+        print(f'{name:<26} {label:<11} {plain_steps:>8} {steps:>10} {plain_size:>6} {optimized_size:>10} '
+              f'{opt_time:>7.4f} {plain_time:>9.4f} {optimized_time:>10.4f}  {same}')
+
+    print()
+    for label, (plain_steps, steps) in totals.items():
+        print(f'{label:<11} {plain_steps:>7} steps as written, {steps:>7} optimized, '
+              f'{100 * (plain_steps - steps) / max(plain_steps, 1):.1f}% fewer')
+
+    if failed:
+        print(f'{failed} reduction(s) differ or take more steps optimized')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+# CSCI 384
+# usage: ./benchmarks/parser_scaling.py [-h] [--sizes N [N ...]]
+
+"""
+Times tokenizing, parsing, tree shaking and serializing generated programs
+of growing size, to show each pass is linear: the time per unit (per
+definition, per nesting level, per literal) should stay flat as the sizes
+grow into the tens of thousands, and nothing should hit the recursion limit.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from parser import Definition  # noqa: E402
+from tokenizer import TokenStream  # noqa: E402
+
+
+def definition_chain(n: int) -> str:
+    """ n definitions, each using the previous one, so all of them are shaken in """
+    lines = ['d0 := fn x => x;']
+    lines += [f'd{i} := fn x => d{i - 1} x;' for i in range(1, n)]
+    lines.append(f'main := d{n - 1};')
+    return '\n'.join(lines)
+
+
+def nested_abstractions(n: int) -> str:
+    """ a main clause of n nested abstractions """
+    return 'main := ' + ''.join(f'fn x{i} => ' for i in range(n)) + 'x0;'
+
+
+def nested_parentheses(n: int) -> str:
+    """ a main clause of n nested, parenthesized applications """
+    return 'main := ' + 'f (' * n + 'x' + ')' * n + ';'
+
+
+def integer_literal(n: int) -> str:
+    """ a main clause of an integer literal n """
+    return f'main := {n};'
+
+
+_SHAPES: Dict[str, Callable[[int], str]] = {
+    'definitions': definition_chain,
+    'abstractions': nested_abstractions,
+    'parentheses': nested_parentheses,
+    'literal': integer_literal,
+}
+
+
+def measure(src: str) -> Dict[str, float]:
+    """ time every pass over a program
+
+    :param src: the program src
+    :return: seconds taken by each pass
+    """
+    timings = {}
+    start = time.perf_counter()
+    TokenStream(src)
+    timings['tokenize'] = time.perf_counter() - start
+
+    df = Definition(src)
+    start = time.perf_counter()
+    df.parse()
+    timings['parse+shake'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    main = df.formatted_main
+    timings['assemble'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    str(main)
+    timings['serialize'] = time.perf_counter() - start
+    return timings
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 5000, 10000, 20000, 40000],
+                            help='sizes of the generated programs')
+    sizes: List[int] = arg_parser.parse_args().sizes
+
+    Definition('main := zero;').parse()  # load the prelude up front
+    for shape, generate in _SHAPES.items():
+        print(f'{shape}:')
+        print(f'{"size":>8} ' + ' '.join(f'{p + " us/unit":>20}' for p in
+                                         ('tokenize', 'parse+shake', 'assemble', 'serialize')))
+        for n in sizes:
+            timings = measure(generate(n))
+            print(f'{n:>8} ' + ' '.join(f'{t / n * 1e6:>20.2f}' for t in timings.values()))
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+# CSCI 384
+# usage: ./benchmarks/readback_check.py [-h] [paths ...]
+
+"""
+Checks that the normal forms sml prints are read back: every program is
+reduced by the lazy reducer, its normal form written out as sml term
+datatype source, both as serialize writes it and spaced out and broken
+over lines as sml/nj prints it, `LM ("f",AP (VA "f",VA "a"))`, and each
+must parse back to a term with the value the normal form itself has.
+Besides the given *.lc files or folders, a few programs whose values
+are known are checked to read back as them, pairs of terms that encode
+no value printed as their terms. Exits with status 1 on any mismatch.
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import lazy  # noqa: E402
+import readback  # noqa: E402
+from parser import ASTBase, Definition, serialize  # noqa: E402
+
+# programs and the values they read back as, `term` for a normal form that encodes none
+_CASES: Dict[str, Tuple[str, str]] = {
+    'pair of values': ('main := pair (pair 1 2) false;', '((1, 2), false)'),
+    'pair of a function': ('main := pair (fn x => x) 2;', 'term'),
+    'nested pair of a function': ('main := pair (pair 1 (fn x => x)) 3;', 'term'),
+}
+
+
+def spaced(text: str) -> str:
+    """ a term's source as sml/nj prints it, a space before every parenthesis and quote, wrapped at commas """
+    text = re.sub(r'(AP|LM)\(', r'\1 (', text).replace('VA"', 'VA "')
+    return re.sub(r'(,)(?=AP|LM)', ',\n  ', text)
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('paths', nargs='*', type=Path,
+                            default=[Path(__file__).resolve().parent.parent / 'examples'],
+                            help='lc files or folders of them (default: examples/)')
+    paths: List[Path] = arg_parser.parse_args().paths
+
+    # the values of the files are not known, only that they must read back the same
+    programs: Dict[str, Tuple[str, Optional[str]]] = dict(_CASES)
+    for path in paths:
+        for file in sorted(path.glob('*.lc')) if path.is_dir() else [path]:
+            programs[file.name] = file.read_text(), None
+
+    failed = 0
+    print(f'{"program":<26} {"value":>16}  compact  spaced  known')
+    for name, (src, known) in programs.items():
+        df = Definition(src)
+        df.parse()
+        result, _ = lazy.reduce(df.formatted_main)
+        value = readback.readback(result)
+        expected = readback.show(value)
+        read = []
+        for text in (serialize(result), spaced(serialize(result))):
+            try:
+                read.append(readback.show(readback.readback(readback.parse_term(text))) == expected)
+            except ValueError:
+                read.append(False)
+        shown = 'term' if isinstance(value, ASTBase) else expected
+        right = known is None or shown == known
+        failed += not (all(read) and right)
+        print(f'{name:<26} {shown:>16}  {read[0]!s:>7}  {read[1]!s:>6}  {right!s:>5}')
+
+    if failed:
+        print(f'{failed} program(s) not read back')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
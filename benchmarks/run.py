@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+
+# CSCI 384
+# usage: ./benchmarks/run.py [-h] [--examples DIR] [--engines ENGINE [ENGINE ...]] [--repeat N]
+#                            [--timeout SECONDS] [--no-sweeps] [--save FILE] [--compare FILE]
+#                            [--threshold RATIO] [--floor SECONDS]
+
+"""
+Times every phase, tokenize, parse, tree shake, assemble, serialize and
+reduce, on every program in examples/ and on parametric sweeps (fibrec n,
+gcd a b, power 2 k and integer literals of growing size), taking the best
+of a few runs of each. Reductions are timed per engine, and their step
+counts are recorded too.
+
+The results can be saved as a json baseline and compared against one: a
+phase more than the threshold slower than in the baseline is flagged as
+a regression, and so is any change in a step count, and the runner then
+exits with status 1.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_ROOT))
+
+import debruijn  # noqa: E402
+import lazy  # noqa: E402
+import nbe  # noqa: E402
+import reducer  # noqa: E402
+from budget import Budget, LimitExceeded  # noqa: E402
+from parser import Definition  # noqa: E402
+from tokenizer import TokenStream  # noqa: E402
+
+# the reducers, each taking the parsed definition and a budget and giving the step count
+_ENGINES: Dict[str, Callable[[Definition, Budget], int]] = {
+    'python': lambda df, budget: reducer.reduce(df.formatted_main, budget=budget)[1],
+    'debruijn': lambda df, budget: debruijn.reduce(df.formatted_main, budget=budget)[1],
+    'lazy': lambda df, budget: lazy.reduce(df.formatted_main, budget=budget)[1],
+    'nbe': lambda df, budget: nbe.reduce(df.formatted_main, budget=budget)[1],
+    'native': lambda df, budget: lazy.reduce(df.formatted_main, False, df.supporting_defs, df.primitives,
+                                             budget)[1],
+}
+
+# name, program and the engines it is reduced with
+Case = Tuple[str, str, List[str]]
+
+
+def example_cases(folder: Path, engines: List[str]) -> List[Case]:
+    """ the programs of a folder, reduced with every engine """
+    return [(f'{folder.name}/{p.name}', p.read_text(), engines) for p in sorted(folder.glob('*.lc'))]
+
+
+def sweep_cases() -> List[Case]:
+    """ programs of growing size, reduced with the engines that keep up with them """
+    cases = []
+    for n in (4, 6, 8, 10, 12):
+        cases.append((f'fibrec {n}', f'main := fibrec {n};', ['lazy', 'nbe', 'native']))
+    for a, b in ((18, 15), (36, 30), (72, 60), (144, 120)):
+        cases.append((f'gcd {a} {b}', f'main := gcd {a} {b};', ['lazy', 'nbe', 'native']))
+    for k in (2, 4, 6, 8):
+        cases.append((f'power 2 {k}', f'main := power 2 {k};', ['debruijn', 'lazy', 'nbe', 'native']))
+    for n in (100, 1000, 10000):
+        cases.append((f'literal {n}', f'main := {n};', ['debruijn', 'lazy', 'nbe']))
+    return cases
+
+
+def best_of(repeat: int, fn: Callable[[], object]) -> float:
+    """ the shortest of a few runs of fn in seconds """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _parsed(src: str, native_numerals: bool = False) -> Definition:
+    df = Definition(src, native_numerals)
+    df.parse()
+    return df
+
+
+def _shaken_again(df: Definition) -> None:
+    # the program's part of the dependency index is built again, the prelude's is reused
+    df._index = None
+    df._dependent_tree = None
+    df._tree_shaking()
+
+
+def _assembled_again(df: Definition) -> None:
+    df._main = None
+    df.formatted_main
+
+
+def measure(src: str, engines: List[str], repeat: int, timeout: Optional[float]) -> Dict[str, float]:
+    """ time every phase on a program
+
+    :param src: the program src
+    :param engines: the engines to reduce the program with
+    :param repeat: the number of runs to take the best of
+    :param timeout: seconds a reduction may take, one that takes longer is recorded as None
+    :return: seconds by phase, and `steps:<engine>` step counts
+    """
+    df = _parsed(src)
+    results = {
+        'tokenize': best_of(repeat, lambda: TokenStream(src)),
+        'parse': best_of(repeat, lambda: Definition(src).parse_program(TokenStream(src).cursor())),
+        'tree shake': best_of(repeat, lambda: _shaken_again(df)),
+        'assemble': best_of(repeat, lambda: _assembled_again(df)),
+        'serialize': best_of(repeat, lambda: str(df.formatted_main)),
+    }
+    # the parse is timed with its tokenizing, report it without
+    results['parse'] = max(results['parse'] - results['tokenize'], 0.0)
+
+    for engine in engines:
+        engine_df = _parsed(src, True) if engine == 'native' else df
+        steps = []
+
+        def run() -> None:
+            steps.append(_ENGINES[engine](engine_df, Budget(timeout=timeout)))
+
+        try:
+            results[f'reduce:{engine}'] = best_of(repeat, run)
+            results[f'steps:{engine}'] = steps[-1]
+        except LimitExceeded:
+            results[f'reduce:{engine}'] = None
+            results[f'steps:{engine}'] = None
+    return results
+
+
+def compare(baseline: Dict[str, Dict], results: Dict[str, Dict], threshold: float,
+            floor: float) -> List[str]:
+    """ the regressions of the results against a baseline
+
+    :param baseline: the baseline results by case
+    :param results: the new results by case
+    :param threshold: the slowdown ratio above which a phase regressed
+    :param floor: seconds below which timings are too noisy to compare
+    :return: a description of every regression
+    """
+    regressions = []
+    for case, phases in results.items():
+        old_phases = baseline.get(case, {})
+        for phase, new in phases.items():
+            old = old_phases.get(phase)
+            if phase not in old_phases or old == new:
+                continue
+            if phase.startswith('steps:'):
+                regressions.append(f'{case}: {phase} changed from {old} to {new}')
+            elif new is None:
+                regressions.append(f'{case}: {phase} timed out, took {old:.4f}s in the baseline')
+            elif old is not None and max(old, new) >= floor and new > old * (1 + threshold):
+                regressions.append(f'{case}: {phase} {old:.4f}s -> {new:.4f}s ({new / old - 1:+.0%})')
+    return regressions
+
+
+def _format(value: Optional[float]) -> str:
+    if value is None:
+        return 'timeout'
+    return str(value) if isinstance(value, int) else f'{value * 1e3:.3f}'
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--examples', type=Path, default=_ROOT / 'examples',
+                            help='folder of the lc programs to time (default: examples/)')
+    arg_parser.add_argument('--engines', nargs='+', choices=list(_ENGINES), default=['python', 'debruijn', 'lazy'],
+                            help='engines to reduce the example programs with')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='runs to take the best of (default: 3)')
+    arg_parser.add_argument('--timeout', type=float, default=10,
+                            help='seconds a reduction may take (default: 10)')
+    arg_parser.add_argument('--no-sweeps', action='store_true', help='only time the example programs')
+    arg_parser.add_argument('--save', type=Path, metavar='FILE', help='save the results as a json baseline')
+    arg_parser.add_argument('--compare', type=Path, metavar='FILE', help='compare the results with a json baseline')
+    arg_parser.add_argument('--threshold', type=float, default=0.2,
+                            help='slowdown ratio counted as a regression (default: 0.2)')
+    arg_parser.add_argument('--floor', type=float, default=0.001,
+                            help='seconds below which timings are not compared (default: 0.001)')
+    args = arg_parser.parse_args()
+
+    examples = args.examples.resolve()
+    os.chdir(_ROOT)  # the prelude is read relative to the working directory
+    _parsed('main := zero;')  # load the prelude up front
+
+    cases = example_cases(examples, args.engines)
+    if not args.no_sweeps:
+        cases += sweep_cases()
+
+    results = {}
+    for name, src, engines in cases:
+        results[name] = measure(src, engines, args.repeat, args.timeout)
+        print(f'{name:<22} ' + ' '.join(f'{phase}={_format(value)}' for phase, value in results[name].items()))
+    print('(times in ms)')
+
+    if args.save is not None:
+        with open(args.save, 'w') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'results': results},
+                      f, indent=1)
+        print(f'baseline saved to {args.save}')
+
+    if args.compare is not None:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(baseline, results, args.threshold, args.floor)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print(f'no regressions against {args.compare}')
+
+
+if __name__ == '__main__':
+    main()
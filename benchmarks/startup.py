@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# CSCI 384
+# usage: ./benchmarks/startup.py [-h] [--runs N]
+
+"""
+Measures the start-up cost of the entry points: every scenario runs in
+fresh interpreters started in an empty temporary directory, so the paths
+of fundaments.lc and reducer.sml must not depend on the working directory.
+Prints the median wall time of each scenario, and the import time of the
+modules the repo's modules import, summed from `python -X importtime`,
+the slowest first.
+
+The parse-only and python engine scenarios must neither read reducer.sml
+nor import the sml pool, the process pools or the server; exits with
+status 1 if one of them does.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+_ROOT = Path(__file__).resolve().parent.parent
+
+_SETUP = f'import sys; sys.path.insert(0, {str(_ROOT)!r}); '
+
+# the modules only the sml engine, -j and --serve need
+_CHECK_UNUSED = '''
+import lc
+heavy = sorted({'smlpool', 'server', 'asyncio', 'concurrent.futures.process'} & set(sys.modules))
+assert not heavy, f'imported {heavy}'
+assert lc._sml_interpreter_code is None, 'read reducer.sml'
+'''
+
+# name: (code, whether the sml costs must stay unpaid)
+_SCENARIOS: Dict[str, Tuple[str, bool]] = {
+    'import parser': ('import parser', False),
+    'import lc': ('import lc', True),
+    'parse': ('from parser import Definition; Definition("main := gcd 18 15;").parse()', True),
+    'lazy engine': ('import lc; lc.run_all("main := plus 2 3;", engine="lazy", cached=False)', True),
+    'nbe engine': ('import lc; lc.run_all("main := plus 2 3;", engine="nbe", cached=False)', True),
+    'sml source': ('import lc; lc.sml_interpreter_code()', False),
+}
+
+
+def run(code: str, cwd: str, import_time: bool = False) -> Tuple[float, str]:
+    """ run code in a fresh interpreter
+
+    :param code: python code
+    :param cwd: working directory
+    :param import_time: run with -X importtime
+    :return: the wall time and the stderr of the interpreter
+    :raise RuntimeError: if the interpreter fails
+    """
+    command = [sys.executable] + (['-X', 'importtime'] if import_time else []) + ['-c', _SETUP + code]
+    start = time.perf_counter()
+    process = subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+    return elapsed, process.stderr
+
+
+def top_imports(stderr: str, count: int = 5) -> List[Tuple[str, int]]:
+    """ the modules the repo's modules imported by the code import, with their cumulative import time
+
+    :param stderr: -X importtime output
+    :param count: number of modules kept
+    :return: module names and microseconds, the slowest first
+    """
+    imports = []
+    children: List[Tuple[str, int]] = []
+    # a module is printed after the modules it imports
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 1:
+            children.append((name, int(cumulative)))
+        elif depth == 0:
+            if (_ROOT / f'{name}.py').is_file():
+                imports += [(name, int(cumulative))] + children
+            children = []
+    return sorted(imports, key=lambda i: -i[1])[:count]
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--runs', type=int, default=5, help='interpreters started per scenario (default: 5)')
+    runs: int = arg_parser.parse_args().runs
+
+    failed = 0
+    baseline = statistics.median(run('pass', str(_ROOT))[0] for _ in range(runs))
+    print(f'{"scenario":<16} {"median s":>9} {"over python":>12}  slowest imports (ms)')
+    with tempfile.TemporaryDirectory() as cwd:
+        for name, (code, unused) in _SCENARIOS.items():
+            try:
+                if unused:
+                    run(code + '\n' + _CHECK_UNUSED, cwd)
+                seconds = statistics.median(run(code, cwd)[0] for _ in range(runs))
+                imports = top_imports(run(code, cwd, import_time=True)[1])
+            except RuntimeError as e:
+                failed += 1
+                print(f'{name:<16} failed: {e}')
+                continue
+            slowest = ', '.join(f'{module} {us / 1000:.1f}' for module, us in imports)
+            print(f'{name:<16} {seconds:>9.4f} {seconds - baseline:>12.4f}  {slowest}')
+
+    if failed:
+        print(f'{failed} scenario(s) failed')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
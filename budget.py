@@ -0,0 +1,118 @@
+# CSCI 384 reduction budgets for Lambda Calculus
+
+"""
+Limits on one reduction, so that a diverging term (a misused `Y`, say)
+stops instead of running, and growing, forever: at most `max_steps`
+reduction steps, terms of at most `max_size` nodes, and at most `timeout`
+seconds of wall-clock time. A reducer given a budget asks it once per step
+whether a limit is passed, and raises LimitExceeded with the term it got
+to when one is.
+"""
+from __future__ import annotations
+
+import time
+from typing import Dict, Optional, Union
+
+from parser import ASTBase, Abstraction, Application
+
+_STEPS = 'steps'
+_SIZE = 'size'
+_TIMEOUT = 'timeout'
+
+
+class LimitExceeded(Exception):
+    """ a reduction stopped by its budget """
+
+    def __init__(self, limit: str, steps: Optional[int], term: Optional[Union[ASTBase, str]]) -> None:
+        """ init exception
+
+        :param limit: the limit that fired, `steps`, `size` or `timeout`
+        :param steps: the reduction steps taken before stopping, None if unknown
+        :param term: the term reduced so far, as printed by sml for the sml engine,
+                     None if the reducer cannot give it back
+        """
+        super().__init__(f'{limit} limit reached after {"unknown" if steps is None else steps} reduction steps')
+        self.limit = limit
+        self.steps = steps
+        self.term = term
+
+
+class Budget:
+    """ Budget class
+    The limits of a reduction, None being no limit. The clock starts when
+    the budget is made, or started again.
+    """
+
+    __slots__ = ['max_steps', 'max_size', 'timeout', '_deadline']
+
+    def __init__(self, max_steps: Optional[int] = None, max_size: Optional[int] = None,
+                 timeout: Optional[float] = None) -> None:
+        """ init budget
+
+        :param max_steps: maximum number of reduction steps
+        :param max_size: maximum number of nodes of the term
+        :param timeout: maximum number of seconds
+        """
+        self.max_steps = max_steps
+        self.max_size = max_size
+        self.timeout = timeout
+        self._deadline: Optional[float] = None
+        self.start()
+
+    def start(self) -> Budget:
+        """ restart the clock
+
+        :return: the budget itself
+        """
+        self._deadline = None if self.timeout is None else time.perf_counter() + self.timeout
+        return self
+
+    @property
+    def measures_size(self) -> bool:
+        return self.max_size is not None
+
+    def exceeded(self, steps: int, size: int = 0) -> Optional[str]:
+        """ the first limit passed, if any
+
+        :param steps: the reduction steps taken so far
+        :param size: the size of the term, ignored unless there is a size limit
+        :return: the name of the limit, or None if the reduction may go on
+        """
+        if self.max_steps is not None and steps >= self.max_steps:
+            return _STEPS
+        if self.max_size is not None and size > self.max_size:
+            return _SIZE
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            return _TIMEOUT
+        return None
+
+
+def term_size(t: ASTBase) -> int:
+    """ the number of nodes of a named term, counting shared subterms once per use
+
+    :param t: the term
+    :return: the size of the term
+    """
+    sizes: Dict[int, int] = {}
+    pending = [t]
+    while pending:
+        node = pending[-1]
+        if id(node) in sizes:
+            pending.pop()
+        elif isinstance(node, Abstraction):
+            if id(node.body) in sizes:
+                sizes[id(node)] = sizes[id(node.body)] + 1
+                pending.pop()
+            else:
+                pending.append(node.body)
+        elif isinstance(node, Application):
+            missing = [child for child in (node.applier, node.appliee) if id(child) not in sizes]
+            if missing:
+                pending.extend(missing)
+            else:
+                sizes[id(node)] = sizes[id(node.applier)] + sizes[id(node.appliee)] + 1
+                pending.pop()
+        else:
+            sizes[id(node)] = 1
+            pending.pop()
+    return sizes[id(t)]
@@ -0,0 +1,157 @@
+# CSCI 384 on-disk caches for Lambda Calculus
+
+"""
+Locations and helpers for the caches kept between runs. Everything lives
+under one directory, `$LC_CACHE_DIR` if it is set, otherwise `lambda-lc`
+in `$XDG_CACHE_HOME` (`~/.cache` by default). A cache that cannot be read
+or written is treated as empty; caching never makes a run fail.
+
+The result cache keeps the normal forms and step counts of reductions, one
+file per result in `results/`, each written whole, so runs in parallel
+never see half a result. A result read is touched, and once the files take more than the size
+bound the least recently used are removed.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+# bump when what a reduction gives changes, invalidating the cached results
+_RESULTS_VERSION = 2
+_RESULTS_MAX_BYTES = 64 << 20
+
+
+def cache_dir() -> Path:
+    """ the directory the caches are kept in
+
+    :return: path of the cache directory, which may not exist yet
+    """
+    configured = os.environ.get('LC_CACHE_DIR')
+    if configured:
+        return Path(configured)
+    xdg = os.environ.get('XDG_CACHE_HOME')
+    return (Path(xdg) if xdg else Path.home() / '.cache') / 'lambda-lc'
+
+
+def read_pickle(name: str) -> Optional[Any]:
+    """ read a pickled object from the cache
+
+    :param name: file name of the object in the cache directory
+    :return: the object, or None if it is not cached or cannot be read
+    """
+    try:
+        with open(cache_dir() / name, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def _write_atomic(directory: Path, name: str, obj: Any) -> None:
+    """ pickle an object into a directory, replacing the file atomically """
+    import tempfile  # only writes pay for it, a warm cache is only read
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f'.{name}.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(obj, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, directory / name)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def write_pickle(name: str, obj: Any) -> None:
+    """ pickle an object into the cache, replacing the file atomically
+
+    :param name: file name of the object in the cache directory
+    :param obj: the object to be cached
+    :return: None
+    """
+    try:
+        _write_atomic(cache_dir(), name, obj)
+    except Exception:
+        pass
+
+
+class ResultCache:
+    """ ResultCache class
+    The results of reductions by key, a normal form as printed and its step
+    count, kept on disk and bounded in size by removing the least recently
+    used
+    """
+
+    __slots__ = ['_directory', '_max_bytes']
+
+    def __init__(self, max_bytes: int = _RESULTS_MAX_BYTES, directory: Optional[Path] = None) -> None:
+        """ init result cache
+
+        :param max_bytes: the size the result files are kept under
+        :param directory: where the results are kept, results/ in the cache directory by default
+        """
+        self._directory = directory if directory is not None else cache_dir() / 'results'
+        self._max_bytes = max_bytes
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        """ the key of a result, from what it depends on
+
+        :param parts: the hash of the term reduced, the engine and anything else changing the result
+        :return: the key
+        """
+        return hashlib.sha256('\n'.join((str(_RESULTS_VERSION),) + parts).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, Optional[int]]]:
+        """ a cached result, marked as just used
+
+        :param key: the key of the result
+        :return: the normal form and step count, None for the count if the engine does not give it,
+                 or None if the result is not cached
+        """
+        path = self._directory / f'{key}.pickle'
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+            os.utime(path)
+        except Exception:
+            return None
+        if not (isinstance(result, tuple) and len(result) == 2 and isinstance(result[0], str)):
+            return None
+        return result
+
+    def put(self, key: str, normal_form: str, steps: Optional[int]) -> None:
+        """ cache a result, removing the least recently used ones past the size bound
+
+        :param key: the key of the result
+        :param normal_form: the normal form as printed
+        :param steps: the reduction step count, None if the engine does not give it
+        :return: None
+        """
+        try:
+            _write_atomic(self._directory, f'{key}.pickle', (normal_form, steps))
+            self._evict()
+        except Exception:
+            pass
+
+    def _evict(self) -> None:
+        """ remove the least recently used results until the rest fit the size bound """
+        entries = []
+        total = 0
+        for path in self._directory.glob('*.pickle'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self._max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
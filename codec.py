@@ -0,0 +1,187 @@
+# CSCI 384 compact term encoding for Lambda Calculus
+
+"""
+A compact encoding of terms, cheaper to write, send and read back than the
+sml datatype source `serialize` gives, and the same in python and in the
+sml interpreter (`encode` and `decode` in reducer.sml).
+
+Terms are written in prefix order, every name preceded by its length:
+
+    term := 'a' term term          application
+          | 'l' name term          abstraction
+          | 'v' name               variable
+          | 'n' digits ';'         integer literal, a church numeral in sml
+          | '=' term               the term, recorded in the table
+          | '#' digits ';'         the term recorded i-th, from 0
+    name := digits ':' characters
+    code := 'lc1:' digits ':' term the table size, then the term
+
+A name's length counts the bytes of its utf-8 encoding, as `String.size`
+does in sml, rather than its characters.
+
+A subterm the term holds more than once, as the parser's hash-consed
+nodes do, is written out the first time and referred to by its place in
+the table afterwards, so the encoding is as large as the term's graph
+rather than its tree.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+from parser import ASTBase, Variable, Abstraction, Application, Numeral
+
+_HEADER = 'lc1:'
+
+_APPLICATION = 0
+_ABSTRACTION = 1
+_RECORD = 2
+
+
+def encode(t: ASTBase, share: bool = True) -> str:
+    """ encode a term
+
+    :param t: the term
+    :param share: refer back to the subterms the term holds more than once
+    :return: the compact code of the term
+    """
+    # the times every compound node is held, counting each node once however often it is reached
+    held: Dict[int, int] = {}
+    if share:
+        pending = [t]
+        while pending:
+            node = pending.pop()
+            if id(node) in held:
+                held[id(node)] += 1
+            elif isinstance(node, (Abstraction, Application)):
+                held[id(node)] = 1
+                pending.extend(node.args[1:] if isinstance(node, Abstraction) else node.args)
+
+    table: Dict[int, int] = {}
+    out = []
+    # strings on the stack are written out as they are
+    pending = [t]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, str):
+            out.append(item)
+            continue
+        if held.get(id(item), 0) > 1:
+            index = table.get(id(item))
+            if index is not None:
+                out.append(f'#{index};')
+                continue
+            table[id(item)] = len(table)
+            out.append('=')
+        if isinstance(item, Variable):
+            out.append(f'v{len(item.var_name.encode())}:{item.var_name}')
+        elif isinstance(item, Abstraction):
+            out.append(f'l{len(item.var.encode())}:{item.var}')
+            pending.append(item.body)
+        elif isinstance(item, Application):
+            out.append('a')
+            pending.append(item.appliee)
+            pending.append(item.applier)
+        elif isinstance(item, Numeral):
+            out.append(f'n{item.value};')
+        else:
+            raise ValueError(f'cannot encode {item!r}')
+    return f'{_HEADER}{len(table)}:' + ''.join(out)
+
+
+def is_compact(code: str) -> bool:
+    """ if code looks like a compact term, rather than anything else sml might print
+
+    :param code: the text
+    :return: if it starts as a compact term does
+    """
+    return code.startswith(_HEADER)
+
+
+def _read_number(code: str, pos: int, stop: str) -> Tuple[int, int]:
+    """ the number at pos, ended by stop, and the position after stop """
+    end = code.index(stop, pos)
+    return int(code[pos:end]), end + 1
+
+
+def _read_name(code: str, pos: int) -> Tuple[str, int]:
+    """ the length prefixed name at pos and the position after it, its length in utf-8 bytes """
+    length, pos = _read_number(code, pos, ':')
+    name = code[pos:pos + length]
+    if not name.isascii():
+        # fewer characters than bytes, count them off one by one
+        end = pos
+        size = 0
+        while size < length and end < len(code):
+            size += len(code[end].encode())
+            end += 1
+        name = code[pos:end]
+    if len(name.encode()) != length:
+        raise ValueError('truncated compact term')
+    return name, pos + len(name)
+
+
+def decode(code: str) -> ASTBase:
+    """ decode a term, holding a subterm once wherever the code refers back to it
+
+    :param code: the compact code of the term
+    :return: the term
+    :raise ValueError: if code is not a compact term
+    """
+    if not code.startswith(_HEADER):
+        raise ValueError('not a compact term')
+    try:
+        size, pos = _read_number(code, len(_HEADER), ':')
+        table: List[Optional[ASTBase]] = [None] * size
+        recorded = 0
+        variables: Dict[str, Variable] = {}
+        # the terms still waiting for their subterms
+        frames: List[list] = []
+        while True:
+            c = code[pos]
+            pos += 1
+            if c == 'a':
+                frames.append([_APPLICATION, None])
+                continue
+            elif c == 'l':
+                var, pos = _read_name(code, pos)
+                frames.append([_ABSTRACTION, var])
+                continue
+            elif c == '=':
+                frames.append([_RECORD, recorded])
+                recorded += 1
+                continue
+            elif c == 'v':
+                var, pos = _read_name(code, pos)
+                term = variables.get(var)
+                if term is None:
+                    term = variables[var] = Variable(var)
+            elif c == 'n':
+                value, pos = _read_number(code, pos, ';')
+                term = Numeral(value)
+            elif c == '#':
+                index, pos = _read_number(code, pos, ';')
+                term = table[index]
+                if term is None:
+                    raise ValueError(f'reference to unrecorded term {index}')
+            else:
+                raise ValueError(f'unexpected {c!r} at {pos - 1} in compact term')
+
+            # hand the finished term up to the terms waiting for it
+            while frames:
+                frame = frames[-1]
+                if frame[0] == _APPLICATION:
+                    if frame[1] is None:
+                        frame[1] = term
+                        break
+                    term = Application(frame[1], term)
+                elif frame[0] == _ABSTRACTION:
+                    term = Abstraction(frame[1], term)
+                else:
+                    table[frame[1]] = term
+                frames.pop()
+            else:
+                if pos != len(code):
+                    raise ValueError('trailing data after compact term')
+                return term
+    except IndexError:
+        raise ValueError('truncated compact term') from None
@@ -0,0 +1,433 @@
+# CSCI 384 nameless (de Bruijn indexed) terms for Lambda Calculus
+
+"""
+<term> ::= <index> | <free name> | <numeral> | fn => <term> | <term> <term>
+
+A bound variable is the number of binders between its occurrence and
+its own binder, so beta reduction only shifts indices and never has to
+rename anything. Every node records `fv`, one more than its largest free
+index, which lets shifting and substitution return closed subterms (the
+prelude definitions, mostly) untouched. Binders keep their source name
+as a hint for turning terms back into readable named ones, and the name
+of the definition they come from, if they were given one, through every
+copy made of them.
+
+Like reducer.py, the normal order reducer keeps a zipper to the current
+redex and never searches the normal form part of the term left of it
+again.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Dict, List, Optional, Set, Tuple
+
+from budget import Budget, LimitExceeded
+from parser import ASTBase, Variable, Abstraction, Application, Numeral
+from reducer import pretty, recursion_limit
+from tracer import Trace
+
+
+class Term:
+    """ nameless term base class """
+    __slots__ = ['fv', '_size']
+
+
+class Index(Term):
+    """ bound variable, counting binders outwards from 0 """
+    __slots__ = ['index']
+
+    def __init__(self, index: int):
+        self.index = index
+        self.fv = index + 1
+
+    def __repr__(self):
+        return f'Index({self.index})'
+
+
+class Free(Term):
+    """ free variable, kept by name """
+    __slots__ = ['name']
+
+    def __init__(self, name: str):
+        self.name = name
+        self.fv = 0
+
+    def __repr__(self):
+        return f'Free({self.name!r})'
+
+
+class Num(Term):
+    """ native numeral, only evaluated by the lazy reducer """
+    __slots__ = ['value']
+
+    def __init__(self, value: int):
+        self.value = value
+        self.fv = 0
+
+    def __repr__(self):
+        return f'Num({self.value})'
+
+
+class Lam(Term):
+    """ abstraction, with the source variable name as a hint and the definition it comes from """
+    __slots__ = ['body', 'name', 'origin']
+
+    def __init__(self, body: Term, name: str, origin: Optional[str] = None):
+        self.body = body
+        self.name = name
+        self.origin = origin
+        self.fv = body.fv - 1 if body.fv else 0
+
+    def __repr__(self):
+        return f'Lam({self.body!r}, {self.name!r})'
+
+
+class App(Term):
+    """ application """
+    __slots__ = ['fun', 'arg']
+
+    def __init__(self, fun: Term, arg: Term):
+        self.fun = fun
+        self.arg = arg
+        self.fv = max(fun.fv, arg.fv)
+
+    def __repr__(self):
+        return f'App({self.fun!r}, {self.arg!r})'
+
+
+# zipper frames, the focus being
+_IN_FUN = 0  # the function of the application, whose argument is not searched yet
+_IN_ARG = 1  # the argument of the application, whose function is in normal form
+_IN_BODY = 2  # the body of the abstraction
+
+_INDICES: List[Index] = []
+
+
+def _index(i: int) -> Index:
+    """ the shared index node for i """
+    while len(_INDICES) <= i:
+        _INDICES.append(Index(len(_INDICES)))
+    return _INDICES[i]
+
+
+def from_named(t: ASTBase, origins: Optional[Dict[int, str]] = None) -> Term:
+    """ convert a named term into a nameless one
+
+    :param t: named term
+    :param origins: the definition names of abstraction nodes, by the node ids
+    :return: the nameless term, with unbound variables kept as free names
+    """
+    origins = origins or {}
+
+    def helper(node: ASTBase, scope: Dict[str, List[int]], depth: int) -> Term:
+        if isinstance(node, Variable):
+            binders = scope.get(node.var_name)
+            if binders:
+                return _index(depth - 1 - binders[-1])
+            return Free(node.var_name)
+        elif isinstance(node, Abstraction):
+            scope.setdefault(node.var, []).append(depth)
+            body = helper(node.body, scope, depth + 1)
+            scope[node.var].pop()
+            return Lam(body, node.var, origins.get(id(node)))
+        elif isinstance(node, Application):
+            return App(helper(node.applier, scope, depth), helper(node.appliee, scope, depth))
+        elif isinstance(node, Numeral):
+            return Num(node.value)
+        else:
+            raise Exception(f'Encounter unknown term {node}')
+
+    with recursion_limit():
+        return helper(t, {}, 0)
+
+
+def _free_names(t: Term, names: Set[str]) -> Set[str]:
+    """ collect the free names of t into names """
+    if isinstance(t, Free):
+        names.add(t.name)
+    elif isinstance(t, Lam):
+        _free_names(t.body, names)
+    elif isinstance(t, App):
+        _free_names(t.fun, names)
+        _free_names(t.arg, names)
+    return names
+
+
+def to_named(t: Term) -> ASTBase:
+    """ convert a nameless term back into a named one
+
+    binders get their hint name, suffixed with `_<n>` only when the hint is
+    already taken by an enclosing binder or a free name
+    :param t: nameless term
+    :return: the named term
+    """
+    def helper(node: Term, names: List[str], taken: Dict[str, int]) -> ASTBase:
+        if isinstance(node, Index):
+            return Variable(names[-1 - node.index])
+        elif isinstance(node, Free):
+            return Variable(node.name)
+        elif isinstance(node, Lam):
+            name = node.name
+            suffix = 0
+            while taken.get(name):
+                suffix += 1
+                name = f'{node.name}_{suffix}'
+            taken[name] = taken.get(name, 0) + 1
+            names.append(name)
+            body = helper(node.body, names, taken)
+            names.pop()
+            taken[name] -= 1
+            return Abstraction(name, body)
+        elif isinstance(node, App):
+            return Application(helper(node.fun, names, taken), helper(node.arg, names, taken))
+        elif isinstance(node, Num):
+            return Numeral(node.value)
+        else:
+            raise Exception(f'Encounter unknown term {node}')
+
+    with recursion_limit():
+        return helper(t, [], {name: 1 for name in _free_names(t, set())})
+
+
+def equal(t1: Term, t2: Term) -> bool:
+    """ structural equality of nameless terms, alpha equivalence of named ones
+
+    :param t1: a term
+    :param t2: another term
+    :return: if the two terms are the same
+    """
+    stack = [(t1, t2)]
+    while stack:
+        a, b = stack.pop()
+        if a is b:
+            continue
+        if isinstance(a, App) and isinstance(b, App):
+            stack.append((a.fun, b.fun))
+            stack.append((a.arg, b.arg))
+        elif isinstance(a, Lam) and isinstance(b, Lam):
+            stack.append((a.body, b.body))
+        elif isinstance(a, Index) and isinstance(b, Index):
+            if a.index != b.index:
+                return False
+        elif isinstance(a, Free) and isinstance(b, Free):
+            if a.name != b.name:
+                return False
+        elif isinstance(a, Num) and isinstance(b, Num):
+            if a.value != b.value:
+                return False
+        else:
+            return False
+    return True
+
+
+def digest(t: Term) -> str:
+    """ a hash of a nameless term, the same for alpha equivalent named terms
+
+    :param t: the term
+    :return: the hex sha256 of the term's prefix encoding, binder names left out
+    """
+    h = hashlib.sha256()
+    out = []
+    stack = [t]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, App):
+            out.append('a')
+            stack.append(node.arg)
+            stack.append(node.fun)
+        elif isinstance(node, Lam):
+            out.append('l')
+            stack.append(node.body)
+        elif isinstance(node, Index):
+            out.append(f'i{node.index};')
+        elif isinstance(node, Free):
+            out.append(f'v{len(node.name)}:{node.name}')
+        elif isinstance(node, Num):
+            out.append(f'n{node.value};')
+        if len(out) >= 4096:
+            h.update(''.join(out).encode())
+            out.clear()
+    h.update(''.join(out).encode())
+    return h.hexdigest()
+
+
+def size(t: Term) -> int:
+    """ the number of nodes of a term as a tree
+
+    sizes are only worked out when asked for, and kept on the nodes, so
+    measuring the terms of a reduction after every step only walks the
+    nodes that step made
+    :param t: the term
+    :return: the size of the term
+    """
+    pending = [t]
+    while pending:
+        node = pending[-1]
+        if hasattr(node, '_size'):
+            pending.pop()
+        elif isinstance(node, Lam):
+            if hasattr(node.body, '_size'):
+                node._size = node.body._size + 1
+                pending.pop()
+            else:
+                pending.append(node.body)
+        elif isinstance(node, App):
+            if hasattr(node.fun, '_size') and hasattr(node.arg, '_size'):
+                node._size = node.fun._size + node.arg._size + 1
+                pending.pop()
+            else:
+                pending.append(node.fun)
+                pending.append(node.arg)
+        else:
+            node._size = 1
+            pending.pop()
+    return t._size
+
+
+def shift(t: Term, d: int, cutoff: int = 0) -> Term:
+    """ add d to every index of t that is free above cutoff binders
+
+    :param t: term to be shifted
+    :param d: the amount to be shifted by
+    :param cutoff: the number of binders t is under
+    :return: the shifted term
+    """
+    if d == 0 or t.fv <= cutoff:
+        return t
+    if isinstance(t, Index):
+        return _index(t.index + d)
+    elif isinstance(t, Lam):
+        return Lam(shift(t.body, d, cutoff + 1), t.name, t.origin)
+    else:
+        return App(shift(t.fun, d, cutoff), shift(t.arg, d, cutoff))
+
+
+def substitution(body: Term, arg: Term, depth: int = 0) -> Term:
+    """ substitute arg for the variable bound right outside body
+
+    the binder is removed, so the other free indices of body drop by one
+    :param body: the body of the applied abstraction
+    :param arg: the term to be substituted in
+    :param depth: the number of binders inside body passed so far
+    :return: the substituted term
+    """
+    if body.fv <= depth:
+        return body
+    if isinstance(body, Index):
+        if body.index == depth:
+            return shift(arg, depth)
+        return _index(body.index - 1)
+    elif isinstance(body, Lam):
+        return Lam(substitution(body.body, arg, depth + 1), body.name, body.origin)
+    else:
+        return App(substitution(body.fun, arg, depth), substitution(body.arg, arg, depth))
+
+
+def plug(t: Term, context: List[Tuple]) -> Term:
+    """ rebuild the whole term around the focus of a zipper
+
+    :param t: the focus
+    :param context: the zipper frames from the root down to the focus
+    :return: the whole term
+    """
+    for kind, left, node in reversed(context):
+        if kind == _IN_FUN:
+            t = App(t, node.arg)
+        elif kind == _IN_ARG:
+            t = App(left, t)
+        else:
+            t = Lam(t, node.name, node.origin)
+    return t
+
+
+def search(t: Term, context: List[Tuple]) -> Tuple[Term, bool]:
+    """ move the focus of a zipper to the next leftmost-outermost redex
+
+    :param t: the focus, everything left of it in normal form
+    :param context: the zipper frames from the root down to the focus
+    :return: the redex and True, or the whole normal form and False
+    """
+    while True:
+        while isinstance(t, (App, Lam)):
+            if isinstance(t, Lam):
+                context.append((_IN_BODY, None, t))
+                t = t.body
+            elif isinstance(t.fun, Lam):
+                return t, True
+            else:
+                context.append((_IN_FUN, None, t))
+                t = t.fun
+
+        while context:
+            kind, left, node = context.pop()
+            if kind == _IN_FUN:
+                context.append((_IN_ARG, t, node))
+                t = node.arg
+                break
+            elif kind == _IN_ARG:
+                t = node if left is node.fun and t is node.arg else App(left, t)
+            else:
+                t = node if t is node.body else Lam(t, node.name, node.origin)
+        else:
+            return t, False
+
+
+def contract(redex: App) -> Term:
+    """ contract a redex
+
+    :param redex: an abstraction applied to a term
+    :return: the contracted term
+    """
+    return substitution(redex.fun.body, redex.arg)
+
+
+def reduction_step(t: Term) -> Optional[Term]:
+    """ contract the leftmost-outermost redex of t
+
+    :param t: term to be reduced
+    :return: the reduced term, or None if t is in normal form
+    """
+    context = []
+    redex, found = search(t, context)
+    return plug(contract(redex), context) if found else None
+
+
+def reduce(t: ASTBase, verbose: bool = False, budget: Optional[Budget] = None,
+           trace: Optional[Trace] = None) -> Tuple[ASTBase, int]:
+    """ reduce t to its normal form with nameless terms
+
+    :param t: term to be reduced
+    :param verbose: print every term before it is reduced
+    :param budget: limits of the reduction, none by default
+    :param trace: where the terms are written instead of printed, if given
+    :return: the normal form and the number of reduction steps in a tuple
+    """
+    term = from_named(t)
+    measures_size = budget is not None and budget.measures_size
+    term_size = size(term) if measures_size else 0
+    steps = 0
+    context = []
+    with recursion_limit():
+        term, found = search(term, context)
+        while found:
+            if budget is not None:
+                limit = budget.exceeded(steps, term_size)
+                if limit is not None:
+                    raise LimitExceeded(limit, steps, to_named(plug(term, context)))
+            if trace is not None:
+                if trace.wants(steps + 1):
+                    trace.write(steps + 1, pretty(to_named(plug(term, context))))
+            elif verbose:
+                print(pretty(to_named(plug(term, context))))
+            steps += 1
+            if measures_size:
+                term_size -= size(term)
+            term = contract(term)
+            if measures_size:
+                term_size += size(term)
+            if isinstance(term, Lam) and context and context[-1][0] == _IN_FUN:
+                # the contracted term became the function of the next redex
+                term = App(term, context.pop()[2].arg)
+            else:
+                term, found = search(term, context)
+    return to_named(term), steps
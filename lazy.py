@@ -0,0 +1,309 @@
+# CSCI 384 call-by-need reducer for Lambda Calculus
+
+"""
+A lazy graph reducer. Arguments are never copied into the body of the
+applied abstraction; they become thunks in an environment instead, and
+a thunk is overwritten with its value the first time it is evaluated, so
+every shared argument (`(pred n)` in fibhelp, the `f f` of Y) is reduced
+at most once however many times it is used.
+
+Terms are evaluated to weak head normal form by an abstract machine with
+an explicit stack of pending arguments and thunk updates, then read back
+under binders into a full normal form, the same one normal order gives.
+
+Given the supporting definitions, the machine also takes native numerals
+as values, and evaluates the prelude combinators with delta rules on
+machine integers once their arguments are numerals. Any other use falls
+back to the lambda definition: a primitive missing arguments, or given
+something else than numerals, is its definition, and a numeral applied
+to an argument unrolls into its church numeral, one application at a time.
+"""
+from __future__ import annotations
+
+from typing import Dict, FrozenSet, List, Mapping, Optional, Tuple, Union
+
+from budget import Budget, LimitExceeded
+from debruijn import Term, Index, Free, Num, Lam, App, from_named, to_named
+from parser import ASTBase
+from primitives import DELTA_RULES, SHORT_CIRCUITS
+from reducer import recursion_limit
+from tracer import Trace
+
+
+class Thunk:
+    """ a shared, delayed term in its environment, or the value it evaluated to """
+    __slots__ = ['term', 'env', 'value']
+
+    def __init__(self, term: Optional[Term], env: Optional[tuple], value: Optional[Value] = None):
+        self.term = term
+        self.env = env
+        self.value = value
+
+
+class Closure:
+    """ an abstraction in its environment """
+    __slots__ = ['lam', 'env']
+
+    def __init__(self, lam: Lam, env: Optional[tuple]):
+        self.lam = lam
+        self.env = env
+
+
+class Neutral:
+    """ a variable applied to arguments, the head being a free name or a binder level """
+    __slots__ = ['head', 'args']
+
+    def __init__(self, head: Union[str, int], args: Tuple[Thunk, ...] = ()):
+        self.head = head
+        self.args = args
+
+
+Value = Union[Closure, Neutral, Num]
+
+
+class _Update:
+    """ stack marker for a thunk to be overwritten with the value on top """
+    __slots__ = ['thunk']
+
+    def __init__(self, thunk: Thunk):
+        self.thunk = thunk
+
+
+def _lookup(env: tuple, index: int) -> Thunk:
+    """ the thunk bound index binders out in the environment """
+    for _ in range(index):
+        env = env[1]
+    return env[0]
+
+
+def _unroll(n: int) -> Lam:
+    """ the church numeral of n, with n - 1 left a numeral: fn f => fn a => f (n-1 f a) """
+    if n == 0:
+        return Lam(Lam(Index(0), 'a'), 'f')
+    return Lam(Lam(App(Index(1), App(App(Num(n - 1), Index(1)), Index(0))), 'a'), 'f')
+
+
+class Machine:
+    """ Machine class
+    The machine counts the abstractions and the delta rules it applies as
+    reduction steps. There is no whole term to measure while it runs, so a
+    size limit bounds the number of thunks it makes instead, and a reduction
+    stopped by its budget has no partial term to give back.
+    """
+
+    __slots__ = ['_steps', '_thunks', '_verbose', '_definitions', '_terms', '_primitives', '_budget', '_trace']
+
+    def __init__(self, verbose: bool = False, definitions: Optional[Mapping[str, ASTBase]] = None,
+                 primitives: FrozenSet[str] = frozenset(), budget: Optional[Budget] = None,
+                 trace: Optional[Trace] = None) -> None:
+        """ init machine
+
+        :param verbose: print every abstraction and delta rule applied
+        :param definitions: the definitions free names stand for, none by default
+        :param primitives: the free names evaluated by their delta rules when they can be
+        :param budget: limits of the reduction, none by default
+        :param trace: where the abstractions and delta rules applied are written instead of printed, if given
+        """
+        self._steps = 0
+        self._thunks = 0
+        self._verbose = verbose
+        self._budget = budget
+        self._trace = trace
+        self._definitions = definitions or {}
+        self._terms: Dict[str, Term] = {}
+        self._primitives = primitives
+
+    @property
+    def steps(self) -> int:
+        return self._steps
+
+    def _log(self, action: str) -> None:
+        """ trace or print the step just taken """
+        if self._trace is not None:
+            if self._trace.wants(self._steps):
+                self._trace.write(self._steps, action)
+        elif self._verbose:
+            print(f'{self._steps}: {action}')
+
+    def delay(self, term: Term, env: Optional[tuple]) -> Thunk:
+        """ make the thunk of an argument, sharing it if it is a variable
+
+        :param term: the argument
+        :param env: the environment of the argument
+        :return: the thunk of the argument
+        """
+        if isinstance(term, Index):
+            return _lookup(env, term.index)
+        elif isinstance(term, Lam):
+            return Thunk(None, None, Closure(term, env))
+        elif isinstance(term, Num):
+            return Thunk(None, None, term)
+        elif isinstance(term, Free) and term.name not in self._definitions:
+            return Thunk(None, None, Neutral(term.name))
+        self._thunks += 1
+        return Thunk(term, env)
+
+    def definition(self, name: str) -> Optional[Term]:
+        """ the nameless term of a supporting definition, converted once
+
+        :param name: name of the definition
+        :return: the term, or None if the name is not defined
+        """
+        term = self._terms.get(name)
+        if term is None and name in self._definitions:
+            term = self._terms[name] = from_named(self._definitions[name])
+        return term
+
+    def delta(self, name: str, stack: List) -> Optional[Union[int, bool]]:
+        """ apply the delta rule of a primitive to the numerals on the stack
+
+        the arguments are evaluated one by one, in the order the definition
+        looks at them, and the rule is given up on at the first one that is
+        not a numeral, the others left unevaluated; an argument deciding the
+        result by itself leaves the others unevaluated too
+        :param name: name of the primitive
+        :param stack: pending arguments and thunk updates
+        :return: the result of the rule with its arguments popped, or None if it does not apply
+        """
+        arity, rule = DELTA_RULES[name]
+        args = stack[len(stack) - arity:]
+        if len(args) < arity or any(isinstance(arg, _Update) for arg in args):
+            return None
+        short_circuit = SHORT_CIRCUITS.get(name)
+        numbers = [0] * arity
+        # the last argument first, as `m succ n` looks at m before n; the first argument is on top of the stack
+        for position in reversed(range(arity)):
+            value = self.force(args[arity - 1 - position])
+            if not isinstance(value, Num):
+                return None
+            if short_circuit is not None and short_circuit[:2] == (position, value.value):
+                return self._applied(name, arity, stack, short_circuit[2])
+            numbers[position] = value.value
+        return self._applied(name, arity, stack, rule(*numbers))
+
+    def _applied(self, name: str, arity: int, stack: List, result: Union[int, bool]) -> Union[int, bool]:
+        """ pop the arguments of a primitive applied, counting the step """
+        del stack[len(stack) - arity:]
+        self._steps += 1
+        if self._verbose or self._trace is not None:
+            self._log(f'apply prim {name}')
+        return result
+
+    def whnf(self, term: Term, env: Optional[tuple], stack: List) -> Value:
+        """ evaluate a term to weak head normal form
+
+        :param term: the term to be evaluated
+        :param env: the environment of the term
+        :param stack: pending arguments and thunk updates
+        :return: the value of the term applied to the arguments on the stack
+        """
+        while True:
+            # unwind the application spine down to its head
+            while True:
+                if isinstance(term, App):
+                    stack.append(self.delay(term.arg, env))
+                    term = term.fun
+                elif isinstance(term, Index):
+                    thunk = _lookup(env, term.index)
+                    if thunk.value is not None:
+                        value = thunk.value
+                        break
+                    stack.append(_Update(thunk))
+                    term, env = thunk.term, thunk.env
+                elif isinstance(term, Lam):
+                    value = Closure(term, env)
+                    break
+                elif isinstance(term, Num):
+                    value = term
+                    break
+                else:
+                    definition = self.definition(term.name)
+                    if definition is None:
+                        value = Neutral(term.name)
+                        break
+                    result = self.delta(term.name, stack) if term.name in self._primitives else None
+                    if isinstance(result, bool):
+                        term, env = self.definition('true' if result else 'false'), None
+                    elif result is not None:
+                        value = Num(result)
+                        break
+                    else:
+                        term, env = definition, None
+
+            # give the value back to the stack
+            while stack:
+                top = stack.pop()
+                if isinstance(top, _Update):
+                    top.thunk.value = value
+                    top.thunk.term = top.thunk.env = None
+                elif isinstance(value, Num):
+                    value = Closure(_unroll(value.value), None)
+                    stack.append(top)
+                elif isinstance(value, Closure):
+                    if self._budget is not None:
+                        limit = self._budget.exceeded(self._steps, self._thunks)
+                        if limit is not None:
+                            raise LimitExceeded(limit, self._steps, None)
+                    self._steps += 1
+                    if self._verbose or self._trace is not None:
+                        self._log(f'apply fn {value.lam.name}')
+                    term, env = value.lam.body, (top, value.env)
+                    break
+                else:
+                    value = Neutral(value.head, value.args + (top,))
+            else:
+                return value
+
+    def force(self, thunk: Thunk) -> Value:
+        """ evaluate a thunk, once
+
+        :param thunk: the thunk to be evaluated
+        :return: the value of the thunk
+        """
+        if thunk.value is None:
+            self.whnf(thunk.term, thunk.env, [_Update(thunk)])
+        return thunk.value
+
+    def quote(self, value: Value, level: int = 0) -> Term:
+        """ read a value back into a normal form, reducing under binders
+
+        :param value: the value to be read back
+        :param level: the number of binders the value is under
+        :return: the normal form of the value
+        """
+        if isinstance(value, Closure):
+            var = Thunk(None, None, Neutral(level))
+            body = self.whnf(value.lam.body, (var, value.env), [])
+            return Lam(self.quote(body, level + 1), value.lam.name)
+        if isinstance(value, Num):
+            term = Index(0)
+            for _ in range(value.value):
+                term = App(Index(1), term)
+            return Lam(Lam(term, 'a'), 'f')
+
+        if isinstance(value.head, int):
+            term = Index(level - 1 - value.head)
+        else:
+            term = Free(value.head)
+        for arg in value.args:
+            term = App(term, self.quote(self.force(arg), level))
+        return term
+
+
+def reduce(t: ASTBase, verbose: bool = False, definitions: Optional[Mapping[str, ASTBase]] = None,
+           primitives: FrozenSet[str] = frozenset(), budget: Optional[Budget] = None,
+           trace: Optional[Trace] = None) -> Tuple[ASTBase, int]:
+    """ reduce t to its normal form by call-by-need graph reduction
+
+    :param t: term to be reduced
+    :param verbose: print every abstraction and delta rule applied
+    :param definitions: the definitions free names of t stand for, none by default
+    :param primitives: the free names evaluated by their delta rules when they can be
+    :param budget: limits of the reduction, none by default
+    :param trace: where the abstractions and delta rules applied are written instead of printed, if given
+    :return: the normal form and the number of reduction steps in a tuple
+    """
+    machine = Machine(verbose, definitions, primitives, budget, trace)
+    with recursion_limit():
+        normal_form = machine.quote(machine.whnf(from_named(t), None, []))
+    return to_named(normal_form), machine.steps
@@ -1,78 +1,150 @@
 #!/usr/bin/env python3
 
 # CSCI 384
-# usage: ./lc.py [-h] [-v] [*.lc files or folders containing *.lc files or nothing to enter cmd input mode]
+# usage: ./lc.py [-h] [-v] [--engine {sml,python,debruijn,lazy,nbe}] [-w N] [-j N] [--native]
+#               [--max-steps N] [--max-size N] [--timeout SECONDS] [--profile]
+#               [--trace-file PATH] [--trace-every K] [--trace-delta] [--compact]
+#               [--assembly {nested,shared}] [--full] [--entry NAME] [--optimize] [--no-cache]
+#               [--serve [ADDRESS]]
+#                [*.lc files or folders containing *.lc files or nothing to enter cmd input mode]
 
 from __future__ import annotations
 
+import os
 import pathlib
 import time
-from pprint import pprint
 import subprocess
 import shutil
 import argparse
-from typing import Union, Optional, Tuple
-
-from parser import Definition
-
-
-def eval_all(src: str, verbose: bool = False) -> Definition:
+import hashlib
+import io
+import re
+from contextlib import redirect_stdout
+from typing import Union, Optional, Tuple, List
+
+from budget import Budget, LimitExceeded
+from cache import ResultCache
+import codec
+from parser import ASTBase, Definition, ASSEMBLIES, NESTED, MAIN_ENTRY
+import reducer
+import debruijn
+import lazy
+import nbe
+import profiler
+import readback
+from tracer import Trace, SMLStream
+
+
+def eval_all(src: str, verbose: bool = False, native_numerals: bool = False, assembly: str = NESTED,
+             entry: str = MAIN_ENTRY, optimize: bool = False) -> Definition:
     """ eval src and print out evaluation result
 
     :param src: string of source code
     :param verbose: verbose flag
+    :param native_numerals: parse with native numerals and primitives
+    :param assembly: how the main clause is assembled with its definitions
+    :param entry: the definition reduced, main by default
+    :param optimize: simplify the main clause before it is reduced
     :return: None
     """
-    df = Definition(src)
+    df = Definition(src, native_numerals, assembly, entry, optimize)
     print(f'src: \n```\n{df.raw_src}\n```')
     parsed = df.parse()
     if verbose:
+        from pprint import pprint
         print('parsed: ')
         pprint(parsed)
         print('tokens: ')
         print(df.tokens)
         print('dependent tree: ')
         print(df.dependent_tree)
-        print('main: ')
+        print(f'{entry}: ')
         pprint(df.formatted_main)
     return df
 
 
-def read_and_eval(file_name: pathlib.Path, verbose: bool = False) -> Definition:
+def read_and_eval(file_name: pathlib.Path, verbose: bool = False, native_numerals: bool = False,
+                  assembly: str = NESTED, entry: str = MAIN_ENTRY, optimize: bool = False) -> Definition:
     """ read files or files in directories and eval them
 
     :param file_name: a path-like object
     :param verbose: verbose flag
+    :param native_numerals: parse with native numerals and primitives
+    :param assembly: how the main clause is assembled with its definitions
+    :param entry: the definition reduced, main by default
+    :param optimize: simplify the main clause before it is reduced
     :return: None
     """
     with open(file_name, 'r') as f:
         print(f'file_name: {file_name}')
-        df = eval_all(f.read(), verbose=verbose)
+        df = eval_all(f.read(), verbose=verbose, native_numerals=native_numerals, assembly=assembly, entry=entry,
+                      optimize=optimize)
 
     return df
 
 
 # _SML_RD_FN = 'norReduce'
 _SML_RD_FN = 'reducer'
-_SML_LC_INTERPRETER_PATH = pathlib.Path('reducer.sml')
+# the sml interpreter is read from next to this module, or from $LC_INTERPRETER
+_SML_LC_INTERPRETER_PATH = pathlib.Path(__file__).resolve().parent / 'reducer.sml'
+_SML_INTERPRETER_ENV = 'LC_INTERPRETER'
 # _SML_SUPPORT_CODE = pathlib.Path('2_reducer.sml')
 
+# read on first use, so only runs on sml pay for it
+_sml_interpreter_code: Optional[str] = None
+
+_SERVE_ADDRESS = '127.0.0.1:8384'
+# the limits of every reduction the server does, unless --max-steps or --timeout are given
+_SERVE_MAX_STEPS = 10_000_000
+_SERVE_TIMEOUT = 30.0
+
 
-# read sml interpreter code
-with open(_SML_LC_INTERPRETER_PATH, 'r') as _sml_f:
-    _SML_INTERPRETER_CODE = _sml_f.read()
+_SML_LIMITED_RD_FN = 'limitedReducer'
+_SML_EXCEEDED = re.compile(r'val main_ = Exceeded \("(\w+)",(\d+),(.*)\) : outcome$', re.DOTALL)
+_SML_REDUCED = re.compile(r'val main_ = Reduced \((.*)\) : outcome$', re.DOTALL)
+_SML_TERM = re.compile(r'val main_ = (.*) : term$', re.DOTALL)
+
+
+def sml_interpreter_code() -> str:
+    """ the sml interpreter code loaded ahead of every program sml runs
+
+    :return: the code of $LC_INTERPRETER if it is set, otherwise of reducer.sml
+    """
+    global _sml_interpreter_code
+    if _sml_interpreter_code is None:
+        with open(os.environ.get(_SML_INTERPRETER_ENV) or _SML_LC_INTERPRETER_PATH, 'r') as f:
+            _sml_interpreter_code = f.read()
+    return _sml_interpreter_code
 
 
-def _format_sml_exec_stream(df: Definition, verbose: bool = False) -> str:
+def _sml_int(n: Optional[int]) -> str:
+    """ an optional limit as an sml int literal, a negative one being no limit """
+    return '~1' if n is None else str(n)
+
+
+def _format_sml_exec_stream(df: Definition, verbose: bool = False, budget: Optional[Budget] = None,
+                            compact: bool = False) -> str:
     """ format definition into sml executable string
 
     :param df: parsed lambda definition
     :param verbose: verbose flag
+    :param budget: step and size limits for the sml reducer, the timeout is kept by the caller
+    :param compact: pass the main clause in the compact encoding, and print the result encoded
+                    as the last line before the main clause
     :return: executable sml terms
     """
+    term = f'decode "{codec.encode(df.formatted_main)}"' if compact else str(df.formatted_main)
+    limited = budget is not None and (budget.max_steps is not None or budget.max_size is not None)
+    reduction = f'{_SML_RD_FN} ({term}) {"true" if verbose else "false"}'
+    if limited:
+        reduction = f'{_SML_LIMITED_RD_FN} ({term}) {"true" if verbose else "false"} ' \
+                    f'{_sml_int(budget.max_steps)} {_sml_int(budget.max_size)}'
+    if compact:
+        # printed rather than left to the toplevel, which cuts long strings short
+        reduction = f'print ({"encodeOutcome" if limited else "encode"} ({reduction}) ^ "\\n")'
     return f'val _ = (Control.Print.printDepth := 10000);\n' \
            f'val start_ = ();\n' \
-           f' val main_ = {_SML_RD_FN} ({df.formatted_main}) {"true" if verbose else "false"};\n' \
+           f' val main_ = {reduction};\n' \
            f'val end_ = ();'
 
 
@@ -97,7 +169,8 @@ class _Timer:
 _timer = _Timer()
 
 
-def write_main(df: Definition, file_name: pathlib.Path, verbose: bool = False) -> tuple:
+def write_main(df: Definition, file_name: pathlib.Path, verbose: bool = False,
+               budget: Optional[Budget] = None, compact: bool = False) -> tuple:
     """ write definition to the files
 
     :param df: parsed lambda definition
@@ -105,28 +178,63 @@ def write_main(df: Definition, file_name: pathlib.Path, verbose: bool = False) -
                       <file_name>.out is the parsed definition
                       <file_name>.sml is the sml executable of the parsed definition
     :param verbose: verbose flag
+    :param budget: step and size limits for the sml reducer
+    :param compact: write both in the compact encoding
     :return: the Path object for .out and .sml files
     """
     out_path = pathlib.Path(f'{file_name}.out')
     sml_out_path = pathlib.Path(f'{file_name}.sml')
     with open(out_path, 'w') as f:
-        f.write(str(df.formatted_main))
+        f.write(codec.encode(df.formatted_main) if compact else str(df.formatted_main))
     with open(sml_out_path, 'w') as f:
-        f.write(_format_sml_exec_stream(df, verbose))
+        f.write(_format_sml_exec_stream(df, verbose, budget, compact))
 
     return out_path, sml_out_path
 
 
-def run_sml(sml: Union[pathlib.Path, str]) -> Optional[str]:
+# in-process reducers, each taking the main clause and verbose flag
+# and giving back the normal form and the reduction step count
+_PYTHON_ENGINES = {
+    'python': reducer.reduce,
+    'debruijn': debruijn.reduce,
+    'lazy': lazy.reduce,
+    'nbe': nbe.reduce,
+}
+_ENGINES = ('sml', *_PYTHON_ENGINES)
+
+
+def _sml_bin() -> Optional[str]:
+    """ find the sml executable
+
+    :return: path to sml/nj or sosml, or None if there is neither
+    """
+    return shutil.which('sml') or shutil.which('sosml') or None
+
+
+def _sml_partial(sml_output: str) -> Tuple[Optional[int], Optional[str]]:
+    """ the progress of an sml reduction cut short, from its verbose output
+
+    :param sml_output: sml output text printed until the reduction was stopped
+    :return: the steps taken and the last term printed, both None if nothing was printed
+    """
+    # a line cut off by the kill is left out
+    sl = [i for i in sml_output[:sml_output.rfind('\n') + 1].split('\n') if i]
+    starts = [i for i in range(len(sl)) if sl[i].startswith('val start_')]
+    printed = sl[starts[0] + 1:] if starts else []
+    if not printed:
+        return None, None
+    return len(printed) - 1, printed[-1]
+
+
+def run_sml(sml: Union[pathlib.Path, str], timeout: Optional[float] = None) -> Optional[str]:
     """ run sml using sml/nj or sosml
 
     :param sml: the sml code file path or parsed sml code of the lc definition
+    :param timeout: seconds before sml is killed, None to wait forever
     :return: sml output in str or None if there is no sml executables
+    :raise LimitExceeded: if sml is killed for the timeout
     """
-    has_sml = shutil.which('sml')
-    has_sosml = shutil.which('sosml')
-
-    sml_bin = has_sml or has_sosml or None
+    sml_bin = _sml_bin()
 
     if sml_bin:
         if isinstance(sml, str):
@@ -139,7 +247,12 @@ def run_sml(sml: Union[pathlib.Path, str]) -> Optional[str]:
 
         with _timer('sml execution took'):
             s = subprocess.Popen([sml_bin], stdout=subprocess.PIPE, stdin=subprocess.PIPE)
-            output, _ = s.communicate((_SML_INTERPRETER_CODE + _SML_SRC).encode())
+            try:
+                output, _ = s.communicate((sml_interpreter_code() + _SML_SRC).encode(), timeout=timeout)
+            except subprocess.TimeoutExpired:
+                s.kill()
+                output, _ = s.communicate()
+                raise LimitExceeded('timeout', *_sml_partial(output.decode()))
     else:
         print('no sml compiler')
         return None
@@ -147,6 +260,73 @@ def run_sml(sml: Union[pathlib.Path, str]) -> Optional[str]:
     return output.decode()
 
 
+def stream_sml(sml: Union[pathlib.Path, str], trace: Trace, timeout: Optional[float] = None,
+               compact: bool = False) -> Optional[str]:
+    """ run sml using sml/nj or sosml, writing the reduction steps as sml prints them
+
+    :param sml: the sml code file path or parsed sml code of the lc definition, printing its steps
+    :param trace: where the steps are written
+    :param timeout: seconds before sml is killed, None to wait forever
+    :param compact: the sml code prints its result in the compact encoding
+    :return: sml output of the main clause in str, the encoded result for compact code,
+             or None if there is no sml executable or it fails
+    :raise LimitExceeded: if sml is killed for the timeout
+    """
+    sml_bin = _sml_bin()
+    if not sml_bin:
+        print('no sml compiler')
+        return None
+
+    if isinstance(sml, pathlib.Path):
+        with open(sml, 'r') as src_f:
+            sml = src_f.read()
+
+    with _timer('sml execution took'):
+        stream = SMLStream(sml_bin, sml_interpreter_code() + sml, timeout)
+        step = 0
+        # the line printed last is held back, for compact code prints its result there
+        held = None
+        for line in stream:
+            if held is not None:
+                step += 1
+                if trace.wants(step):
+                    trace.write(step, held)
+            held = line
+        if held is not None and not compact:
+            step += 1
+            if trace.wants(step):
+                trace.write(step, held)
+
+    if stream.result is None:
+        print('cannot find main_ evaluation, possibly due to error')
+        return None
+    return held if compact else stream.result
+
+
+def run_python(df: Definition, verbose: bool = False, engine: str = 'python',
+               budget: Optional[Budget] = None, trace: Optional[Trace] = None) -> Tuple[ASTBase, int]:
+    """ reduce the main clause with an in-process reducer
+
+    :param df: parsed lambda definition
+    :param verbose: print every reduction step
+    :param engine: the in-process reducer to use, which is the lazy one for native numerals
+    :param budget: limits of the reduction, its clock starting now
+    :param trace: where the reduction steps are written instead of printed, if given
+    :return: the normal form and the reduction step count in a tuple
+    :raise LimitExceeded: if a limit of the budget is reached
+    """
+    if budget is not None:
+        budget.start()
+    with _timer(f'{engine} execution took'):
+        if df.native_numerals:
+            result, steps = lazy.reduce(df.formatted_main, verbose, df.supporting_defs, df.primitives, budget,
+                                        trace)
+        else:
+            result, steps = _PYTHON_ENGINES[engine](df.formatted_main, verbose, budget=budget, trace=trace)
+
+    return result, steps
+
+
 def extract_sml_output(sml_output: str) -> Optional[Tuple]:
     """ extract sml from the output got from run_sml
 
@@ -181,68 +361,582 @@ def extract_sml_output(sml_output: str) -> Optional[Tuple]:
         return None
 
 
-def run_all(src: Union[pathlib.Path, str], verbose: bool = False) -> None:
-    """ run src and print output
+def _is_file(src: Union[pathlib.Path, str]) -> bool:
+    """ if src is an lc file rather than src str """
+    return isinstance(src, pathlib.Path) or (pathlib.Path(src).is_file() and src.endswith('.lc'))
+
+
+def _prepare(src: Union[pathlib.Path, str], verbose: bool = False, native_numerals: bool = False,
+             budget: Optional[Budget] = None, traced: bool = False, compact: bool = False,
+             assembly: str = NESTED, entry: str = MAIN_ENTRY,
+             optimize: bool = False) -> Tuple[Definition, Union[pathlib.Path, str]]:
+    """ parse src and write out its sml executable if it is a file
 
     :param src: src path obj or src str
     :param verbose: verbose flag
-    :return: None
+    :param native_numerals: parse with native numerals and primitives
+    :param budget: step and size limits for the sml reducer
+    :param traced: make the sml executable print its steps without the verbose flag
+    :param compact: write the .out file and exchange terms with sml in the compact encoding
+    :param assembly: how the main clause is assembled with its definitions
+    :param entry: the definition reduced, main by default
+    :param optimize: simplify the main clause before it is reduced
+    :return: the parsed definition and the sml code file path or the sml code, None without the entry point
     """
-    if isinstance(src, pathlib.Path):
-        _, sml_code_info = write_main(read_and_eval(src, verbose), src, verbose)
-    elif isinstance(src, str):
-        f = pathlib.Path(src)
-        if f.is_file() and src.endswith('.lc'):
-            _, sml_code_info = write_main(read_and_eval(f, verbose), f, verbose)
-        else:
-            sml_code_info = _format_sml_exec_stream(eval_all(src, verbose), verbose)
-    else:
+    if isinstance(src, str) and not _is_file(src):
+        df = eval_all(src, verbose, native_numerals, assembly, entry, optimize)
+        if df.formatted_main is None:
+            return df, None
+        return df, _format_sml_exec_stream(df, verbose or traced, budget, compact)
+    if not isinstance(src, (pathlib.Path, str)):
         raise Exception('unknown file type')
 
-    execution_output = run_sml(sml_code_info)
-    stdout, res = extract_sml_output(execution_output)
+    f = pathlib.Path(src)
+    df = read_and_eval(f, verbose, native_numerals, assembly, entry, optimize)
+    if df.formatted_main is None:
+        return df, None
+    _, sml_code_info = write_main(df, f, verbose or traced, budget, compact)
+    return df, sml_code_info
+
+
+def _print_limit(e: LimitExceeded) -> None:
+    """ print how far a reduction stopped by its budget got
+
+    :param e: the limit reached
+    :return: None
+    """
+    print(f'limit reached: {e.limit}')
+    print(f'reduction steps: {"unknown" if e.steps is None else e.steps}')
+    print('partial term: ')
+    print('unavailable' if e.term is None else e.term)
+    print('================')
+    print()
+
+
+def _print_sml_result(execution_output: Optional[str], verbose: bool = False,
+                      compact: bool = False, full: bool = False) -> Optional[str]:
+    """ print the result extracted from the sml output
+
+    :param execution_output: sml output of one run
+    :param verbose: verbose flag
+    :param compact: the output is of compact sml code, its result encoded on the last printed line
+    :param full: print the normal form itself rather than the value it encodes
+    :return: the result as printed, None if there is none
+    """
+    extracted = extract_sml_output(execution_output) if execution_output is not None else None
+    stdout, res = extracted if extracted is not None else ('', None)
+    if compact and res is not None:
+        stdout, _, res = stdout.rpartition('\n')
 
     if verbose:
         print('verbose: ')
         print(stdout)
-    print('reduced result: ')
+    return _print_sml_main(res, compact, full)
+
+
+def _format_result(t: ASTBase, full: bool = False) -> str:
+    """ the result printed for a normal form, the value it encodes unless it encodes none
+
+    :param t: the normal form
+    :param full: the normal form itself rather than its value
+    :return: the result heading and the value or normal form, on two lines
+    """
+    if not full:
+        value = readback.readback(t)
+        if not isinstance(value, ASTBase):
+            return f'reduced value: \n{readback.show(value)}'
+    return f'reduced result: \n{t}'
+
+
+def _print_sml_main(res: Optional[str], compact: bool = False, full: bool = False) -> Optional[str]:
+    """ print the result of the main clause printed by sml
+
+    :param res: sml output of the main clause, None if there is none
+    :param compact: res is the result in the compact encoding, or a stopped reduction's limit,
+                    steps and encoded term
+    :param full: print the normal form itself rather than the value it encodes
+    :return: the result as printed, None if there is none
+    """
+    text = None
+    if res is not None and compact:
+        try:
+            if not codec.is_compact(res):
+                limit, steps, code = res.split(' ', 2)
+                _print_limit(LimitExceeded(limit, int(steps), codec.decode(code)))
+                return None
+            text = _format_result(codec.decode(res), full)
+        except ValueError:
+            print('cannot decode the compact result')
+    elif res is not None:
+        exceeded = _SML_EXCEEDED.match(res)
+        if exceeded:
+            _print_limit(LimitExceeded(exceeded.group(1), int(exceeded.group(2)), exceeded.group(3)))
+            return None
+        reduced = _SML_REDUCED.match(res)
+        if reduced:
+            res = f'val main_ = {reduced.group(1)} : term'
+        text = f'reduced result: \n{res}'
+        term = _SML_TERM.match(res)
+        if term and not full:
+            try:
+                value = readback.readback(readback.parse_term(term.group(1)))
+            except ValueError:
+                value = None
+            if value is not None and not isinstance(value, ASTBase):
+                text = f'reduced value: \n{readback.show(value)}'
+    print(text if text is not None else 'reduced result: \nNone')
+    print('================')
+    print()
+    return text
+
+
+def _result_key(df: Definition, engine: str, native_numerals: bool = False, compact: bool = False,
+                full: bool = False) -> str:
+    """ the result cache key of a reduction, the same for main clauses differing only in bound names
+
+    :param df: parsed lambda definition
+    :param engine: the reducer used
+    :param native_numerals: the reduction uses the delta rules of the primitives
+    :param compact: the sml result is read in the compact encoding
+    :param full: the normal form is printed rather than its value
+    :return: the key
+    """
+    parts = [debruijn.digest(debruijn.from_named(df.formatted_main)), engine, 'full' if full else 'value']
+    if native_numerals:
+        # the primitives fall back on their definitions, which are not in the main clause
+        parts.extend(sorted(df.primitives))
+        parts.extend(f'{name}={debruijn.digest(debruijn.from_named(d))}'
+                     for name, d in sorted(df.supporting_defs.items()))
+    if engine == 'sml':
+        parts.append(hashlib.sha256(sml_interpreter_code().encode()).hexdigest())
+        parts.append('compact' if compact else 'plain')
+    return ResultCache.key(*parts)
+
+
+def _print_cached(entry: Optional[Tuple[str, Optional[int]]], budget: Optional[Budget] = None) -> bool:
+    """ print a cached result, if the budget would have let the reduction finish
+
+    a size limit is never known to be kept, so it always runs the reduction again
+    :param entry: the cached result as printed and step count, None if there is none
+    :param budget: limits of the reduction, none by default
+    :return: if the result was printed
+    """
+    if entry is None:
+        return False
+    res, steps = entry
+    if budget is not None and (budget.max_size is not None or budget.max_steps is not None
+                               and (steps is None or steps >= budget.max_steps)):
+        return False
+    print('cached result, reduction skipped')
+    if steps is not None:
+        print(f'reduction steps: {steps}')
     print(res)
     print('================')
     print()
+    return True
 
 
-def arg() -> Tuple:
-    """ parse args
+def run_profile(df: Definition, json_path: pathlib.Path, budget: Optional[Budget] = None) -> None:
+    """ reduce the main clause with the profiler and print the profile
 
-    :return: files arg and verbose flag in tuple
+    :param df: parsed lambda definition
+    :param json_path: path the profile is written to as json
+    :param budget: limits of the reduction, its clock starting now
+    :return: None
     """
-    arg_parser = argparse.ArgumentParser()
-    arg_parser.add_argument('files', nargs='*', type=pathlib.Path, help='lc file/folder path(s)'
-                                                                        '(left empty when using cmd input)')
-    arg_parser.add_argument('-v', '--verbose', action='store_true', default=False, help='verbose')
+    if budget is not None:
+        budget.start()
+    result = profiler.profile(df, budget)
+    result.write_json(json_path)
+    print('profile: ')
+    print(result.table())
+    print(f'profile written to {json_path}')
+    print(f'reduction steps: {result.steps}')
+    print('partial term: ' if result.limit is not None else 'reduced result: ')
+    print(result.term)
+    print('================')
+    print()
 
-    parsed = arg_parser.parse_args()
 
-    return getattr(parsed, 'files'), getattr(parsed, 'verbose')
+def run_all(src: Union[pathlib.Path, str], verbose: bool = False, engine: str = 'sml',
+            native_numerals: bool = False, budget: Optional[Budget] = None, profile: bool = False,
+            trace: Optional[Trace] = None, compact: bool = False, assembly: str = NESTED,
+            cached: bool = True, full: bool = False, entry: str = MAIN_ENTRY, optimize: bool = False) -> None:
+    """ run src and print output
 
+    a reduction stopped by the budget is reported with the term it got to, and
+    a normal form already in the result cache is printed without reducing again
+    :param src: src path obj or src str
+    :param verbose: verbose flag
+    :param engine: the reducer to use, `sml` or one of the in-process reducers
+    :param native_numerals: evaluate numerals natively, only with the lazy reducer
+    :param budget: limits of the reduction, none by default
+    :param profile: profile the reduction with the de Bruijn reducer instead, writing
+                    the profile to <src>.profile.json, or stdin.profile.json for src str
+    :param trace: where the reduction steps are written as they are taken, instead of the
+                  verbose output, if given
+    :param compact: write the .out file and exchange terms with sml in the compact encoding
+    :param assembly: how the main clause is assembled with its definitions
+    :param cached: use the result cache, unless the steps are printed or traced
+    :param full: print the normal form itself rather than the number, boolean or pair it encodes
+    :param entry: the definition reduced, main by default
+    :param optimize: simplify the main clause before it is reduced
+    :return: None
+    """
+    if engine not in _ENGINES:
+        raise ValueError(f'Unknown engine {engine}. Only accepts {", ".join(_ENGINES)}.')
+    if native_numerals and engine != 'lazy':
+        raise ValueError('Native numerals only work with the lazy engine.')
+    if native_numerals and profile:
+        raise ValueError('Native numerals cannot be profiled.')
+    if trace is not None and profile:
+        raise ValueError('Profiled reductions cannot be traced.')
+    if optimize and profile:
+        raise ValueError('Optimized reductions cannot be profiled.')
+
+    df, sml_code_info = _prepare(src, verbose, native_numerals, budget, trace is not None, compact, assembly,
+                                 entry, optimize)
+    if sml_code_info is None:
+        # the parse warned the entry point is not defined
+        return
 
-def main() -> None:
-    """ main function that read command line input or arguments
+    if profile:
+        run_profile(df, pathlib.Path(f'{src}.profile.json' if _is_file(src) else 'stdin.profile.json'), budget)
+        return
 
+    if trace is not None:
+        trace.begin(str(src) if _is_file(src) else 'stdin')
+
+    if engine == 'sml' and _sml_bin() is None:
+        print('no sml compiler, falling back to the debruijn engine')
+        engine = 'debruijn'
+
+    results = key = None
+    if cached and not verbose and trace is None:
+        results = ResultCache()
+        key = _result_key(df, engine, native_numerals, compact, full)
+        if _print_cached(results.get(key), budget):
+            return
+
+    if engine in _PYTHON_ENGINES:
+        if verbose:
+            print('verbose: ')
+        try:
+            res, steps = run_python(df, verbose, engine, budget, trace)
+        except LimitExceeded as e:
+            _print_limit(e)
+            return
+        text = _format_result(res, full)
+        print(f'reduction steps: {steps}')
+        print(text)
+        print('================')
+        print()
+        if results is not None:
+            results.put(key, text, steps)
+    elif verbose or trace is not None:
+        # the steps are passed on as sml prints them, never held in memory
+        if verbose:
+            print('verbose: ')
+        try:
+            res = stream_sml(sml_code_info, trace or Trace(), None if budget is None else budget.timeout, compact)
+        except LimitExceeded as e:
+            _print_limit(e)
+            return
+        _print_sml_main(res, compact, full)
+    else:
+        try:
+            execution_output = run_sml(sml_code_info, None if budget is None else budget.timeout)
+        except LimitExceeded as e:
+            _print_limit(e)
+            return
+        text = _print_sml_result(execution_output, verbose, compact, full)
+        if results is not None and text is not None:
+            results.put(key, text, None)
+
+
+def run_batch(srcs: List[pathlib.Path], workers: int, verbose: bool = False,
+              budget: Optional[Budget] = None, compact: bool = False, assembly: str = NESTED,
+              cached: bool = True, full: bool = False, entry: str = MAIN_ENTRY, optimize: bool = False) -> None:
+    """ run many files with a pool of long-lived sml workers
+
+    the files are parsed in order while the workers reduce the ones parsed
+    before, and every file's output is printed in order, as run_all would;
+    the files whose normal forms are in the result cache are not sent to sml
+    :param srcs: lc file paths
+    :param workers: number of sml workers
+    :param verbose: verbose flag
+    :param budget: limits of each reduction, none by default
+    :param compact: write the .out files and exchange terms with sml in the compact encoding
+    :param assembly: how the main clauses are assembled with their definitions
+    :param cached: use the result cache, unless the steps are printed
+    :param full: print the normal forms themselves rather than the values they encode
+    :param entry: the definition reduced in every file, main by default
+    :param optimize: simplify the main clauses before they are reduced
     :return: None
     """
-    file_name, verbose = arg()
+    sml_bin = _sml_bin()
+    if sml_bin is None:
+        for src in srcs:
+            run_all(src, verbose=verbose, engine='sml', budget=budget, compact=compact, assembly=assembly,
+                    cached=cached, full=full, entry=entry, optimize=optimize)
+        return
+    timeout = None if budget is None else budget.timeout
+    results = ResultCache() if cached and not verbose else None
+
+    from smlpool import SMLPool, SMLTimeout, SMLWorkerError
+    with SMLPool(sml_bin, sml_interpreter_code(), workers) as pool:
+        jobs = []
+        for src in srcs:
+            parse_output = io.StringIO()
+            with redirect_stdout(parse_output):
+                df, sml_code_info = _prepare(src, verbose, budget=budget, compact=compact, assembly=assembly,
+                                             entry=entry, optimize=optimize)
+                if sml_code_info is None:
+                    jobs.append((parse_output, None, None, None))
+                    continue
+                key = _result_key(df, 'sml', compact=compact, full=full) if results is not None else None
+                if key is not None and _print_cached(results.get(key), budget):
+                    jobs.append((parse_output, None, None, None))
+                    continue
+            with open(sml_code_info, 'r') as src_f:
+                jobs.append((parse_output, key, time.time(), pool.submit(src_f.read(), timeout)))
+
+        for parse_output, key, submitted, job in jobs:
+            print(parse_output.getvalue(), end='')
+            if job is None:
+                continue
+            try:
+                execution_output = job.result()
+            except SMLTimeout as e:
+                _print_limit(LimitExceeded('timeout', *_sml_partial(e.output)))
+                continue
+            except SMLWorkerError as e:
+                print(e)
+                execution_output = None
+            print(f'sml execution took: {time.time() - submitted}s')
+            text = _print_sml_result(execution_output, verbose, compact, full)
+            if key is not None and text is not None:
+                results.put(key, text, None)
+
+
+class FileRun:
+    """ FileRun class
+    What running one file in a worker process printed, how long it took, and
+    the error it failed with, None if it did not fail
+    """
 
+    __slots__ = ['output', 'seconds', 'error']
+
+    def __init__(self, output: str, seconds: float, error: Optional[str] = None) -> None:
+        self.output = output
+        self.seconds = seconds
+        self.error = error
+
+
+def _run_file(src: pathlib.Path, options: dict) -> FileRun:
+    """ run_all on one file in a worker process, its output buffered
+
+    :param src: lc file path
+    :param options: keyword arguments of run_all
+    :return: the output, time and error of the run
+    """
+    output = io.StringIO()
+    start = time.perf_counter()
+    error = None
+    with redirect_stdout(output):
+        try:
+            run_all(src, **options)
+        except Exception as e:
+            import traceback
+            error = f'{type(e).__name__}: {e}'
+            traceback.print_exc(file=output)
+    return FileRun(output.getvalue(), time.perf_counter() - start, error)
+
+
+def _run_isolated(src: pathlib.Path, options: dict) -> FileRun:
+    """ run one file in a worker process of its own, after a worker died running it """
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+    start = time.perf_counter()
+    with ProcessPoolExecutor(1) as executor:
+        try:
+            return executor.submit(_run_file, src, options).result()
+        except BrokenProcessPool:
+            return FileRun('', time.perf_counter() - start, 'the worker process died')
+
+
+def run_parallel(srcs: List[pathlib.Path], jobs: int, **options) -> None:
+    """ run many files on a pool of worker processes
+
+    every file's output is held until the files before it are printed, so
+    the output is in the order of srcs, as running them one after another
+    would print it, followed by a summary of the time each file took and the
+    files that failed. A file failing, or its worker process dying, does not
+    stop the others: the file a dead worker was running is run again on its
+    own, and the files it took down with it on a new pool
+    :param srcs: lc file paths
+    :param jobs: number of worker processes
+    :param options: keyword arguments of run_all for every file
+    :return: None
+    """
+    # process pools cost every other run their import time, so they are imported on use
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+    start = time.perf_counter()
+    executor = ProcessPoolExecutor(jobs)
+    futures = [executor.submit(_run_file, src, options) for src in srcs]
+    runs: List[FileRun] = []
+    try:
+        for i, src in enumerate(srcs):
+            try:
+                run = futures[i].result()
+            except BrokenProcessPool:
+                executor.shutdown(cancel_futures=True)
+                run = _run_isolated(src, options)
+                executor = ProcessPoolExecutor(jobs)
+                for j in range(i + 1, len(srcs)):
+                    if futures[j].cancelled() or isinstance(futures[j].exception(), BrokenProcessPool):
+                        futures[j] = executor.submit(_run_file, srcs[j], options)
+            print(run.output, end='')
+            if run.error is not None:
+                print(f'{src} failed: {run.error}')
+                print()
+            runs.append(run)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    failed = sum(run.error is not None for run in runs)
+    print(f'{len(runs)} files in {time.perf_counter() - start:.3f}s on {jobs} processes, {failed} failed')
+    width = max(len(str(src)) for src in srcs)
+    for src, run in zip(srcs, runs):
+        print(f'  {str(src):<{width}} {run.seconds:>9.3f}s' + ('' if run.error is None else f'  {run.error}'))
+
+
+def arg() -> Tuple:
+    """ parse args
+
+    :return: files arg, verbose flag, engine name, sml worker count, process count, native numerals flag
+             the budget, None if there are no limits, profile flag, the trace,
+             None if there is no trace option, compact flag, assembly, cache flag, full flag, the
+             entry point, optimize flag and the address to serve on, None if not serving, in tuple
+    """
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('files', nargs='*', type=pathlib.Path, help='lc file/folder path(s)'
+                                                                        '(left empty when using cmd input)')
+    arg_parser.add_argument('-v', '--verbose', action='store_true', default=False, help='verbose')
+    arg_parser.add_argument('--engine', choices=_ENGINES, default='sml',
+                            help='reducer to use (default: sml, falls back to debruijn without an sml compiler)')
+    arg_parser.add_argument('-w', '--workers', type=int, default=0, metavar='N',
+                            help='run the files on N long-lived sml workers (sml engine only)')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=None, metavar='N',
+                            help='run the files on N worker processes, printing their output in order '
+                                 '(default: one after another), or serve on N worker processes '
+                                 '(default: one per cpu)')
+    arg_parser.add_argument('--native', action='store_true', default=False,
+                            help='evaluate numerals and their arithmetic natively (lazy engine only)')
+    arg_parser.add_argument('--max-steps', type=int, default=None, metavar='N',
+                            help='stop a reduction after N steps')
+    arg_parser.add_argument('--max-size', type=int, default=None, metavar='N',
+                            help='stop a reduction once the term grows past N nodes')
+    arg_parser.add_argument('--timeout', type=float, default=None, metavar='SECONDS',
+                            help='stop a reduction after SECONDS seconds')
+    arg_parser.add_argument('--profile', action='store_true', default=False,
+                            help='profile the reduction per definition with the debruijn reducer, '
+                                 'writing the profile to <file>.profile.json')
+    arg_parser.add_argument('--trace-file', type=pathlib.Path, default=None, metavar='PATH',
+                            help='write every reduction step to PATH as it is taken')
+    arg_parser.add_argument('--trace-every', type=int, default=None, metavar='K',
+                            help='trace only every K-th reduction step')
+    arg_parser.add_argument('--trace-delta', action='store_true', default=False,
+                            help='trace the differences between the terms of the steps traced')
+    arg_parser.add_argument('--compact', action='store_true', default=False,
+                            help='exchange terms with sml in the compact encoding of codec.py, '
+                                 'also writing it to <file>.out')
+    arg_parser.add_argument('--assembly', choices=ASSEMBLIES, default=NESTED,
+                            help='wrap main in one redex per definition it uses (nested, the default), or put '
+                                 'the one node of each definition in wherever it is used (shared)')
+    arg_parser.add_argument('--full', action='store_true', default=False,
+                            help='print the normal form itself rather than the number, boolean or pair it encodes')
+    arg_parser.add_argument('--entry', default=MAIN_ENTRY, metavar='NAME',
+                            help=f'reduce the definition NAME rather than {MAIN_ENTRY}, with the definitions it uses')
+    arg_parser.add_argument('--optimize', action='store_true', default=False,
+                            help='inline definitions and fold redexes before reducing, taking fewer steps to the '
+                                 'same normal form (off by default, so the steps are those of the program as written)')
+    arg_parser.add_argument('--no-cache', action='store_true', default=False,
+                            help='reduce again even if the normal form is in the result cache')
+    arg_parser.add_argument('--serve', nargs='?', const=_SERVE_ADDRESS, default=None, metavar='ADDRESS',
+                            help='serve json evaluation requests on HOST:PORT or a unix socket path '
+                                 f'(default: {_SERVE_ADDRESS}), with -w sml workers, every request limited to '
+                                 f'--max-steps and --timeout (default: {_SERVE_MAX_STEPS} steps, '
+                                 f'{_SERVE_TIMEOUT:g} seconds)')
+
+    parsed = arg_parser.parse_args()
+    if parsed.native and parsed.engine != 'lazy':
+        arg_parser.error('--native only works with --engine=lazy')
+    if parsed.native and parsed.profile:
+        arg_parser.error('--native cannot be profiled')
+    if parsed.optimize and parsed.profile:
+        arg_parser.error('--optimize cannot be profiled')
+    if parsed.trace_every is not None and parsed.trace_every < 1:
+        arg_parser.error('--trace-every must be at least 1')
+    if parsed.jobs is not None and parsed.jobs < 1:
+        arg_parser.error('--jobs must be at least 1')
+    if parsed.serve is not None and parsed.files:
+        arg_parser.error('--serve takes no files')
+    if parsed.serve is not None and (parsed.serve.endswith('.lc') or os.path.isdir(parsed.serve)):
+        # a file given after --serve is read as its address, never serve on it
+        arg_parser.error(f'--serve takes an address, not the lc file or folder {parsed.serve}')
+    if parsed.serve is None and (parsed.jobs or 1) > 1 and parsed.workers > 0:
+        arg_parser.error('--jobs and --workers cannot be used together')
+
+    traced = parsed.trace_file is not None or parsed.trace_every is not None or parsed.trace_delta
+    if traced and parsed.profile:
+        arg_parser.error('--profile cannot be traced')
+    if traced and (parsed.jobs or 1) > 1:
+        arg_parser.error('--jobs cannot be traced')
+
+    budget = None
+    if parsed.max_steps is not None or parsed.max_size is not None or parsed.timeout is not None:
+        budget = Budget(parsed.max_steps, parsed.max_size, parsed.timeout)
+
+    trace = None
+    if traced:
+        trace = Trace(parsed.trace_file, parsed.trace_every or 1, parsed.trace_delta)
+
+    return getattr(parsed, 'files'), getattr(parsed, 'verbose'), getattr(parsed, 'engine'), \
+        getattr(parsed, 'workers'), getattr(parsed, 'jobs'), getattr(parsed, 'native'), budget, \
+        getattr(parsed, 'profile'), trace, getattr(parsed, 'compact'), getattr(parsed, 'assembly'), \
+        not getattr(parsed, 'no_cache'), getattr(parsed, 'full'), getattr(parsed, 'entry'), \
+        getattr(parsed, 'optimize'), getattr(parsed, 'serve')
+
+
+def _run(file_name: List[pathlib.Path], verbose: bool, engine: str, workers: int, jobs: Optional[int], native: bool,
+         budget: Optional[Budget], profile: bool, trace: Optional[Trace], compact: bool,
+         assembly: str, cached: bool, full: bool, entry: str, optimize: bool) -> None:
+    """ run the files, or the cmd input if there are none, as the args say """
     if file_name:
+        src_file_paths = []
         for file_name in file_name:
             file_path = pathlib.Path(file_name)
             if file_path.is_dir():
-                for src_file_path in file_path.glob('*.lc'):
-                    run_all(src_file_path, verbose=verbose)
+                src_file_paths.extend(file_path.glob('*.lc'))
             elif file_path.is_file():
-                run_all(file_path, verbose=verbose)
+                src_file_paths.append(file_path)
             else:
                 raise ValueError('Unsupported file type as input. Only accepts folders or *.lc files.')
+
+        if workers > 0 and engine == 'sml' and not profile and trace is None:
+            run_batch(src_file_paths, workers, verbose=verbose, budget=budget, compact=compact,
+                      assembly=assembly, cached=cached, full=full, entry=entry, optimize=optimize)
+        elif (jobs or 1) > 1 and trace is None:
+            run_parallel(src_file_paths, jobs, verbose=verbose, engine=engine, native_numerals=native,
+                         budget=budget, profile=profile, compact=compact, assembly=assembly, cached=cached,
+                         full=full, entry=entry, optimize=optimize)
+        else:
+            for src_file_path in src_file_paths:
+                run_all(src_file_path, verbose=verbose, engine=engine, native_numerals=native, budget=budget,
+                        profile=profile, trace=trace, compact=compact, assembly=assembly, cached=cached, full=full,
+                        entry=entry, optimize=optimize)
     else:
         print("Enter an expression with Ctrl-D or Ctrl-Z to end: ")
         content = []
@@ -251,7 +945,32 @@ def main() -> None:
                 content.append(input())
             except EOFError:
                 break
-        run_all('\n'.join(content), verbose=verbose)
+        run_all('\n'.join(content), verbose=verbose, engine=engine, native_numerals=native, budget=budget,
+                profile=profile, trace=trace, compact=compact, assembly=assembly, cached=cached, full=full,
+                entry=entry, optimize=optimize)
+
+
+def main() -> None:
+    """ main function that read command line input or arguments
+
+    :return: None
+    """
+    file_name, verbose, engine, workers, jobs, native, budget, profile, trace, compact, assembly, cached, \
+        full, entry, optimize, serve = arg()
+    if serve is not None:
+        import server
+        # --max-steps and --timeout replace the server's limits on every request
+        limits = {} if budget is None else {name: value for name, value in
+                                            (('max_steps', budget.max_steps), ('timeout', budget.timeout))
+                                            if value is not None}
+        server.serve(serve, jobs, workers or 2, **limits)
+        return
+    try:
+        _run(file_name, verbose, engine, workers, jobs, native, budget, profile, trace, compact, assembly, cached,
+             full, entry, optimize)
+    finally:
+        if trace is not None:
+            trace.close()
 
 
 if __name__ == '__main__':
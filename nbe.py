@@ -0,0 +1,280 @@
+# CSCI 384 normalization by evaluation for Lambda Calculus
+
+"""
+Normalization by evaluation. The term is compiled once into python
+closures, one per node, so no term is rebuilt or searched for a redex as
+it is reduced: applying an abstraction calls its compiled body with an
+environment array, and the cost of a reduction grows with the work done
+rather than with the steps times the size of the term.
+
+Every abstraction is a flat closure. Its environment array holds the
+thunks of the variables free in its body, copied out of the enclosing
+array when the closure is made, and then its own argument. Arguments are
+passed as call-by-need thunks, so Y and the other terms relying on normal
+order terminate, and a closed subterm is compiled into one thunk evaluated
+at most once however often it is reached.
+
+Values are read back into a normal form by applying the closures to fresh
+variables, the same normal form normal order reduction gives. Tail calls
+return to a driver loop instead of growing the python stack.
+"""
+from __future__ import annotations
+
+from operator import itemgetter
+from typing import Callable, Dict, FrozenSet, Optional, Tuple, Union
+
+from budget import Budget, LimitExceeded
+from debruijn import Term, Index, Free, Lam, App, to_named
+from parser import ASTBase, Variable, Abstraction, Application
+from reducer import recursion_limit
+from tracer import Trace
+
+
+class Thunk:
+    """ a shared, delayed piece of compiled code in its environment, or the value it evaluated to """
+    __slots__ = ['code', 'env', 'value']
+
+    def __init__(self, code: Optional[Code], env: Optional[tuple], value: Optional[Value] = None):
+        self.code = code
+        self.env = env
+        self.value = value
+
+
+class Function:
+    """ a compiled abstraction with its environment array """
+    __slots__ = ['body', 'env', 'name']
+
+    def __init__(self, body: Code, env: tuple, name: str):
+        self.body = body
+        self.env = env
+        self.name = name
+
+
+class Neutral:
+    """ a variable applied to arguments, the head being a free name or a binder level """
+    __slots__ = ['head', 'args']
+
+    def __init__(self, head: Union[str, int], args: Tuple[Thunk, ...] = ()):
+        self.head = head
+        self.args = args
+
+
+Value = Union[Function, Neutral]
+# compiled code takes the environment array and gives a value, or the body and
+# environment of a tail call in a tuple for the driver loop to make
+Code = Callable[[tuple], Union[Value, tuple]]
+
+
+def _run(code: Code, env: tuple) -> Value:
+    """ run compiled code to its value, making its tail calls """
+    result = code(env)
+    while result.__class__ is tuple:
+        result = result[0](result[1])
+    return result
+
+
+def _force(thunk: Thunk) -> Value:
+    """ evaluate a thunk, once """
+    value = thunk.value
+    if value is None:
+        value = thunk.value = _run(thunk.code, thunk.env)
+        thunk.code = thunk.env = None
+    return value
+
+
+class Evaluator:
+    """ Evaluator class
+    Compiles terms and reads their values back. The evaluator counts the
+    abstractions it applies as reduction steps; there is no term to measure
+    while it runs, so a size limit bounds the number of thunks it makes
+    instead, and a reduction stopped by its budget has no partial term.
+    """
+
+    __slots__ = ['_steps', '_thunks', '_verbose', '_budget', '_trace', '_free', '_compiled']
+
+    def __init__(self, verbose: bool = False, budget: Optional[Budget] = None,
+                 trace: Optional[Trace] = None) -> None:
+        """ init evaluator
+
+        :param verbose: print every abstraction applied
+        :param budget: limits of the reduction, none by default
+        :param trace: where the abstractions applied are written instead of printed, if given
+        """
+        self._steps = 0
+        self._thunks = 0
+        self._verbose = verbose
+        self._budget = budget
+        self._trace = trace
+        self._free: Dict[int, FrozenSet[str]] = {}
+        self._compiled: Dict[Tuple[int, Tuple[str, ...]], Code] = {}
+
+    @property
+    def steps(self) -> int:
+        return self._steps
+
+    def free_variables(self, t: ASTBase) -> FrozenSet[str]:
+        """ the free variable names of a node, kept for every node of the term
+
+        :param t: the node
+        :return: the free variable names
+        """
+        free = self._free.get(id(t))
+        if free is None:
+            if isinstance(t, Variable):
+                free = frozenset((t.var_name,))
+            elif isinstance(t, Abstraction):
+                free = self.free_variables(t.body) - {t.var}
+            elif isinstance(t, Application):
+                free = self.free_variables(t.applier) | self.free_variables(t.appliee)
+            else:
+                raise ValueError(f'Cannot compile {t!r}, numerals are only evaluated by the lazy reducer')
+            self._free[id(t)] = free
+        return free
+
+    def compile(self, t: ASTBase, layout: Tuple[str, ...]) -> Code:
+        """ compile a term into a closure
+
+        :param t: the term
+        :param layout: the variable names held by the environment array, in order
+        :return: the code of the term
+        """
+        closed = not self.free_variables(t)
+        key = (id(t), () if closed else layout)
+        code = self._compiled.get(key)
+        if code is None:
+            code = self._compiled[key] = self._compile(t, layout, closed)
+        return code
+
+    def _compile(self, t: ASTBase, layout: Tuple[str, ...], closed: bool) -> Code:
+        if isinstance(t, Variable):
+            if t.var_name not in layout:
+                value = Neutral(t.var_name)
+                return lambda env: value
+            index = layout.index(t.var_name)
+
+            def variable(env: tuple) -> Value:
+                thunk = env[index]
+                value = thunk.value
+                return value if value is not None else _force(thunk)
+            return variable
+
+        elif isinstance(t, Abstraction):
+            # names bound nowhere stay free, compiled as neutral values by the body
+            captured = tuple(sorted(v for v in self.free_variables(t) if v in layout))
+            body = self.compile(t.body, captured + (t.var,))
+            name = t.var
+            if not captured:
+                value = Function(body, (), name)
+                return lambda env: value
+            if len(captured) == 1:
+                index = layout.index(captured[0])
+                return lambda env: Function(body, (env[index],), name)
+            get = itemgetter(*(layout.index(v) for v in captured))
+            return lambda env: Function(body, get(env), name)
+
+        if closed:
+            # evaluated once, wherever it is reached
+            thunk = Thunk(self._compile_application(t, ()), ())
+            return lambda env: thunk.value if thunk.value is not None else _force(thunk)
+        return self._compile_application(t, layout)
+
+    def _argument(self, t: ASTBase, layout: Tuple[str, ...]) -> Callable[[tuple], Thunk]:
+        """ compile the making of the thunk of an argument, sharing the thunk of a variable """
+        if isinstance(t, Variable) and t.var_name in layout:
+            return itemgetter(layout.index(t.var_name))
+        code = self.compile(t, layout)
+        if not self.free_variables(t) or isinstance(t, Variable):
+            thunk = Thunk(code, ())
+            return lambda env: thunk
+        if isinstance(t, Abstraction):
+            return lambda env: Thunk(None, None, code(env))
+
+        if self._budget is None:
+            return lambda env: Thunk(code, env)
+
+        def counted_delay(env: tuple) -> Thunk:
+            self._thunks += 1
+            return Thunk(code, env)
+        return counted_delay
+
+    def _compile_application(self, t: Application, layout: Tuple[str, ...]) -> Code:
+        fun = self.compile(t.applier, layout)
+        arg = self._argument(t.appliee, layout)
+
+        if self._budget is None and not self._verbose and self._trace is None:
+            def application(env: tuple) -> Union[Value, tuple]:
+                f = fun(env)
+                while f.__class__ is tuple:
+                    f = f[0](f[1])
+                if f.__class__ is Function:
+                    self._steps += 1
+                    return f.body, f.env + (arg(env),)
+                return Neutral(f.head, f.args + (arg(env),))
+            return application
+
+        def watched_application(env: tuple) -> Union[Value, tuple]:
+            f = fun(env)
+            while f.__class__ is tuple:
+                f = f[0](f[1])
+            if f.__class__ is Function:
+                self._step(f)
+                return f.body, f.env + (arg(env),)
+            return Neutral(f.head, f.args + (arg(env),))
+        return watched_application
+
+    def _step(self, f: Function) -> None:
+        """ count the application of an abstraction against the budget, tracing or printing it """
+        if self._budget is not None:
+            limit = self._budget.exceeded(self._steps, self._thunks)
+            if limit is not None:
+                raise LimitExceeded(limit, self._steps, None)
+        self._steps += 1
+        if self._trace is not None:
+            if self._trace.wants(self._steps):
+                self._trace.write(self._steps, f'apply fn {f.name}')
+        elif self._verbose:
+            print(f'{self._steps}: apply fn {f.name}')
+
+    def evaluate(self, t: ASTBase) -> Value:
+        """ compile a closed term and evaluate it to weak head normal form
+
+        :param t: the term, its free variables being neutral
+        :return: the value of the term
+        """
+        return _run(self.compile(t, ()), ())
+
+    def quote(self, value: Value, level: int = 0) -> Term:
+        """ read a value back into a normal form, evaluating under binders
+
+        :param value: the value to be read back
+        :param level: the number of binders the value is under
+        :return: the normal form of the value
+        """
+        if isinstance(value, Function):
+            var = Thunk(None, None, Neutral(level))
+            body = _run(value.body, value.env + (var,))
+            return Lam(self.quote(body, level + 1), value.name)
+
+        if isinstance(value.head, int):
+            term = Index(level - 1 - value.head)
+        else:
+            term = Free(value.head)
+        for arg in value.args:
+            term = App(term, self.quote(_force(arg), level))
+        return term
+
+
+def reduce(t: ASTBase, verbose: bool = False, budget: Optional[Budget] = None,
+           trace: Optional[Trace] = None) -> Tuple[ASTBase, int]:
+    """ reduce t to its normal form by normalization by evaluation
+
+    :param t: term to be reduced
+    :param verbose: print every abstraction applied
+    :param budget: limits of the reduction, none by default
+    :param trace: where the abstractions applied are written instead of printed, if given
+    :return: the normal form and the number of reduction steps in a tuple
+    """
+    evaluator = Evaluator(verbose, budget, trace)
+    with recursion_limit():
+        normal_form = evaluator.quote(evaluator.evaluate(t))
+    return to_named(normal_form), evaluator.steps
@@ -0,0 +1,201 @@
+# CSCI 384 term optimizer for Lambda Calculus
+
+"""
+Simplifies the main clause before it is reduced, doing at compile time
+the steps every reduction of it would take:
+
+- definitions used once, and not under an abstraction unless they are
+  one, and small abstractions, are inlined rather than bound, as the
+  redex binding a definition is the first thing reduced anyway
+- redexes of the definition bodies and the main clause are folded where
+  folding cannot duplicate work: the variable is used at most once, and
+  not under an abstraction unless the argument is one, or the argument
+  is a variable or a numeral. `if c t e` becomes `c t e`, `fst p` becomes
+  `p true`
+- a definition inlining leaves unused is no longer bound
+- a definition left bound, applied to as many arguments as it has
+  leading binders wherever it is used, is eta reduced, so `if` would be
+  `fn c => c`
+
+Every fold shrinks the term, so folding ends, even on a term without a
+normal form. Folding is beta reduction, and the eta reduced definitions
+are only used where one beta step makes them the same term again, so the
+normal form is the one the main clause had, with its bound variables
+possibly named differently; only the steps taken to reach it change.
+The rewriting is done on nameless terms, where substitution never
+captures.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+from debruijn import Term, Index, Free, Num, Lam, App, from_named, to_named, shift, substitution, size
+from parser import ASTBase
+from reducer import recursion_limit
+
+# an abstraction of at most this many nodes is inlined wherever it is used
+_INLINE_SIZE = 24
+
+
+def _occurrences(body: Term) -> Tuple[int, bool]:
+    """ how often the variable bound right outside a body occurs in it
+
+    :param body: the body of an abstraction
+    :return: the number of occurrences, and if one of them is under an abstraction of the body
+    """
+    count = 0
+    under = False
+    pending = [(body, 0)]
+    while pending:
+        t, depth = pending.pop()
+        if t.fv <= depth:
+            continue
+        if isinstance(t, Index):
+            if t.index == depth:
+                count += 1
+                under = under or depth > 0
+        elif isinstance(t, Lam):
+            pending.append((t.body, depth + 1))
+        elif isinstance(t, App):
+            pending.append((t.fun, depth))
+            pending.append((t.arg, depth))
+    return count, under
+
+
+def _foldable(body: Term, arg: Term) -> bool:
+    """ if the redex of an abstraction with this body applied to arg can be folded without duplicating work """
+    if isinstance(arg, (Index, Free, Num)):
+        return True
+    count, under = _occurrences(body)
+    return count == 0 or count == 1 and (isinstance(arg, Lam) or not under)
+
+
+def simplify(t: Term) -> Term:
+    """ fold the redexes of a term that can be folded without duplicating work
+
+    :param t: the nameless term
+    :return: the simplified term, t itself if nothing was folded
+    """
+    if isinstance(t, Lam):
+        body = simplify(t.body)
+        return t if body is t.body else Lam(body, t.name, t.origin)
+    if not isinstance(t, App):
+        return t
+    fun = simplify(t.fun)
+    arg = simplify(t.arg)
+    if isinstance(fun, Lam) and _foldable(fun.body, arg):
+        # the substitution may make new redexes where arg is put in
+        return simplify(substitution(fun.body, arg))
+    return t if fun is t.fun and arg is t.arg else App(fun, arg)
+
+
+def _inline(t: Term, values: Dict[str, Term]) -> Term:
+    """ put the values in for the free names they stand for
+
+    :param t: the nameless term
+    :param values: the closed terms put in, by name
+    :return: the term, t itself if no name of values is free in it
+    """
+    if isinstance(t, Free):
+        return values.get(t.name, t)
+    if isinstance(t, Lam):
+        body = _inline(t.body, values)
+        return t if body is t.body else Lam(body, t.name, t.origin)
+    if isinstance(t, App):
+        fun = _inline(t.fun, values)
+        arg = _inline(t.arg, values)
+        return t if fun is t.fun and arg is t.arg else App(fun, arg)
+    return t
+
+
+def _uses(t: Term, uses: Dict[str, List[int]], bound: Optional[Set[str]] = None) -> Dict[str, List[int]]:
+    """ collect the number of arguments every free name of t is applied to, per occurrence
+
+    :param t: the nameless term
+    :param uses: the argument counts by name, added to
+    :param bound: the names occurring under an abstraction of t, added to if given
+    :return: uses
+    """
+    pending = [(t, False)]
+    while pending:
+        node, under = pending.pop()
+        arguments = 0
+        while isinstance(node, App):
+            pending.append((node.arg, under))
+            node = node.fun
+            arguments += 1
+        if isinstance(node, Free):
+            uses.setdefault(node.name, []).append(arguments)
+            if under and bound is not None:
+                bound.add(node.name)
+        elif isinstance(node, Lam):
+            pending.append((node.body, True))
+    return uses
+
+
+def _eta(t: Term) -> Tuple[Term, int]:
+    """ eta reduce the abstractions a term starts with, from the innermost out
+
+    :param t: the nameless term
+    :return: the reduced term, t itself if none reduces, and the number of abstractions t starts with
+    """
+    binders: List[Lam] = []
+    while isinstance(t, Lam):
+        binders.append(t)
+        t = t.body
+    count = len(binders)
+    body = t
+    while binders and isinstance(body, App) and isinstance(body.arg, Index) and body.arg.index == 0 \
+            and _occurrences(body.fun)[0] == 0:
+        body = shift(body.fun, -1)
+        binders.pop()
+    if len(binders) == count:
+        return t if not count else binders[0], count
+    for binder in reversed(binders):
+        body = Lam(body, binder.name, binder.origin)
+    return body, count
+
+
+def optimize(main: ASTBase, defs: Mapping[str, ASTBase]) -> Tuple[ASTBase, Dict[str, ASTBase]]:
+    """ optimize a main clause together with the definitions it uses
+
+    :param main: the main clause
+    :param defs: the definitions main uses, in the order they are bound around it
+    :return: the main clause optimized, and the definitions it still uses, in the same order
+    """
+    with recursion_limit():
+        terms = {name: from_named(d) for name, d in defs.items()}
+        clause = from_named(main)
+        uses: Dict[str, List[int]] = {}
+        bound: Set[str] = set()
+        for t in (*terms.values(), clause):
+            _uses(t, uses, bound)
+
+        inlined: Dict[str, Term] = {}
+        kept: Dict[str, Term] = {}
+        for name, t in terms.items():
+            t = simplify(_inline(t, inlined))
+            # a definition using itself, or one bound after it, on a cycle, stays bound
+            later = set(_uses(t, {})).intersection(terms).difference(inlined, kept)
+            # as with a fold, a definition is only copied if copying it duplicates no work: one used once
+            # under an abstraction would be computed again on every application of that abstraction
+            copyable = isinstance(t, (Lam, Index, Free, Num)) and size(t) <= _INLINE_SIZE
+            once = len(uses.get(name, ())) <= 1 and (isinstance(t, Lam) or name not in bound)
+            if not later and (copyable or once):
+                inlined[name] = t
+            else:
+                kept[name] = t
+        clause = simplify(_inline(clause, inlined))
+
+        # the definitions still used, by main or by the ones it uses
+        live = _uses(clause, {})
+        for name in reversed(list(kept)):
+            if name in live:
+                _uses(kept[name], live)
+        kept = {name: t for name, t in kept.items() if name in live}
+        for name, t in kept.items():
+            reduced, binders = _eta(t)
+            if reduced is not t and min(live[name]) >= binders:
+                kept[name] = reduced
+
+        return to_named(clause), {name: to_named(t) for name, t in kept.items()}
@@ -5,21 +5,56 @@
 <term> ::= <term> <term>
 <term> ::= <name> | ( <term> )
 <def>  ::= <name> := <term>;
+
+With native numerals, an integer literal is kept as one Numeral node
+instead of being expanded into applications of `succ` to `zero`.
+
+The main clause is assembled with the definitions it depends on either
+nested, applying an abstraction over each definition's name to the
+definition, or shared, putting in the definition's node itself wherever
+its name is used. A shared main clause starts out as the nested one is
+once its definitions are substituted in, with the definitions held once
+rather than copied into every use.
+
+The definitions the main clause depends on are found in the dependency
+index of all definitions, and bound in its topological order, so a
+definition may use one defined after it. Any definition can be the entry
+point the main clause is assembled from, `main` by default.
 """
 from __future__ import annotations
 
-from copy import deepcopy
+import hashlib
+import os
 from pathlib import Path
-from typing import Optional, Mapping, List, Iterable, Set
+from typing import Callable, Optional, Mapping, List, Iterable, Iterator, Set, Dict, FrozenSet, Tuple
+from weakref import WeakValueDictionary
 
-from tokenizer import TokenStream
+import cache
+from primitives import DELTA_RULES
+from tokenizer import TokenStream, TokenCursor
 
 
 _VARIABLE = 'Variable'
 _ABSTRACTION = 'Abstraction'
 _APPLICATION = 'Application'
+_NUMERAL = 'Numeral'
+
+# the definition assembled into the main clause unless another entry point is given
+MAIN_ENTRY = 'main'
+
+# the supporting code is read from next to this module, or from the files $LC_PRELUDE lists
+_PRELUDE_PATHS = 'LC_PRELUDE'
+_DEFAULT_PRELUDE = Path(__file__).resolve().parent / 'fundaments.lc'
 
-_MAIN_ENTRY = 'main'
+# how the main clause is assembled with the definitions it depends on
+NESTED = 'nested'  # one redex per definition wrapped around it, substituted in by the reducer
+SHARED = 'shared'  # every reference resolved to the one node of its definition, as the parser's ASTs share nodes
+ASSEMBLIES = (NESTED, SHARED)
+
+# parse_term stack frames, open while their term is being parsed
+_OPEN_ABSTRACTION = 0
+_OPEN_PARENTHESIS = 1
+_OPEN_APPLICATION = 2
 
 
 def _read_supporting_code(ps: Iterable[Path]) -> str:
@@ -36,11 +71,42 @@ def _read_supporting_code(ps: Iterable[Path]) -> str:
     return '\n'.join(content)
 
 
+def _prelude_paths() -> List[Path]:
+    """ the supporting code paths, $LC_PRELUDE split on os.pathsep if it is set
+
+    :return: paths
+    """
+    configured = os.environ.get(_PRELUDE_PATHS)
+    if configured:
+        return [Path(p) for p in configured.split(os.pathsep) if p]
+    return [_DEFAULT_PRELUDE]
+
+
 class ASTBase:
-    """ AST Base class """
-    def __init__(self, label: str, *args):
-        self.label = label
-        self.args = args
+    """ AST Base class
+
+    nodes are immutable. Nodes made with the `shared` constructors are
+    hash-consed: making one equal to a shared node that is still alive
+    gives back that same node, so identical subterms (the `succ` and `zero`
+    of every integer literal, say) share storage. The parser only makes
+    shared nodes; reducers use the plain constructors for their short-lived
+    intermediate terms.
+    """
+    __slots__ = ['__weakref__']
+    label: str = ''
+
+    @property
+    def args(self) -> tuple:
+        return ()
+
+    @classmethod
+    def _shared(cls, *args):
+        """ the live shared node for args, made if there is none """
+        node = cls._nodes.get(args)
+        if node is None:
+            node = cls(*args)
+            cls._nodes[args] = node
+        return node
 
     def __repr__(self):
         return self.__str__()
@@ -48,46 +114,471 @@ class ASTBase:
     def __str__(self):
         return str([self.label, *self.args])
 
+    def __reduce__(self):
+        return type(self)._shared, self.args
+
 
 class Variable(ASTBase):
     """ Variable class """
+    __slots__ = ['var_name']
+    label = _VARIABLE
+    _nodes = WeakValueDictionary()
+
     def __init__(self, var_name: str):
-        super().__init__(_VARIABLE, var_name)
         self.var_name = var_name
 
+    @classmethod
+    def shared(cls, var_name: str) -> Variable:
+        return cls._shared(var_name)
+
+    @property
+    def args(self) -> tuple:
+        return self.var_name,
+
     def __repr__(self):
         return str(self)
 
     def __str__(self):
-        return f'VA"{self.var_name}"'
+        return serialize(self)
 
 
 class Abstraction(ASTBase):
     """ Abstraction class """
+    __slots__ = ['var', 'body']
+    label = _ABSTRACTION
+    _nodes = WeakValueDictionary()
+
     def __init__(self, var: str, term: ASTBase):
-        super().__init__(_ABSTRACTION, var, term)
         self.var = var
         self.body = term
 
+    @classmethod
+    def shared(cls, var: str, term: ASTBase) -> Abstraction:
+        return cls._shared(var, term)
+
+    @property
+    def args(self) -> tuple:
+        return self.var, self.body
+
     def __repr__(self):
         return str(self)
 
     def __str__(self):
-        return f'LM("{str(self.var)}",{str(self.body)})'
+        return serialize(self)
 
 
 class Application(ASTBase):
     """ Application class """
+    __slots__ = ['applier', 'appliee']
+    label = _APPLICATION
+    _nodes = WeakValueDictionary()
+
     def __init__(self, term1: ASTBase, term2: ASTBase):
-        super().__init__(_APPLICATION, term1, term2)
         self.applier = term1
         self.appliee = term2
 
+    @classmethod
+    def shared(cls, term1: ASTBase, term2: ASTBase) -> Application:
+        return cls._shared(term1, term2)
+
+    @property
+    def args(self) -> tuple:
+        return self.applier, self.appliee
+
     def __repr__(self):
         return str(self)
 
     def __str__(self):
-        return f'AP({str(self.applier)},{str(self.appliee)})'
+        return serialize(self)
+
+
+class Numeral(ASTBase):
+    """ Numeral class, an integer literal in native numeral mode """
+    __slots__ = ['value']
+    label = _NUMERAL
+    _nodes = WeakValueDictionary()
+
+    def __init__(self, value: int):
+        self.value = value
+
+    @classmethod
+    def shared(cls, value: int) -> Numeral:
+        return cls._shared(value)
+
+    @property
+    def args(self) -> tuple:
+        return self.value,
+
+    def __repr__(self):
+        return str(self)
+
+    def __str__(self):
+        return serialize(self)
+
+
+def free_variables(df: ASTBase) -> FrozenSet[str]:
+    """ the variable names occurring free in a term
+
+    :param df: the term
+    :return: the free variable names
+    """
+    container = set()
+    bound = {}
+    # a name on the stack leaves the scope of its binder
+    pending = [df]
+    while pending:
+        t = pending.pop()
+        if isinstance(t, str):
+            bound[t] -= 1
+        elif isinstance(t, Variable):
+            if not bound.get(t.var_name):
+                container.add(t.var_name)
+        elif isinstance(t, Abstraction):
+            bound[t.var] = bound.get(t.var, 0) + 1
+            pending.append(t.var)
+            pending.append(t.body)
+        elif isinstance(t, Application):
+            pending.append(t.appliee)
+            pending.append(t.applier)
+        elif not isinstance(t, Numeral):
+            raise Exception(f'Encounter unknown definition {t}')
+
+    return frozenset(container)
+
+
+def resolve(t: ASTBase, values: Mapping[str, ASTBase],
+            free: Mapping[str, FrozenSet[str]]) -> Optional[ASTBase]:
+    """ put terms in for the free occurrences of their names, by reference
+
+    every occurrence is the same node of the value, no copy of it is made
+    :param t: the term
+    :param values: the terms put in, by the names they stand for
+    :param free: the free variable names of every value
+    :return: the term, or None if a binder of t would capture a free variable of a value
+    """
+    results = []
+    bound = {}
+    # a name on the stack leaves the scope of its binder, a 1-tuple rebuilds its node from the results
+    pending = [t]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, str):
+            bound[item] -= 1
+        elif isinstance(item, tuple):
+            node = item[0]
+            if isinstance(node, Abstraction):
+                body = results.pop()
+                results.append(node if body is node.body else Abstraction.shared(node.var, body))
+            else:
+                appliee = results.pop()
+                applier = results.pop()
+                results.append(node if applier is node.applier and appliee is node.appliee
+                               else Application.shared(applier, appliee))
+        elif isinstance(item, Variable):
+            name = item.var_name
+            if name in values and not bound.get(name):
+                if any(bound.get(v) for v in free[name]):
+                    return None
+                results.append(values[name])
+            else:
+                results.append(item)
+        elif isinstance(item, Abstraction):
+            bound[item.var] = bound.get(item.var, 0) + 1
+            pending.append((item,))
+            pending.append(item.var)
+            pending.append(item.body)
+        elif isinstance(item, Application):
+            pending.append((item,))
+            pending.append(item.appliee)
+            pending.append(item.applier)
+        else:
+            results.append(item)
+    return results[0]
+
+
+def nest(main: ASTBase, defs: Mapping[str, ASTBase]) -> ASTBase:
+    """ wrap a main clause in one redex per definition, binding its name to it
+
+    :param main: the main clause
+    :param defs: the definitions, the first bound outermost
+    :return: the assembled main clause
+    """
+    main_clause = main
+    for var_name in reversed(list(defs)):
+        # wrap from the innermost binder out, the last definition first
+        main_clause = Application.shared(Abstraction.shared(var_name, main_clause), defs[var_name])
+    return main_clause
+
+
+def share(main: ASTBase, defs: Mapping[str, ASTBase],
+          free_vars: Callable[[str, ASTBase], FrozenSet[str]] = lambda _, d: free_variables(d)
+          ) -> Tuple[Optional[ASTBase], Dict[str, ASTBase]]:
+    """ resolve the definitions of a main clause by reference
+
+    each definition is resolved against the ones before it, the names
+    the nested main clause would have bound around it
+    :param main: the main clause
+    :param defs: the definitions, in the order nest would bind them
+    :param free_vars: the free variable names of a definition, given its name and term
+    :return: the main clause, None if a definition would be captured by a binder, and
+             the definitions resolved
+    """
+    values: Dict[str, ASTBase] = {}
+    free: Dict[str, FrozenSet[str]] = {}
+    for var_name, definition in defs.items():
+        resolved = resolve(definition, values, free)
+        if resolved is None:
+            return None, values
+        names = free_vars(var_name, definition)
+        free[var_name] = frozenset(v for v in names if v not in values).union(
+            *(free[v] for v in names if v in values))
+        values[var_name] = resolved
+    return resolve(main, values, free), values
+
+
+def serialize(t: ASTBase, variable: str = 'VA"{}"', abstraction: str = 'LM("{}",') -> str:
+    """ format a term as sml term datatype source
+
+    a numeral is written out as its church numeral
+    :param t: the term
+    :param variable: format of a variable, given its name
+    :param abstraction: format of the opening of an abstraction, given its variable
+    :return: the formatted term
+    """
+    out = []
+    # strings on the stack are written out as they are
+    pending = [t]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, str):
+            out.append(item)
+        elif isinstance(item, Variable):
+            out.append(variable.format(item.var_name))
+        elif isinstance(item, Abstraction):
+            out.append(abstraction.format(item.var))
+            pending.append(')')
+            pending.append(item.body)
+        elif isinstance(item, Application):
+            out.append('AP(')
+            pending.append(')')
+            pending.append(item.appliee)
+            pending.append(',')
+            pending.append(item.applier)
+        elif isinstance(item, Numeral):
+            out.append(abstraction.format('f') + abstraction.format('a'))
+            out.append(f'AP({variable.format("f")},' * item.value)
+            out.append(variable.format('a') + ')' * item.value + '))')
+        else:
+            out.append(str(item))
+    return ''.join(out)
+
+
+def _topological_order(names: List[str], uses: Mapping[str, FrozenSet[str]]) -> List[str]:
+    """ order names after the names they use, and otherwise as given
+
+    :param names: the names, in source order
+    :param uses: the names each name uses, names not among names ignored
+    :return: the names, a cycle broken where the walk comes back to a name on it
+    """
+    # names mostly only use the ones before them, already in order then
+    members = set(names)
+    placed = set()
+    for name in names:
+        if not members.isdisjoint(uses[name] - placed):
+            break
+        placed.add(name)
+    else:
+        return list(names)
+
+    position = {name: i for i, name in enumerate(names)}
+
+    def used_by(name: str) -> Iterator[str]:
+        return iter(sorted((u for u in uses[name] if u in position), key=position.__getitem__))
+
+    order = []
+    seen = set()
+    for root in names:
+        if root in seen:
+            continue
+        seen.add(root)
+        stack = [(root, used_by(root))]
+        while stack:
+            name, pending = stack[-1]
+            for used in pending:
+                if used not in seen:
+                    seen.add(used)
+                    stack.append((used, used_by(used)))
+                    break
+            else:
+                stack.pop()
+                order.append(name)
+    return order
+
+
+class DependencyIndex:
+    """ DependencyIndex class
+    The dependency graph of a set of definitions: the definitions each one
+    uses, an order in which every definition comes after the ones it uses,
+    and the definitions an entry point reaches. It is built once per set of
+    definitions; the prelude's is kept with the Prelude, and a program's
+    index extends it with the program's own definitions only.
+
+    A definition using its own name uses the definition it replaces, which
+    is gone, so that is no edge.
+    """
+
+    __slots__ = ['uses', 'order', 'undefined', '_reachable']
+
+    def __init__(self, uses: Dict[str, FrozenSet[str]], order: List[str],
+                 undefined: Dict[str, FrozenSet[str]]) -> None:
+        """ init index
+
+        :param uses: the definitions each definition uses, in source order
+        :param order: the definitions in a topological order
+        :param undefined: the free names of a definition that are not defined, for the definitions having any
+        """
+        self.uses = uses
+        self.order = order
+        self.undefined = undefined
+        self._reachable: Dict[Tuple[str, FrozenSet[str]], FrozenSet[str]] = {}
+
+    @staticmethod
+    def _edges(free_vars: Mapping[str, FrozenSet[str]], names: Set[str], uses: Dict[str, FrozenSet[str]],
+               undefined: Dict[str, FrozenSet[str]]) -> None:
+        """ split free variables into uses of the names and undefined names """
+        for name, fv in free_vars.items():
+            uses[name] = fv.intersection(names).difference((name,))
+            missing = fv.difference(names, (name,))
+            if missing:
+                undefined[name] = missing
+            else:
+                undefined.pop(name, None)
+
+    @classmethod
+    def build(cls, free_vars: Mapping[str, FrozenSet[str]]) -> DependencyIndex:
+        """ index definitions
+
+        :param free_vars: the free variable names of each definition, in source order
+        :return: the index
+        """
+        uses: Dict[str, FrozenSet[str]] = {}
+        undefined: Dict[str, FrozenSet[str]] = {}
+        cls._edges(free_vars, set(free_vars), uses, undefined)
+        return cls(uses, _topological_order(list(uses), uses), undefined)
+
+    def extend(self, free_vars: Mapping[str, FrozenSet[str]]) -> DependencyIndex:
+        """ index definitions on top of these, as a program's are on top of the prelude's
+
+        the edges of the definitions indexed already are reused, but for those
+        using a name only now defined
+        :param free_vars: the free variable names of each definition added or replaced, in source order
+        :return: the index of all the definitions
+        """
+        if not free_vars:
+            return self
+        uses = dict(self.uses)
+        undefined = dict(self.undefined)
+        names = set(uses).union(free_vars)
+        self._edges(free_vars, names, uses, undefined)
+        gained = [name for name, missing in self.undefined.items()
+                  if name not in free_vars and not missing.isdisjoint(free_vars)]
+        self._edges({name: self.uses[name] | self.undefined[name] for name in gained}, names, uses, undefined)
+
+        if gained or any(name in self.uses for name in free_vars):
+            order = _topological_order(list(uses), uses)
+        else:
+            # the definitions indexed already use none of the new ones, which go after them
+            order = self.order + _topological_order(list(free_vars), uses)
+        return DependencyIndex(uses, order, undefined)
+
+    def reachable(self, entry: str, exclude: FrozenSet[str] = frozenset()) -> FrozenSet[str]:
+        """ the definitions an entry point depends on
+
+        :param entry: name of the entry point
+        :param exclude: names neither included nor followed, as the primitives
+        :return: the names, the entry point's only if it is on a cycle
+        """
+        key = (entry, exclude)
+        found = self._reachable.get(key)
+        if found is None:
+            container = set()
+            pending = [entry]
+            while pending:
+                for name in self.uses.get(pending.pop(), ()):
+                    if name not in container and name not in exclude:
+                        container.add(name)
+                        pending.append(name)
+            found = self._reachable[key] = frozenset(container)
+        return found
+
+    def __getstate__(self):
+        return self.uses, self.order, self.undefined
+
+    def __setstate__(self, state):
+        self.uses, self.order, self.undefined = state
+        self._reachable = {}
+
+
+class Prelude:
+    """ Prelude class
+    The parsed supporting code every Definition is parsed on top of. It is
+    parsed once per process, and kept on disk between processes, keyed on
+    a hash of its source, so a changed fundaments.lc is parsed again.
+    """
+    # bump when the parsed representation changes, invalidating the disk cache
+    _VERSION = 2
+    _loaded: Dict[str, Prelude] = {}
+
+    __slots__ = ['defs', 'tokens', 'free_vars', 'index']
+
+    def __init__(self, defs: Dict[str, ASTBase], tokens: List[str],
+                 free_vars: Dict[str, FrozenSet[str]]) -> None:
+        """ init prelude
+
+        :param defs: the definitions, in source order
+        :param tokens: the tokens of the source, without the eof
+        :param free_vars: the free variable names of each definition
+        """
+        self.defs = defs
+        self.tokens = tokens
+        self.free_vars = free_vars
+        self.index = DependencyIndex.build(free_vars)
+
+    @classmethod
+    def parse(cls, src: str) -> Prelude:
+        """ tokenizes and parses the supporting code
+
+        :param src: the supporting code src
+        :return: the parsed prelude
+        """
+        df = Definition(src)
+        tokens = TokenStream(src)
+        df.parse_program(tokens.cursor())
+        return cls(df.defs, tokens.tokens[:-1], {name: free_variables(d) for name, d in df.defs.items()})
+
+    @classmethod
+    def load(cls, src: str) -> Prelude:
+        """ the parsed supporting code, from the process or the disk cache if possible
+
+        :param src: the supporting code src
+        :return: the parsed prelude
+        """
+        key = hashlib.sha256(f'{cls._VERSION}\n{src}'.encode()).hexdigest()
+        prelude = cls._loaded.get(key)
+        if prelude is None:
+            cache_name = f'prelude-{key}.pickle'
+            prelude = cache.read_pickle(cache_name)
+            if not isinstance(prelude, cls):
+                prelude = cls.parse(src)
+                cache.write_pickle(cache_name, prelude)
+            cls._loaded[key] = prelude
+        return prelude
+
+    def __getstate__(self):
+        return self.defs, self.tokens, self.free_vars, self.index
+
+    def __setstate__(self, state):
+        self.defs, self.tokens, self.free_vars, self.index = state
 
 
 class Definition:
@@ -95,21 +586,50 @@ class Definition:
     The definition class handles lambda calculus source code parsing
     and the final main clause formatting with dependent tree shaking
     """
-    _LC_SUPPORT_CODES = [Path('fundaments.lc')]
-    _SUPPORTING_CODE = _read_supporting_code(_LC_SUPPORT_CODES)
+    # read on first use, so importing the parser touches no file
+    _LC_SUPPORT_CODES: Optional[List[Path]] = None
+    _SUPPORTING_CODE: Optional[str] = None
 
-    __slots__ = ['_src', '_tokens', '_defs', '_main', '_dependent_tree']
+    __slots__ = ['_src', '_native_numerals', '_assembly', '_entry', '_optimize', '_tokens', '_defs', '_main',
+                 '_dependent_tree', '_prelude', '_index', '_primitives', '_environment']
 
-    def __init__(self, src: str) -> None:
+    def __init__(self, src: str, native_numerals: bool = False, assembly: str = NESTED,
+                 entry: str = MAIN_ENTRY, optimize: bool = False) -> None:
         """ init definition, taking in the src
 
         :param src: lc source string
+        :param native_numerals: keep integer literals as numerals, and leave the prelude
+                                combinators with delta rules free for the reducer to evaluate
+        :param assembly: how the main clause is assembled, `nested` or `shared`
+        :param entry: the definition the main clause is assembled from, `main` by default
+        :param optimize: simplify the main clause with optimizer.py before it is reduced
         """
+        if assembly not in ASSEMBLIES:
+            raise ValueError(f'Unknown assembly {assembly}. Only accepts {", ".join(ASSEMBLIES)}.')
         self._src: str = src
+        self._native_numerals = native_numerals
+        self._assembly = assembly
+        self._entry = entry
+        self._optimize = optimize
         self._tokens: Optional[TokenStream] = None
         self._defs = {}
         self._main: Optional[ASTBase] = None
         self._dependent_tree: Optional[Set] = None
+        self._prelude: Optional[Prelude] = None
+        self._index: Optional[DependencyIndex] = None
+        self._primitives: FrozenSet[str] = frozenset()
+        self._environment: Optional[Dict[str, ASTBase]] = None
+
+    def _free_variables(self, var_name: str, df: ASTBase) -> FrozenSet[str]:
+        """ free variable names of a definition, cached for the prelude ones
+
+        :param var_name: name of the definition
+        :param df: the definition
+        :return: the free variable names
+        """
+        if self._prelude is not None and self._prelude.defs.get(var_name) is df:
+            return self._prelude.free_vars[var_name]
+        return free_variables(df)
 
     def _tree_shaking(self) -> None:
         """ tree shaking handler
@@ -119,63 +639,128 @@ class Definition:
         if self._dependent_tree is not None:
             return
 
-        def _tree_shaking_helper(df: ASTBase, container: Set, *exclude) -> Set:
-            """ recursively resolve clause dependency
-
-            :param df: definition to be resolved
-            :param container: dependency container
-            :param exclude: var to be excluded
-            :return: the dependency container
-            """
-            if isinstance(df, Variable):
-                vn = df.var_name
-                if vn not in container and vn in self.defs and vn not in exclude:
-                    container.add(vn)
-                    _tree_shaking_helper(self.defs[vn], container)
-            elif isinstance(df, Abstraction):
-                _tree_shaking_helper(df.body, container, df.var, *exclude)
-            elif isinstance(df, Application):
-                _tree_shaking_helper(df.applier, container, *exclude)
-                _tree_shaking_helper(df.appliee, container, *exclude)
-            else:
-                raise Exception(f'Encounter unknown definition {df}')
-
-            return container
-
-        main_clause = self.defs.get(_MAIN_ENTRY, None)
-        if main_clause is None:
-            print('there is no main clause to shake')
+        if self._entry not in self.defs:
+            print(f'there is no {self._entry} clause to shake')
             return
 
-        self._dependent_tree = _tree_shaking_helper(main_clause, set())
+        self._dependent_tree = set(self.index.reachable(self._entry, self._primitives))
 
     @property
     def dependent_tree(self) -> Set:
         return self._dependent_tree
 
+    @property
+    def index(self) -> DependencyIndex:
+        """ the dependency graph of the definitions, the prelude's extended by the program's """
+        if self._index is None:
+            if self._prelude is None:
+                self._index = DependencyIndex.build({name: free_variables(d) for name, d in self._defs.items()})
+            else:
+                self._index = self._prelude.index.extend({
+                    name: free_variables(d) for name, d in self._defs.items()
+                    if self._prelude.defs.get(name) is not d
+                })
+        return self._index
+
+    @property
+    def entry(self) -> str:
+        return self._entry
+
+    @property
+    def optimize(self) -> bool:
+        return self._optimize
+
+    @property
+    def dependencies(self) -> Dict[str, ASTBase]:
+        """ the definitions the entry point depends on, in the order they are bound """
+        return {name: self._defs[name] for name in self._dependencies()}
+
+    def _dependencies(self) -> List[str]:
+        """ the definitions the entry point depends on, each after the ones it uses """
+        return [name for name in self.index.order if name in self.dependent_tree and name != self._entry]
+
     @property
     def formatted_main(self) -> Optional[ASTBase]:
         if self._main is not None:
             return self._main
 
-        if _MAIN_ENTRY not in self._defs:
+        if self._entry not in self._defs:
             return None
 
-        main_clause: ASTBase = self._defs[_MAIN_ENTRY]
-        for var_name, definition in list(reversed(self._defs.items()))[1:]:
-            # reverse the definition dictionary and make it a list
-            # omit the first entry which the main and begin wrapping
-            if var_name in self.dependent_tree:
-                main_clause = Application(
-                    Abstraction(var_name, main_clause), definition
-                )
+        main_clause = self._defs[self._entry]
+        defs = self.dependencies
+        if self._optimize:
+            # the optimizer works on the nameless terms of debruijn.py, which imports this module
+            import optimizer
+            main_clause, defs = optimizer.optimize(main_clause, defs)
+
+        if self._assembly == SHARED:
+            shared, values = share(main_clause, defs, self._free_variables)
+            if shared is not None:
+                self._environment = values
+                self._main = shared
+                return shared
+            print('Warning: a definition would be captured by a binder, the main clause is nested instead')
+            self._assembly = NESTED
+            self._environment = None
+
+        self._main = nest(main_clause, defs)
+        return self._main
+
+    @property
+    def assembly(self) -> str:
+        return self._assembly
+
+    @property
+    def environment(self) -> Dict[str, ASTBase]:
+        """ the definitions the main clause depends on, in the order they are bound,
+        as the shared main clause holds them """
+        if self._environment is None:
+            self.formatted_main
+        if self._environment is None:
+            return self.dependencies
+        return self._environment
+
+    @property
+    def native_numerals(self) -> bool:
+        return self._native_numerals
+
+    @property
+    def primitives(self) -> FrozenSet[str]:
+        """ the names left free in the formatted main for their delta rules
+
+        these are the prelude's own definitions with a delta rule, in native
+        numeral mode only; a redefined one is an ordinary definition
+        """
+        return self._primitives
+
+    @property
+    def supporting_defs(self) -> Dict[str, ASTBase]:
+        """ the definitions besides the entry point, which the primitives fall back on """
+        return {name: d for name, d in self._defs.items() if name != self._entry}
+
+    @classmethod
+    def supporting_code(cls) -> str:
+        """ the supporting code every definition is parsed on top of, read on first use
+
+        :return: the supporting code src
+        """
+        if cls._SUPPORTING_CODE is None:
+            cls._SUPPORTING_CODE = _read_supporting_code(cls._LC_SUPPORT_CODES or _prelude_paths())
+        return cls._SUPPORTING_CODE
 
-        self._main = main_clause
-        return main_clause
+    @classmethod
+    def use_supporting_code(cls, ps: Optional[Iterable[Path]]) -> None:
+        """ parse definitions on top of other supporting code from now on
+
+        :param ps: paths of the supporting code, None for $LC_PRELUDE or fundaments.lc
+        """
+        cls._LC_SUPPORT_CODES = None if ps is None else [Path(p) for p in ps]
+        cls._SUPPORTING_CODE = None
 
     @property
     def src(self) -> str:
-        return self._SUPPORTING_CODE + '\n' + self._src
+        return self.supporting_code() + '\n' + self._src
 
     @property
     def raw_src(self) -> str:
@@ -187,72 +772,119 @@ class Definition:
 
     @property
     def tokens(self) -> List:
-        return self._tokens.tokens if self._tokens is not None else None
+        if self._tokens is None:
+            return None
+        return self._prelude.tokens + self._tokens.tokens
 
     def init(self) -> None:
         """ init parser internals """
         self._defs = {}
         self._tokens = None
         self._main = None
+        self._dependent_tree = None
+        self._prelude = None
+        self._index = None
+        self._primitives = frozenset()
+        self._environment = None
 
     def parse(self) -> Mapping[str, ASTBase]:
-        """ tokenizes the src and parses it """
+        """ tokenizes the src and parses it on top of the prelude """
         self.init()
-        self._tokens = TokenStream(self.src)
-        self.parse_term(deepcopy(self._tokens))
-        if _MAIN_ENTRY not in self.defs:
-            print('Warning: main is not defined')
+        self._prelude = Prelude.load(self.supporting_code())
+        self._defs = dict(self._prelude.defs)
+        self._tokens = TokenStream(self._src)
+        self.parse_program(self._tokens.cursor())
+        if self._native_numerals:
+            # a primitive is native only if neither it nor a definition it reaches is redefined
+            self._primitives = frozenset(
+                name for name in DELTA_RULES
+                if name in self._prelude.defs and self._defs[name] is self._prelude.defs[name]
+                and all(self._defs.get(used) is self._prelude.defs.get(used) for used in self.index.reachable(name))
+            )
+            if not {'succ', 'zero'} <= self._primitives:
+                # integer literals stand for the redefined succ and zero, parse them as such
+                print('Warning: succ or zero is redefined, native numerals are turned off')
+                self._native_numerals = False
+                self._primitives = frozenset()
+                self._defs = dict(self._prelude.defs)
+                self._index = None
+                self.parse_program(self._tokens.cursor())
+        if self._entry not in self.defs:
+            print(f'Warning: {self._entry} is not defined')
         self._tree_shaking()
         return self.defs
 
-    def parse_term(self, tokens: TokenStream, is_app=False) -> Optional[ASTBase]:
-        """ The parsing helper """
-        if tokens.next() == "fn":
-            tokens.eat('fn')
-            name = tokens.eatName()
-            tokens.eat('=>')
-            term = self.parse_term(tokens)
-            r = Abstraction(name, term)
-
-        elif tokens.next() == "(":
-            tokens.eat("(")
-            term = self.parse_term(tokens)
-            tokens.eat(")")
-            r = term
-
-        elif tokens.nextIsName():
+    def parse_program(self, tokens: TokenCursor) -> None:
+        """ parse definitions up to the eof into the definitions dict """
+        while tokens.next() != 'eof':
             name = tokens.eatName()
-            r = Variable(name)
-            if tokens.next() == ':=':
-                tokens.eat(':=')
-                term = self.parse_term(tokens)
-                if term is None:
-                    raise SyntaxError('Empty Definition')
-                self._defs[r.var_name] = term
-                tokens.eat(';')
-
-                return self.parse_term(tokens)
-
-        elif tokens.next() == "eof":
-            return None
-
+            tokens.eat(':=')
+            if tokens.next() in (';', 'eof'):
+                raise SyntaxError('Empty Definition')
+            self._defs[name] = self.parse_term(tokens)
+            tokens.eat(';')
+
+    @staticmethod
+    def _starts_term(tokens: TokenCursor) -> bool:
+        """ if the next token begins a term """
+        return tokens.next() in ('fn', '(') or tokens.nextIsName() or tokens.nextIsInt()
+
+    def parse_atom(self, tokens: TokenCursor) -> ASTBase:
+        """ parse a name or an integer literal """
+        if tokens.nextIsName():
+            return Variable.shared(tokens.eatName())
         elif tokens.nextIsInt():
             count = tokens.eatInt()
-            r = Variable('zero')
+            if self._native_numerals:
+                return Numeral.shared(count)
+            r = Variable.shared('zero')
             for _ in range(count):
-                r = Application(Variable('succ'), r)
+                r = Application.shared(Variable.shared('succ'), r)
             return r
-
         else:
-            raise SyntaxError(f'Unexpected token. Expected eof. Saw `{tokens.next()}`.')
-
-        if not is_app:
-            try:
-                next_term = self.parse_term(tokens, True)
-                while next_term is not None:
-                    r = Application(r, next_term)
-                    next_term = self.parse_term(tokens, True)
-            except SyntaxError:
-                pass
-
-        return r
+            where = tokens.report()
+            raise SyntaxError(f'Unexpected token at {where}. Saw: `{tokens.next()}`. Expected a term.')
+
+    def parse_term(self, tokens: TokenCursor) -> ASTBase:
+        """ The parsing helper
+
+        terms are parsed with an explicit stack of the binders, parentheses and
+        application left parts still open, so nesting depth is not bounded by
+        the python recursion limit. An abstraction extends as far right as
+        possible and application associates to the left.
+        """
+        stack = []
+        while True:
+            # open binders and parentheses down to the next atom
+            if tokens.next() == 'fn':
+                tokens.eat('fn')
+                name = tokens.eatName()
+                tokens.eat('=>')
+                stack.append((_OPEN_ABSTRACTION, name))
+                continue
+            elif tokens.next() == '(':
+                tokens.eat('(')
+                stack.append((_OPEN_PARENTHESIS, None))
+                continue
+            r = self.parse_atom(tokens)
+
+            while True:
+                # the atom is applied to the left part of the application
+                if stack and stack[-1][0] == _OPEN_APPLICATION:
+                    r = Application.shared(stack.pop()[1], r)
+                if self._starts_term(tokens):
+                    stack.append((_OPEN_APPLICATION, r))
+                    break
+
+                # nothing more to apply, close everything up to a parenthesis
+                while stack and stack[-1][0] != _OPEN_PARENTHESIS:
+                    kind, left = stack.pop()
+                    if kind == _OPEN_ABSTRACTION:
+                        r = Abstraction.shared(left, r)
+                    else:
+                        r = Application.shared(left, r)
+                if not stack:
+                    return r
+                # the parenthesized term is an atom itself
+                stack.pop()
+                tokens.eat(')')
@@ -0,0 +1,51 @@
+# CSCI 384 delta rules for the numerals of Lambda Calculus
+
+"""
+The arithmetic of fundaments.lc on machine integers. Each rule gives the
+number of numeral arguments a prelude combinator takes and what it gives
+back for them, an integer for a numeral or a bool for `true`/`false`. The
+rules follow the lambda definitions exactly, down to their corner cases:
+`pred zero` is zero, `minus` stops at zero, and `less zero zero` holds
+(and so `equal zero zero` does not), as `less` is `is_zero (minus n (pred m))`.
+They are as lazy as the lambda definitions too: every rule of two
+arguments looks at its second first, as `plus n m` is `m succ n`, and
+where that argument decides the result by itself, the other is never
+evaluated.
+"""
+from __future__ import annotations
+
+from typing import Callable, Dict, Tuple, Union
+
+
+def _pred(n: int) -> int:
+    return n - 1 if n else 0
+
+
+def _minus(n: int, m: int) -> int:
+    return n - m if n > m else 0
+
+
+def _less(n: int, m: int) -> bool:
+    return _minus(n, _pred(m)) == 0
+
+
+DELTA_RULES: Dict[str, Tuple[int, Callable[..., Union[int, bool]]]] = {
+    'zero': (0, lambda: 0),
+    'succ': (1, lambda n: n + 1),
+    'plus': (2, lambda n, m: n + m),
+    'times': (2, lambda n, m: n * m),
+    'power': (2, lambda b, p: b ** p),
+    'pred': (1, _pred),
+    'minus': (2, _minus),
+    'is_zero': (1, lambda n: n == 0),
+    'less': (2, _less),
+    'equal': (2, lambda n, m: not _less(n, m) and not _less(m, n)),
+    'div2': (1, lambda n: n // 2),
+}
+
+# the rules whose result one argument decides by itself, the lambda definition never
+# using the others then: the argument's position, its deciding value and the result
+SHORT_CIRCUITS: Dict[str, Tuple[int, int, int]] = {
+    'times': (1, 0, 0),  # m (n f), and zero never applies n f
+    'power': (1, 0, 1),  # p (times b) (succ zero), and zero never applies times b
+}
@@ -0,0 +1,192 @@
+# CSCI 384 reduction profiler for Lambda Calculus
+
+"""
+Profiles a normal order reduction on nameless terms (the de Bruijn
+reducer, whose steps are the sml interpreter's). Every abstraction is
+tagged with the definition it comes from, and the tag is kept through
+every copy substitution makes, so each beta step is attributed to the
+definition whose lambda was applied. The steps, the term size growth and
+the time spent contracting are summed per definition, and the size of the
+whole term is recorded after every step.
+
+The abstractions the main clause is wrapped in to bind the definitions
+are attributed to `(let)`, anything left untagged to `(anonymous)`.
+"""
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from budget import Budget
+from debruijn import App, Lam, from_named, to_named, plug, search, contract, size, _IN_FUN
+from parser import ASTBase, Abstraction, Application, Definition, SHARED
+from reducer import recursion_limit
+
+_LET = '(let)'
+_ANONYMOUS = '(anonymous)'
+
+
+def origins(df: Definition) -> Dict[int, str]:
+    """ the definition each abstraction node of the formatted main comes from
+
+    a subterm shared by several definitions is attributed to the first of
+    them in source order, which for a shared main clause is the definition
+    the others refer to
+    :param df: parsed lambda definition
+    :return: the definition names by abstraction node ids
+    """
+    definitions = dict(df.environment)
+    definitions[df.entry] = df.formatted_main if df.assembly == SHARED else df.defs[df.entry]
+    names: Dict[int, str] = {}
+    seen: Set[int] = set()
+    for name, definition in definitions.items():
+        pending = [definition]
+        while pending:
+            node = pending.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            if isinstance(node, Abstraction):
+                names.setdefault(id(node), name)
+                pending.append(node.body)
+            elif isinstance(node, Application):
+                pending.append(node.applier)
+                pending.append(node.appliee)
+
+    if df.assembly == SHARED:
+        return names
+
+    # the binders of the definitions wrapped around main
+    node = df.formatted_main
+    while isinstance(node, Application) and isinstance(node.applier, Abstraction) \
+            and node.applier.var in df.dependent_tree:
+        names[id(node.applier)] = _LET
+        node = node.applier.body
+    return names
+
+
+class DefinitionProfile:
+    """ what the steps applying one definition's lambdas added up to """
+    __slots__ = ['steps', 'size_delta', 'seconds']
+
+    def __init__(self) -> None:
+        self.steps = 0
+        self.size_delta = 0
+        self.seconds = 0.0
+
+
+class Profile:
+    """ Profile class
+    The result of a profiled reduction
+    """
+
+    __slots__ = ['steps', 'sizes', 'definitions', 'seconds', 'term', 'limit']
+
+    def __init__(self) -> None:
+        self.steps = 0
+        self.sizes: List[int] = []
+        self.definitions: Dict[str, DefinitionProfile] = {}
+        self.seconds = 0.0
+        self.term: Optional[ASTBase] = None  # the normal form, or the partial term if stopped by a limit
+        self.limit: Optional[str] = None
+
+    @property
+    def peak_size(self) -> int:
+        return max(self.sizes)
+
+    def to_json(self) -> dict:
+        """ the profile as a json serializable dict
+
+        :return: the profile
+        """
+        return {
+            'steps': self.steps,
+            'seconds': self.seconds,
+            'limit': self.limit,
+            'initial_size': self.sizes[0],
+            'final_size': self.sizes[-1],
+            'peak_size': self.peak_size,
+            'sizes': self.sizes,
+            'definitions': {
+                name: {'steps': d.steps, 'size_delta': d.size_delta, 'seconds': d.seconds}
+                for name, d in self._ranked()
+            },
+        }
+
+    def _ranked(self) -> List:
+        return sorted(self.definitions.items(), key=lambda item: (-item[1].steps, item[0]))
+
+    def table(self) -> str:
+        """ the summary table, the definitions applied most first
+
+        :return: the formatted table
+        """
+        lines = [f'{"definition":<16} {"steps":>9} {"share":>7} {"size delta":>11} {"seconds":>9}']
+        for name, d in self._ranked():
+            share = d.steps / self.steps if self.steps else 0
+            lines.append(f'{name:<16} {d.steps:>9} {share:>7.1%} {d.size_delta:>11} {d.seconds:>9.4f}')
+        lines.append(f'{"total":<16} {self.steps:>9} {"":>7} {self.sizes[-1] - self.sizes[0]:>11} '
+                     f'{self.seconds:>9.4f}')
+        lines.append(f'term size: {self.sizes[0]} initial, {self.peak_size} peak, {self.sizes[-1]} final')
+        if self.limit is not None:
+            lines.append(f'stopped by the {self.limit} limit')
+        return '\n'.join(lines)
+
+    def write_json(self, path: Path) -> None:
+        """ write the profile to a json file
+
+        :param path: path of the json file
+        :return: None
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f, indent=1)
+
+
+def profile(df: Definition, budget: Optional[Budget] = None) -> Profile:
+    """ reduce the main clause of a parsed definition, profiling every step
+
+    a reduction stopped by the budget is profiled up to where it stopped
+    :param df: parsed lambda definition
+    :param budget: limits of the reduction, none by default
+    :return: the profile, holding the normal form or the term reduced so far
+    """
+    result = Profile()
+    term = from_named(df.formatted_main, origins(df))
+    term_size = size(term)
+    result.sizes.append(term_size)
+    context = []
+    start = time.perf_counter()
+    with recursion_limit():
+        term, found = search(term, context)
+        while found:
+            if budget is not None:
+                limit = budget.exceeded(result.steps, term_size)
+                if limit is not None:
+                    result.limit = limit
+                    break
+
+            name = term.fun.origin or _ANONYMOUS
+            d = result.definitions.get(name)
+            if d is None:
+                d = result.definitions[name] = DefinitionProfile()
+            before = size(term)
+            contract_start = time.perf_counter()
+            term = contract(term)
+            d.seconds += time.perf_counter() - contract_start
+            delta = size(term) - before
+            d.steps += 1
+            d.size_delta += delta
+            result.steps += 1
+            term_size += delta
+            result.sizes.append(term_size)
+
+            if isinstance(term, Lam) and context and context[-1][0] == _IN_FUN:
+                # the contracted term became the function of the next redex
+                term = App(term, context.pop()[2].arg)
+            else:
+                term, found = search(term, context)
+        result.seconds = time.perf_counter() - start
+        result.term = to_named(plug(term, context) if found else term)
+    return result
@@ -0,0 +1,190 @@
+# CSCI 384 readback of normal forms for Lambda Calculus
+
+"""
+Reads the values fundaments.lc encodes back out of a normal form: church
+numerals, `true` and `false`, and `pair`s of values, so a result prints as
+`5` or `(true, 2)` rather than as its term. The readback only walks the
+term; a numeral is counted along its spine, never formatted.
+
+`zero` and `false` are the same term, fn x => fn y => y. It is read as
+`false` if its binders are named `t` and `e`, as `false`'s are, and as `0`
+otherwise.
+
+Terms sml prints, in the term datatype source `serialize` writes, are
+read into terms by parse_term.
+"""
+from __future__ import annotations
+
+import re
+from typing import List, Optional, Tuple, Union
+
+from parser import ASTBase, Variable, Abstraction, Application, Numeral, free_variables
+from reducer import recursion_limit
+
+# a value read back, or the term itself if it encodes none
+Value = Union[int, bool, Tuple['Value', 'Value'], ASTBase]
+
+_SUFFIX = re.compile(r'_\d+$')
+
+
+def _hint(name: str) -> str:
+    """ a binder name without the suffix given to keep it apart from another """
+    return _SUFFIX.sub('', name)
+
+
+def numeral(t: ASTBase) -> Optional[int]:
+    """ the number a church numeral encodes
+
+    :param t: the term
+    :return: the number of applications of f in fn f => fn a => f (f ... a), None if t is no numeral
+    """
+    if isinstance(t, Numeral):
+        return t.value
+    if not (isinstance(t, Abstraction) and isinstance(t.body, Abstraction)):
+        return None
+    f, a = t.var, t.body.var
+    body = t.body.body
+    n = 0
+    while isinstance(body, Application):
+        if f == a or not (isinstance(body.applier, Variable) and body.applier.var_name == f):
+            return None
+        n += 1
+        body = body.appliee
+    if isinstance(body, Variable) and body.var_name == a:
+        return n
+    return None
+
+
+def boolean(t: ASTBase) -> Optional[bool]:
+    """ the boolean a church boolean encodes
+
+    :param t: the term
+    :return: True for fn t => fn e => t, False for fn t => fn e => e, None otherwise
+    """
+    if not (isinstance(t, Abstraction) and isinstance(t.body, Abstraction) and isinstance(t.body.body, Variable)):
+        return None
+    name = t.body.body.var_name
+    if name == t.body.var:
+        return False
+    if name == t.var:
+        return True
+    return None
+
+
+def pair(t: ASTBase) -> Optional[Tuple[ASTBase, ASTBase]]:
+    """ the two terms a church pair holds
+
+    :param t: the term
+    :return: x and y of fn c => c x y, c not occurring in either, None if t is no pair
+    """
+    if not (isinstance(t, Abstraction) and isinstance(t.body, Application)
+            and isinstance(t.body.applier, Application)):
+        return None
+    c = t.var
+    head, first, second = t.body.applier.applier, t.body.applier.appliee, t.body.appliee
+    if not (isinstance(head, Variable) and head.var_name == c):
+        return None
+    if c in free_variables(first) or c in free_variables(second):
+        return None
+    return first, second
+
+
+def readback(t: ASTBase) -> Value:
+    """ the value a normal form encodes
+
+    :param t: the normal form
+    :return: an int, a bool, a tuple of the values of a pair, or t itself if it encodes none of them
+    """
+    with recursion_limit():
+        return _readback(t)
+
+
+def _readback(t: ASTBase) -> Value:
+    b = boolean(t)
+    if b is False and (_hint(t.var), _hint(t.body.var)) != ('t', 'e'):
+        return 0
+    if b is not None:
+        return b
+    n = numeral(t)
+    if n is not None:
+        return n
+    p = pair(t)
+    if p is not None:
+        first, second = _readback(p[0]), _readback(p[1])
+        # fn c => c x y is only a pair of values, not of any two terms
+        if not (isinstance(first, ASTBase) or isinstance(second, ASTBase)):
+            return first, second
+    return t
+
+
+def show(value: Value) -> str:
+    """ format a value read back
+
+    :param value: the value
+    :return: the number, true or false, (first, second) for a pair, or the term for no value
+    """
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, tuple):
+        return f'({show(value[0])}, {show(value[1])})'
+    return str(value)
+
+
+_TOKEN = re.compile(r'\s*(?:(AP\s*\()|(LM\s*\()|VA\s*"([^"]*)"|"([^"]*)"|([,)]))')
+
+
+def parse_term(text: str) -> ASTBase:
+    """ read a term printed as sml term datatype source, as `LM("f",AP(VA"f",VA"a"))`, or
+    spaced out as sml/nj prints it, `LM ("f",AP (VA "f",VA "a"))`
+
+    :param text: the term source, line breaks allowed between its tokens
+    :return: the term
+    :raise ValueError: if text is not a term
+    """
+    # the terms still waiting for their subterms: the name of an abstraction, or
+    # an application's function, None until it is read
+    frames: List[list] = []
+    pos = 0
+    while True:
+        match = _TOKEN.match(text, pos)
+        if match is None:
+            raise ValueError(f'unexpected {text[pos:pos + 10]!r} in term')
+        pos = match.end()
+        application, abstraction, variable = match.group(1), match.group(2), match.group(3)
+        if application:
+            frames.append(['AP', None])
+            continue
+        if abstraction:
+            match = _TOKEN.match(text, pos)
+            if match is None or match.group(4) is None:
+                raise ValueError('abstraction without its variable')
+            match_comma = _TOKEN.match(text, match.end())
+            if match_comma is None or match_comma.group(5) != ',':
+                raise ValueError('abstraction without its body')
+            pos = match_comma.end()
+            frames.append(['LM', match.group(4)])
+            continue
+        if variable is None:
+            raise ValueError(f'unexpected {match.group(0).strip()!r} in term')
+        term: ASTBase = Variable(variable)
+
+        # hand the finished term up to the terms waiting for it, reading their closing tokens
+        while frames:
+            frame = frames[-1]
+            if frame[0] == 'AP' and frame[1] is None:
+                match = _TOKEN.match(text, pos)
+                if match is None or match.group(5) != ',':
+                    raise ValueError('application without its argument')
+                pos = match.end()
+                frame[1] = term
+                break
+            match = _TOKEN.match(text, pos)
+            if match is None or match.group(5) != ')':
+                raise ValueError('unclosed term')
+            pos = match.end()
+            term = Application(frame[1], term) if frame[0] == 'AP' else Abstraction(frame[1], term)
+            frames.pop()
+        else:
+            if text[pos:].strip():
+                raise ValueError('trailing text after term')
+            return term
@@ -0,0 +1,238 @@
+# CSCI 384 reducer for Lambda Calculus in python
+
+"""
+A python port of reducer.sml. It reduces the parsed AST in normal order
+(leftmost-outermost redex first) until no redex is left, renaming every
+bound variable it passes under with the same `<base>_<index>` scheme, so
+the results print exactly as the sml interpreter's do.
+
+The search for the next redex keeps a zipper: the path from the root to
+the current focus. Everything left of the focus is already in normal form
+and is never searched again, so a step only touches the path to the
+redex and the newly contracted subterm.
+"""
+from __future__ import annotations
+
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+from budget import Budget, LimitExceeded, term_size
+from parser import ASTBase, Variable, Abstraction, Application, serialize
+from tracer import Trace
+
+
+_RECURSION_LIMIT = 1 << 20
+# how many walks are inside recursion_limit, across threads, and the limit to restore once none is
+_limit_lock = threading.Lock()
+_limit_holders = 0
+_limit_restored = _RECURSION_LIMIT
+
+# zipper frames, the focus being
+_IN_APPLIER = 0  # the applier of the application, whose appliee is not searched yet
+_IN_APPLIEE = 1  # the appliee of the application, whose applier is in normal form
+_IN_BODY = 2  # the body of the abstraction
+
+
+@contextmanager
+def recursion_limit(limit: int = _RECURSION_LIMIT) -> Iterator[None]:
+    """ raise the recursion limit for walking deep terms, restoring it afterwards
+
+    The limit is process wide, so threads walking terms at once share one raise: the first one in
+    raises it and the last one out restores it, never lowering it under another still deep in a term.
+
+    :param limit: the recursion limit to be used
+    :return: None
+    """
+    global _limit_holders, _limit_restored
+    with _limit_lock:
+        if not _limit_holders:
+            _limit_restored = sys.getrecursionlimit()
+        _limit_holders += 1
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), limit))
+    try:
+        yield
+    finally:
+        with _limit_lock:
+            _limit_holders -= 1
+            if not _limit_holders:
+                sys.setrecursionlimit(_limit_restored)
+
+
+def pretty(t: ASTBase) -> str:
+    """ format a term the way reducer.sml's pretty does
+
+    :param t: term to be formatted
+    :return: the formatted term
+    """
+    return serialize(t, 'VA({})', 'LM({},')
+
+
+def plug(t: ASTBase, context: List[Tuple]) -> ASTBase:
+    """ rebuild the whole term around the focus of a zipper
+
+    :param t: the focus
+    :param context: the zipper frames from the root down to the focus
+    :return: the whole term
+    """
+    for kind, left, node in reversed(context):
+        if kind == _IN_APPLIER:
+            t = Application(t, node.appliee)
+        elif kind == _IN_APPLIEE:
+            t = Application(left, t)
+        else:
+            t = Abstraction(node.var, t)
+    return t
+
+
+def search(t: ASTBase, context: List[Tuple]) -> Tuple[ASTBase, bool]:
+    """ move the focus of a zipper to the next leftmost-outermost redex
+
+    the frames of the path taken are pushed onto and popped off context,
+    nodes on the way up are only rebuilt if a child of theirs changed
+    :param t: the focus, everything left of it in normal form
+    :param context: the zipper frames from the root down to the focus
+    :return: the redex and True, or the whole normal form and False
+    """
+    while True:
+        while isinstance(t, (Application, Abstraction)):
+            if isinstance(t, Abstraction):
+                context.append((_IN_BODY, None, t))
+                t = t.body
+            elif isinstance(t.applier, Abstraction):
+                return t, True
+            else:
+                context.append((_IN_APPLIER, None, t))
+                t = t.applier
+
+        while context:
+            kind, left, node = context.pop()
+            if kind == _IN_APPLIER:
+                context.append((_IN_APPLIEE, t, node))
+                t = node.appliee
+                break
+            elif kind == _IN_APPLIEE:
+                t = node if left is node.applier and t is node.appliee else Application(left, t)
+            else:
+                t = node if t is node.body else Abstraction(node.var, t)
+        else:
+            return t, False
+
+
+class Reducer:
+    """ Reducer class
+    Each reducer owns the fresh variable counter, like one sml session does
+    """
+
+    __slots__ = ['_fresh_var_index', '_steps']
+
+    def __init__(self) -> None:
+        self._fresh_var_index = 0
+        self._steps = 0
+
+    @property
+    def steps(self) -> int:
+        return self._steps
+
+    def get_fresh_var(self, name: str) -> str:
+        """ make a fresh variable name from the part before the underline
+
+        :param name: the variable name to be renamed
+        :return: the fresh variable name
+        """
+        self._fresh_var_index += 1
+        return f'{name.split("_", 1)[0]}_{self._fresh_var_index}'
+
+    def substitution(self, name: str, new_term: ASTBase, old_term: ASTBase) -> ASTBase:
+        """ substitute new_term for the free occurrences of name in old_term
+
+        every abstraction passed under gets its variable renamed to a fresh one
+        :param name: the variable name to be substituted
+        :param new_term: the term to be substituted in
+        :param old_term: the term to be substituted into
+        :return: the substituted term
+        """
+        if isinstance(old_term, Variable):
+            return new_term if old_term.var_name == name else old_term
+        elif isinstance(old_term, Abstraction):
+            if old_term.var == name:
+                return old_term
+            z = self.get_fresh_var(old_term.var)
+            t = self.substitution(old_term.var, Variable(z), old_term.body)
+            return Abstraction(z, self.substitution(name, new_term, t))
+        elif isinstance(old_term, Application):
+            applier = self.substitution(name, new_term, old_term.applier)
+            return Application(applier, self.substitution(name, new_term, old_term.appliee))
+        else:
+            raise Exception(f'Encounter unknown term {old_term}')
+
+    def contract(self, redex: Application) -> ASTBase:
+        """ contract a redex
+
+        :param redex: an abstraction applied to a term
+        :return: the contracted term
+        """
+        return self.substitution(redex.applier.var, redex.appliee, redex.applier.body)
+
+    def reduction_step(self, t: ASTBase) -> Optional[ASTBase]:
+        """ contract the leftmost-outermost redex of t
+
+        :param t: term to be reduced
+        :return: the reduced term, or None if t is in normal form
+        """
+        context = []
+        redex, found = search(t, context)
+        return plug(self.contract(redex), context) if found else None
+
+    def reduce(self, t: ASTBase, verbose: bool = False, budget: Optional[Budget] = None,
+               trace: Optional[Trace] = None) -> ASTBase:
+        """ reduce t to its normal form
+
+        :param t: term to be reduced
+        :param verbose: print every term before it is reduced
+        :param budget: limits of the reduction, none by default
+        :param trace: where the terms are written instead of printed, if given
+        :return: the normal form of t
+        """
+        measures_size = budget is not None and budget.measures_size
+        size = term_size(t) if measures_size else 0
+        context = []
+        t, found = search(t, context)
+        while found:
+            if budget is not None:
+                limit = budget.exceeded(self._steps, size)
+                if limit is not None:
+                    raise LimitExceeded(limit, self._steps, plug(t, context))
+            if trace is not None:
+                if trace.wants(self._steps + 1):
+                    trace.write(self._steps + 1, pretty(plug(t, context)))
+            elif verbose:
+                print(pretty(plug(t, context)))
+            self._steps += 1
+            if measures_size:
+                size -= term_size(t)
+            t = self.contract(t)
+            if measures_size:
+                size += term_size(t)
+            if isinstance(t, Abstraction) and context and context[-1][0] == _IN_APPLIER:
+                # the contracted term became the applier of the next redex
+                t = Application(t, context.pop()[2].appliee)
+            else:
+                t, found = search(t, context)
+        return t
+
+
+def reduce(t: ASTBase, verbose: bool = False, budget: Optional[Budget] = None,
+           trace: Optional[Trace] = None) -> Tuple[ASTBase, int]:
+    """ reduce t to its normal form with a fresh reducer
+
+    :param t: term to be reduced
+    :param verbose: print every term before it is reduced
+    :param budget: limits of the reduction, none by default
+    :param trace: where the terms are written instead of printed, if given
+    :return: the normal form and the number of reduction steps in a tuple
+    """
+    with recursion_limit():
+        reducer = Reducer()
+        return reducer.reduce(t, verbose, budget, trace), reducer.steps
@@ -0,0 +1,685 @@
+# CSCI 384 evaluation server for Lambda Calculus
+
+"""
+A long-running evaluation server, started by `lc.py --serve`. It keeps
+worker processes with the prelude already parsed and sml interpreters
+with reducer.sml already loaded, so a request pays for its own program
+only.
+
+The protocol is one json object per line, both ways, over a localhost
+port or a unix socket. A request is
+
+    {"id": 1, "src": "main := gcd 18 15;", "engine": "lazy", "native": false,
+     "assembly": "nested", "entry": "main", "optimize": false, "max_steps": null, "max_size": null,
+     "timeout": 5, "full": false, "trace": false, "trace_every": 1, "trace_delta": false}
+
+of which only `src` is needed. The server answers with the request's id
+and either the result, `{"id", "steps", "value", "result", "seconds"}`,
+`value` being the numeral, boolean or pair the normal form encodes and
+`result` the normal form, given if it encodes none or `full` is set; the
+limit a reduction reached, `{"id", "limit", "steps", "term"}`; or
+`{"id", "error"}`. A traced request is first answered with its trace, one
+`{"id", "trace"}` line per step written; a client falling too far behind
+reading it misses the rest of the trace, and its result says
+`"trace_dropped": true`.
+
+Every reduction is bounded by the server's step and time limits, which a
+request's `max_steps` and `timeout` may lower but not lift, so no request
+holds a worker forever.
+
+Requests on a connection are served concurrently and answered as they
+finish. The untraced ones are handed to the worker processes in batches,
+each to a worker that is free: while every worker is busy the requests
+queue up, and the next worker free takes its share of them at once, up
+to a batch size. A batch is bounded too: its requests run only within a
+time slice, and those it did not finish go back to their places in the
+queue, the one the slice cut off to be run again on its own, under the
+limits above. So no request waits in a batch for more than the slice.
+Traced requests are reduced on a thread of the server, their steps sent
+back as they are taken.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import os
+import signal
+import socket
+import stat
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import codec
+import lc
+import lazy
+import readback
+from budget import Budget, LimitExceeded
+from parser import ASTBase, Definition, NESTED, MAIN_ENTRY
+from smlpool import SMLPool, SMLTimeout, SMLWorkerError
+from tracer import Trace, SMLStream
+
+DEFAULT_ADDRESS = lc._SERVE_ADDRESS
+MAX_STEPS = lc._SERVE_MAX_STEPS
+TIMEOUT = lc._SERVE_TIMEOUT
+_BATCH_SIZE = 16
+# seconds a batch of more than one request may take
+_BATCH_SLICE = 0.05
+# trace lines a client may fall behind by before the rest of its trace is dropped
+_TRACE_BACKLOG = 1024
+# seconds between the checks of a worker process that its server is still there
+_HEARTBEAT = 1.0
+# bytes of stack for the threads traced requests are reduced on, as deep a term as the main thread can walk
+_THREAD_STACK = 256 << 20
+
+Address = Union[Tuple[str, int], str]
+
+
+def parse_address(address: str) -> Address:
+    """ a localhost port or a unix socket path
+
+    :param address: `HOST:PORT`, or the path of a unix socket
+    :return: the host and port in a tuple, or the path
+    """
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def _budget(request: Dict[str, Any]) -> Optional[Budget]:
+    """ the budget of a request, None if it sets no limits """
+    limits = request.get('max_steps'), request.get('max_size'), request.get('timeout')
+    return Budget(*limits) if any(limit is not None for limit in limits) else None
+
+
+def _capped(limit: Any, cap: Optional[float]) -> Optional[float]:
+    """ a request's limit, no higher than the server's
+
+    :param limit: the limit the request sets, None if it sets none
+    :param cap: the server's limit, None for no limit
+    :return: the lower of the two
+    :raise ValueError: if the request's limit is not a number
+    """
+    if limit is None:
+        return cap
+    if isinstance(limit, bool) or not isinstance(limit, (int, float)):
+        raise ValueError(f'{limit!r} is not a number')
+    return limit if cap is None else min(limit, cap)
+
+
+def _definition(request: Dict[str, Any]) -> Definition:
+    """ the parsed program of a request """
+    df = Definition(request['src'], request.get('native', False), request.get('assembly', NESTED),
+                    request.get('entry', MAIN_ENTRY), request.get('optimize', False))
+    df.parse()
+    if df.formatted_main is None:
+        raise ValueError(f'{df.entry} is not defined')
+    return df
+
+
+def _result(t: ASTBase, steps: Optional[int], full: bool) -> Dict[str, Any]:
+    """ the response of a normal form """
+    value = None if full else readback.readback(t)
+    if value is None or isinstance(value, ASTBase):
+        return {'steps': steps, 'value': None, 'result': str(t)}
+    return {'steps': steps, 'value': readback.show(value), 'result': None}
+
+
+def _limit(e: LimitExceeded) -> Dict[str, Any]:
+    """ the response of a reduction stopped by its budget """
+    return {'limit': e.limit, 'steps': e.steps, 'term': None if e.term is None else str(e.term)}
+
+
+def _reduce(request: Dict[str, Any], trace: Optional[Trace] = None) -> Dict[str, Any]:
+    """ reduce a request's program with an in-process reducer
+
+    :param request: the request
+    :param trace: where the steps are written, if the request is traced
+    :return: the response, without its id
+    """
+    engine = request.get('engine', 'lazy')
+    df = _definition(request)
+    budget = _budget(request)
+    try:
+        if df.native_numerals:
+            t, steps = lazy.reduce(df.formatted_main, False, df.supporting_defs, df.primitives, budget, trace)
+        else:
+            t, steps = lc._PYTHON_ENGINES[engine](df.formatted_main, budget=budget, trace=trace)
+    except LimitExceeded as e:
+        return _limit(e)
+    return _result(t, steps, request.get('full', False))
+
+
+def _sml_source(request: Dict[str, Any], verbose: bool = False) -> str:
+    """ the compact sml code of a request's program
+
+    :param request: the request
+    :param verbose: the code prints every step
+    :return: the sml code
+    """
+    return lc._format_sml_exec_stream(_definition(request), verbose, _budget(request), compact=True)
+
+
+def _sml_response(encoded: Optional[str], full: bool) -> Dict[str, Any]:
+    """ the response of the encoded result sml printed last
+
+    :param encoded: the last line sml printed, the result in the compact encoding, or a
+                    stopped reduction's limit, steps and encoded term
+    :param full: give the normal form even if it encodes a value
+    :return: the response, without its id
+    """
+    if encoded is None:
+        return {'error': 'sml gave no result'}
+    try:
+        if not codec.is_compact(encoded):
+            limit, steps, code = encoded.split(' ', 2)
+            return _limit(LimitExceeded(limit, int(steps), codec.decode(code)))
+        return _result(codec.decode(encoded), None, full)
+    except ValueError:
+        return {'error': 'cannot decode the sml result'}
+
+
+def _work(request: Dict[str, Any]) -> Dict[str, Any]:
+    """ what a worker process does for a request: the response for an in-process reducer,
+    `{"sml": code}` for the sml one
+
+    :param request: the request
+    :return: the response, without its id
+    """
+    try:
+        if request.get('engine') == 'sml':
+            return {'sml': _sml_source(request)}
+        return _reduce(request)
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+
+
+def _work_batch(requests: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """ what a worker process does for a batch of requests, in order: a lone request is run under its
+    own limits, the requests of a batch only within the batch's time slice
+
+    :param requests: the requests
+    :return: the responses of the requests run, the first ones, the last None if the slice cut it off
+    """
+    if len(requests) == 1:
+        return [_work(requests[0])]
+    deadline = time.monotonic() + _BATCH_SLICE
+    responses: List[Optional[Dict[str, Any]]] = []
+    for request in requests:
+        left = deadline - time.monotonic()
+        if left <= 0:
+            break
+        timeout = request.get('timeout')
+        if timeout is not None and timeout <= left:
+            responses.append(_work(request))
+            continue
+        response = _work(dict(request, timeout=left))
+        if response.get('limit') == 'timeout':
+            # stopped by the slice rather than its own limit
+            responses.append(None)
+            break
+        responses.append(response)
+    return responses
+
+
+def _warm() -> None:
+    """ parse the prelude once, as the worker processes start """
+    Definition('main := zero;').parse()
+
+
+def _heartbeat(parent: int) -> None:
+    """ exit the worker process once the server that started it is gone, even in a reduction """
+    while os.getppid() == parent:
+        time.sleep(_HEARTBEAT)
+    os._exit(1)
+
+
+def _start_worker(parent: int) -> None:
+    """ set a worker process up as it starts: terminated by SIGTERM, gone with its server, warm
+
+    :param parent: the pid of the server
+    """
+    # a forked worker inherits the loop's handler, which would only wake the server's loop
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.set_wakeup_fd(-1)
+    threading.Thread(target=_heartbeat, args=(parent,), daemon=True).start()
+    _warm()
+
+
+class _StreamOut:
+    """ a text stream handing every line written to it on to a callback """
+
+    __slots__ = ['_emit', '_partial']
+
+    def __init__(self, emit: Callable[[str], None]) -> None:
+        self._emit = emit
+        self._partial = ''
+
+    def write(self, text: str) -> int:
+        *lines, self._partial = (self._partial + text).split('\n')
+        for line in lines:
+            self._emit(line)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+class Server:
+    """ Server class
+    Serves evaluation requests on its worker processes and sml interpreters.
+    """
+
+    __slots__ = ['_jobs', '_sml_workers', '_max_steps', '_timeout', '_executor', '_sml_pool', '_queue', '_order',
+                 '_idle', '_dispatcher']
+
+    def __init__(self, jobs: Optional[int] = None, sml_workers: int = 2, max_steps: Optional[int] = MAX_STEPS,
+                 timeout: Optional[float] = TIMEOUT) -> None:
+        """ init server
+
+        :param jobs: number of worker processes, one per cpu by default
+        :param sml_workers: number of sml interpreters, if there is sml
+        :param max_steps: the most steps a reduction may take, None for no limit
+        :param timeout: the most seconds a reduction may take, None for no limit
+        """
+        self._jobs = jobs or os.cpu_count() or 1
+        self._sml_workers = sml_workers
+        self._max_steps = max_steps
+        self._timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._sml_pool: Optional[SMLPool] = None
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._order = itertools.count()
+        self._idle: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """ start the worker processes and sml interpreters, and wait for them to be warm """
+        loop = asyncio.get_running_loop()
+        self._executor = self._new_executor()
+        warming = [loop.run_in_executor(self._executor, _warm) for _ in range(self._jobs)]
+        _warm()
+        sml_bin = lc._sml_bin()
+        if sml_bin is not None and self._sml_workers > 0:
+            self._sml_pool = SMLPool(sml_bin, lc.sml_interpreter_code(), self._sml_workers)
+            warming.extend(asyncio.wrap_future(self._sml_pool.submit('val _ = ();'))
+                           for _ in range(self._sml_workers))
+        await asyncio.gather(*warming)
+        self._queue = asyncio.PriorityQueue()
+        self._idle = asyncio.Semaphore(self._jobs)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    def close(self) -> None:
+        """ stop the workers and the sml interpreters, without waiting for the reductions running """
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+        if self._executor is not None:
+            _stop_executor(self._executor)
+        if self._sml_pool is not None:
+            self._sml_pool.close(wait=False)
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(self._jobs, initializer=_start_worker, initargs=(os.getpid(),))
+
+    async def _dispatch(self) -> None:
+        """ hand the queued requests to the worker processes in batches, as workers get free """
+        while True:
+            await self._idle.acquire()
+            order, alone, request, waiting = await self._queue.get()
+            batch = [(order, request, waiting)]
+            # a fair share of the queue, leaving the rest to the workers getting free after this one
+            size = 1 if alone else min(_BATCH_SIZE, 1 + -(-self._queue.qsize() // self._jobs))
+            while len(batch) < size and not self._queue.empty():
+                order, alone, request, waiting = self._queue.get_nowait()
+                if alone:
+                    self._queue.put_nowait((order, alone, request, waiting))
+                    break
+                batch.append((order, request, waiting))
+            self._submit(batch, True)
+
+    def _enqueue(self, request: Dict[str, Any], waiting: asyncio.Future, order: Optional[int] = None,
+                 alone: bool = False) -> None:
+        """ queue a request for the worker processes
+
+        :param request: the request
+        :param waiting: the future its response is set on
+        :param order: its place in the queue, if it was queued before, a new place at the end if None
+        :param alone: run it on its own, as one a batch's time slice cut off
+        """
+        self._queue.put_nowait((next(self._order) if order is None else order, alone, request, waiting))
+
+    def _submit(self, batch: List[Tuple[int, Dict[str, Any], asyncio.Future]], retry: bool) -> None:
+        """ run a batch on the worker processes, on the worker slot it was dispatched to
+
+        :param batch: the requests with their places in the queue and the futures their responses are set on
+        :param retry: run it again on new worker processes if a worker dies
+        """
+        executor = self._executor
+        future = asyncio.get_running_loop().run_in_executor(executor, _work_batch,
+                                                            [request for _, request, _ in batch])
+        future.add_done_callback(lambda f: self._settle(f, batch, executor, retry))
+
+    def _settle(self, future: asyncio.Future, batch: List[Tuple[int, Dict[str, Any], asyncio.Future]],
+                executor: ProcessPoolExecutor, retry: bool) -> None:
+        """ hand the responses of a finished batch to the requests waiting for them, and queue the
+        requests it did not finish again in their places, the one its time slice cut off to be run
+        on its own
+
+        A worker process dying breaks its executor and fails every batch running on it, so the
+        first of them to be settled replaces the executor, and each is run once more on the new one.
+        A batch breaking the new executor too is answered with an error rather than run again.
+        """
+        try:
+            responses = future.result()
+        except BrokenProcessPool:
+            if executor is self._executor:
+                _stop_executor(executor)
+                self._executor = self._new_executor()
+            if retry:
+                self._submit(batch, False)
+                return
+            responses = [{'error': 'worker failed: the worker process died running the request'}] * len(batch)
+        except Exception as e:
+            responses = [{'error': f'worker failed: {type(e).__name__}: {e}'}] * len(batch)
+        self._idle.release()
+        for (order, request, waiting), response in zip(batch, responses):
+            if response is None:
+                self._enqueue(request, waiting, order, alone=True)
+            elif not waiting.done():
+                waiting.set_result(response)
+        for order, request, waiting in batch[len(responses):]:
+            self._enqueue(request, waiting, order)
+
+    async def _on_worker(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """ queue a request for the worker processes and wait for its response """
+        waiting = asyncio.get_running_loop().create_future()
+        self._enqueue(request, waiting)
+        return await waiting
+
+    async def evaluate(self, request: Dict[str, Any],
+                       emit: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """ evaluate a request
+
+        :param request: the request
+        :param emit: called with every trace line of a traced request
+        :return: the response, without its id
+        """
+        if not isinstance(request.get('src'), str):
+            return {'error': 'the request has no src'}
+        engine = request.get('engine', 'lazy')
+        if engine not in lc._ENGINES:
+            return {'error': f'unknown engine {engine}'}
+        if request.get('native') and engine != 'lazy':
+            return {'error': 'native numerals only work with the lazy engine'}
+        if engine == 'sml' and self._sml_pool is None:
+            request = dict(request, engine='debruijn')
+        try:
+            request = dict(request, max_steps=_capped(request.get('max_steps'), self._max_steps),
+                           timeout=_capped(request.get('timeout'), self._timeout))
+        except ValueError as e:
+            return {'error': f'the limits must be numbers, {e}'}
+
+        if request.get('trace') and emit is not None:
+            return await asyncio.to_thread(self._traced, request, emit)
+
+        response = await self._on_worker(request)
+        if 'sml' not in response:
+            return response
+        timeout = request.get('timeout')
+        try:
+            output = await asyncio.wrap_future(self._sml_pool.submit(response['sml'], timeout))
+        except SMLTimeout as e:
+            steps, term = lc._sml_partial(e.output)
+            return _limit(LimitExceeded('timeout', steps, term))
+        except SMLWorkerError as e:
+            return {'error': str(e)}
+        extracted = lc.extract_sml_output(output)
+        encoded = extracted[0].rpartition('\n')[2] if extracted is not None else None
+        return _sml_response(encoded, request.get('full', False))
+
+    def _traced(self, request: Dict[str, Any], emit: Callable[[str], None]) -> Dict[str, Any]:
+        """ reduce a traced request on this thread, emitting its trace lines as they are written """
+        trace = Trace(_StreamOut(emit), max(int(request.get('trace_every', 1)), 1),
+                      bool(request.get('trace_delta', False)))
+        try:
+            if request.get('engine') != 'sml':
+                return _reduce(request, trace)
+            budget = _budget(request)
+            stream = SMLStream(lc._sml_bin(), lc.sml_interpreter_code() + _sml_source(request, verbose=True),
+                               None if budget is None else budget.timeout)
+            step = 0
+            # the line printed last is held back, being the encoded result
+            held = None
+            try:
+                for line in stream:
+                    if held is not None:
+                        step += 1
+                        if trace.wants(step):
+                            trace.write(step, held)
+                    held = line
+            except LimitExceeded as e:
+                return _limit(e)
+            return _sml_response(held if stream.result is not None else None, request.get('full', False))
+        except Exception as e:
+            return {'error': f'{type(e).__name__}: {e}'}
+
+    async def _respond(self, request: Any, writer: asyncio.StreamWriter) -> None:
+        """ answer one request, with its trace lines first """
+        if not isinstance(request, dict):
+            request = {'id': None, 'src': None}
+        rid = request.get('id')
+        loop = asyncio.get_running_loop()
+
+        def send(message: Dict[str, Any]) -> None:
+            writer.write((json.dumps(dict(message, id=rid)) + '\n').encode())
+
+        # the trace lines the reducing thread has written and the client not yet taken
+        lines: asyncio.Queue = asyncio.Queue()
+        room = threading.Semaphore(_TRACE_BACKLOG)
+        dropped = threading.Event()
+
+        def emit(line: str) -> None:
+            if dropped.is_set():
+                return
+            if not room.acquire(blocking=False):
+                # the client fell behind, drop the rest of the trace rather than buffer it
+                dropped.set()
+                return
+            loop.call_soon_threadsafe(lines.put_nowait, line)
+
+        async def forward() -> None:
+            while True:
+                line = await lines.get()
+                if line is None:
+                    return
+                send({'trace': line})
+                await writer.drain()
+                room.release()
+
+        forwarding = asyncio.create_task(forward()) if request.get('trace') else None
+        start = time.perf_counter()
+        try:
+            response = await self.evaluate(request, emit)
+        finally:
+            if forwarding is not None:
+                # queued after every line the thread emitted, as call_soon_threadsafe keeps their order
+                lines.put_nowait(None)
+                await forwarding
+        if dropped.is_set():
+            response['trace_dropped'] = True
+        response.setdefault('seconds', time.perf_counter() - start)
+        send(response)
+        await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """ serve the requests of one connection, each as soon as it is read """
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    writer.write((json.dumps({'id': None, 'error': 'the request is not json'}) + '\n').encode())
+                    continue
+                task = asyncio.create_task(self._respond(request, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except asyncio.CancelledError:
+            # the server is shutting down, end the connection without reporting it as failed
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, address: Address) -> None:
+        """ serve requests on an address until cancelled or terminated
+
+        :param address: host and port in a tuple, or a unix socket path
+        :return: None
+        """
+        # a SIGTERM would leave the worker processes running, cancel instead so they are shut down
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        if not isinstance(address, tuple):
+            _clear_socket(address)
+        await self.start()
+        try:
+            if isinstance(address, tuple):
+                server = await asyncio.start_server(self.handle, *address)
+            else:
+                server = await asyncio.start_unix_server(self.handle, address)
+            print(f'serving on {_show_address(address)} with {self._jobs} worker processes', flush=True)
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+
+def _stop_executor(executor: ProcessPoolExecutor) -> None:
+    """ stop the worker processes of an executor, without waiting for the reductions running """
+    # the executor forgets its processes on shutdown, and would wait for their work
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+def _clear_socket(path: str) -> None:
+    """ remove the socket a server left at path, so another can be bound there
+
+    :param path: the unix socket path
+    :raise FileExistsError: if something other than a socket is at path
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f'{path} exists and is not a socket, not serving on it')
+    os.unlink(path)
+
+
+def _show_address(address: Address) -> str:
+    return f'{address[0]}:{address[1]}' if isinstance(address, tuple) else address
+
+
+def serve(address: str = DEFAULT_ADDRESS, jobs: Optional[int] = None, sml_workers: int = 2,
+          max_steps: Optional[int] = MAX_STEPS, timeout: Optional[float] = TIMEOUT) -> None:
+    """ run the server until interrupted
+
+    :param address: `HOST:PORT` or a unix socket path
+    :param jobs: number of worker processes, one per cpu by default
+    :param sml_workers: number of sml interpreters, if there is sml
+    :param max_steps: the most steps a reduction may take
+    :param timeout: the most seconds a reduction may take
+    :return: None
+    """
+    # before the loop starts the threads traced requests are reduced on
+    threading.stack_size(_THREAD_STACK)
+    try:
+        asyncio.run(Server(jobs, sml_workers, max_steps, timeout).serve(parse_address(address)))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    except FileExistsError as e:
+        raise SystemExit(f'Error: {e}')
+
+
+class Client:
+    """ Client class
+    A connection to a server, sending one request at a time.
+    """
+
+    __slots__ = ['_socket', '_file', '_ids', '_lock']
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, timeout: Optional[float] = None) -> None:
+        """ connect to a server
+
+        :param address: `HOST:PORT` or a unix socket path
+        :param timeout: seconds to wait for a response, None to wait forever
+        """
+        parsed = parse_address(address)
+        if isinstance(parsed, tuple):
+            self._socket = socket.create_connection(parsed, timeout)
+        else:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            self._socket.connect(parsed)
+        self._file = self._socket.makefile('rwb')
+        self._ids = iter(range(1, 1 << 62))
+        self._lock = threading.Lock()
+
+    def stream(self, src: str, **options) -> Iterator[Dict[str, Any]]:
+        """ send a request and read its responses, its trace lines then its result
+
+        :param src: the program
+        :param options: the other fields of the request, as engine, timeout or trace
+        :return: the responses, as they are read
+        """
+        with self._lock:
+            rid = next(self._ids)
+            self._file.write((json.dumps(dict(options, src=src, id=rid)) + '\n').encode())
+            self._file.flush()
+            while True:
+                line = self._file.readline()
+                if not line:
+                    raise ConnectionError('the server closed the connection')
+                response = json.loads(line)
+                if response.get('id') != rid:
+                    continue
+                yield response
+                if 'trace' not in response:
+                    return
+
+    def request(self, src: str, on_trace: Optional[Callable[[str], None]] = None, **options) -> Dict[str, Any]:
+        """ evaluate a program on the server
+
+        :param src: the program
+        :param on_trace: called with every trace line, for a traced request
+        :param options: the other fields of the request, as engine, timeout or trace
+        :return: the response
+        """
+        for response in self.stream(src, **options):
+            if 'trace' not in response:
+                return response
+            if on_trace is not None:
+                on_trace(response['trace'])
+        raise ConnectionError('no response')
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self) -> Client:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -0,0 +1,182 @@
+# CSCI 384 pool of long-lived sml interpreters
+
+"""
+Starting sml and compiling reducer.sml dominates the run time of small
+programs, so batch runs keep a few sml REPLs alive and feed every program
+to one of them. Each job is followed by a `print` of a sentinel line
+unique to the job; the worker's output up to the sentinel is the job's
+output, in the same shape `run_sml` gives for a one-shot run. The fresh
+variable counter is reset before each job, so results are named exactly
+as in a fresh sml session.
+"""
+from __future__ import annotations
+
+import itertools
+import queue
+import subprocess
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+
+class SMLWorkerError(Exception):
+    pass
+
+
+class SMLTimeout(SMLWorkerError):
+    """ a job that did not finish in time, with what it printed until then """
+
+    def __init__(self, timeout: float, output: str) -> None:
+        super().__init__(f'sml worker timed out after {timeout}s')
+        self.timeout = timeout
+        self.output = output
+
+
+class SMLWorker:
+    """ SMLWorker class
+    One sml REPL with the interpreter code loaded. Its stdout is read by a
+    thread into a line queue, so waiting for a sentinel can time out.
+    """
+
+    __slots__ = ['_process', '_lines', '_reader', '_jobs', '_tag']
+
+    def __init__(self, sml_bin: str, interpreter_code: str, timeout: Optional[float] = None) -> None:
+        """ start sml and load the interpreter code into it
+
+        :param sml_bin: path to sml/nj or sosml
+        :param interpreter_code: sml code to be loaded once, i.e. reducer.sml
+        :param timeout: seconds to wait for the interpreter code to load
+        """
+        self._process = subprocess.Popen(
+            [sml_bin], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, bufsize=1
+        )
+        self._lines: queue.Queue = queue.Queue()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+        self._jobs = itertools.count()
+        self._tag = uuid.uuid4().hex
+        self.run(interpreter_code, timeout)
+
+    def _read(self) -> None:
+        """ move the lines sml prints into the line queue, then None at eof """
+        for line in self._process.stdout:
+            self._lines.put(line)
+        self._lines.put(None)
+
+    @property
+    def alive(self) -> bool:
+        return self._process.poll() is None
+
+    def run(self, sml_src: str, timeout: Optional[float] = None) -> str:
+        """ feed sml code to the REPL and collect what it prints in response
+
+        :param sml_src: sml code
+        :param timeout: seconds to wait for the output, None to wait forever
+        :return: the REPL output up to the job's sentinel
+        """
+        sentinel = f'<<<lc-{self._tag}-{next(self._jobs)}>>>'
+        try:
+            self._process.stdin.write(f'{sml_src}\nval _ = print "\\n{sentinel}\\n";\n')
+            self._process.stdin.flush()
+        except OSError as e:
+            raise SMLWorkerError(f'sml worker is not accepting input: {e}')
+
+        output = []
+        while True:
+            try:
+                line = self._lines.get(timeout=timeout)
+            except queue.Empty:
+                self.close()
+                raise SMLTimeout(timeout, ''.join(output))
+            if line is None:
+                raise SMLWorkerError('sml worker exited')
+            if line.rstrip('\n').endswith(sentinel):
+                return ''.join(output)
+            output.append(line)
+
+    def kill(self) -> None:
+        """ stop the REPL at once, even in a job """
+        if self.alive:
+            self._process.kill()
+            self._process.wait()
+
+    def close(self) -> None:
+        """ stop the REPL """
+        if self.alive:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=1)
+            except (OSError, subprocess.TimeoutExpired):
+                self._process.kill()
+                self._process.wait()
+
+
+class SMLPool:
+    """ SMLPool class
+    A fixed number of SMLWorkers taking jobs concurrently. Jobs are
+    submitted as futures, so their results can be collected in any order
+    while they run; a worker that fails a job is replaced.
+    """
+
+    __slots__ = ['_sml_bin', '_interpreter_code', '_idle', '_workers', '_executor', '_lock']
+
+    def __init__(self, sml_bin: str, interpreter_code: str, size: int) -> None:
+        """ init pool, the workers start on their first job
+
+        :param sml_bin: path to sml/nj or sosml
+        :param interpreter_code: sml code loaded into every worker once
+        :param size: number of workers
+        """
+        self._sml_bin = sml_bin
+        self._interpreter_code = interpreter_code
+        self._idle: queue.Queue = queue.Queue()
+        for _ in range(size):
+            self._idle.put(None)
+        self._workers: List[SMLWorker] = []
+        self._executor = ThreadPoolExecutor(max_workers=size)
+        self._lock = threading.Lock()
+
+    def _run(self, sml_src: str, timeout: Optional[float]) -> str:
+        worker = self._idle.get()
+        try:
+            if worker is None or not worker.alive:
+                worker = SMLWorker(self._sml_bin, self._interpreter_code)
+                with self._lock:
+                    self._workers.append(worker)
+            return worker.run('val _ = (freshVariableIndex := 0);\n' + sml_src, timeout)
+        except SMLWorkerError:
+            worker = None
+            raise
+        finally:
+            self._idle.put(worker if worker is not None and worker.alive else None)
+
+    def submit(self, sml_src: str, timeout: Optional[float] = None) -> Future:
+        """ queue sml code to be run by the next idle worker
+
+        :param sml_src: sml code
+        :param timeout: seconds to wait for the output, None to wait forever
+        :return: future of the REPL output
+        """
+        return self._executor.submit(self._run, sml_src, timeout)
+
+    def close(self, wait: bool = True) -> None:
+        """ stop every worker
+
+        :param wait: wait for the queued jobs first, rather than drop them and kill the workers
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+        with self._lock:
+            for worker in self._workers:
+                if wait:
+                    worker.close()
+                else:
+                    worker.kill()
+            self._workers.clear()
+
+    def __enter__(self) -> SMLPool:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -1,3 +1,6 @@
+import re
+
+
 class ParseError(Exception):
     pass
 
@@ -33,51 +36,60 @@ OPERATORS = '=>:'
 # lexical conversion.  The key method is "analyze" which provides
 # the conversion.  It is the lexical analyzer for ML source code.
 #
-# The lexical analyzer works by CHOMP methods that processes the
-# individual characters of the source code's string, packaging
-# them into a list of token strings.
+# The lexical analyzer works by SCANNING the source code's string
+# with a single compiled regular expression.  A cursor into the
+# source is moved forward one lexeme at a time, so the source text
+# is never copied and lexing takes time linear in its length.
 #
 # The class also provides a series of methods that can be used
 # to consume (or EAT) the tokens of the token stream.  These are
-# used by the parser.
+# used by the parser.  Eating a token moves an index into the token
+# list forward; the list itself is left intact.  The eating methods
+# live in the class TokenCursor, so that a parser can be handed its
+# own cursor over the tokens, leaving the stream's list untouched.
 #
 
-
-class TokenStream:
-
-    def __init__(self, src, filename="STDIN"):
+# One alternative per lexeme, tried in order at the cursor.  The
+# "open_*" alternatives only match when the well-formed version of
+# a comment or string failed to, and are used to report lex errors.
+_LEXEME = re.compile(r'''
+    (?P<space>[ \t\r]+)
+  | (?P<newline>\n)
+  | (?P<comment>\(\*.*?\*\))
+  | (?P<open_comment>\(\*)
+  | (?P<string>"(?:[^"\\\n\t]|\\[\\nt"\n])*")
+  | (?P<open_string>")
+  | (?P<int>\d+)
+  | (?P<delimiter>[();])
+  | (?P<operator>[=>:]+)
+  | (?P<word>[^\W\d]\w*)
+''', re.VERBOSE | re.DOTALL)
+
+_STRING_ESCAPE = re.compile(r'\\(.)', re.DOTALL)
+_STRING_ESCAPES = {'\\': '\\', 'n': '\n', 't': '\t', '"': '"', '\n': ''}
+
+
+class TokenCursor:
+
+    def __init__(self, tokens, starts, filename="STDIN"):
         """
-        Builds a new TokenStream object from a source code string.
+        Builds a cursor at the front of a list of tokens and their starts.
+        The lists are shared, not copied.
         """
         self.sourcename = filename
-        self.source = src  # The char sequence that gets 'chomped' by the lexical analyzer.
-        self.tokens = []  # The list of tokens constructed by the lexical analyzer.
-        self.extents = []
-        self.starts = []
-
-        # Sets up and then runs the lexical analyzer.
-        self.initIssue()
-        self.analyze()
-        self.tokens.append("eof")
+        self.tokens = tokens
+        self.starts = starts
+        self.index = 0  # The position of the next uneaten token.
 
     #
     # PARSING helper functions
     #
 
-    def lexassert(self, c):
-        if not c:
-            self.raiseLex(f"Unrecognized character {c}.")
-
-    def raiseLex(self, msg):
-        s = self.sourcename + " line " + str(self.line) + " column " + str(self.column)
-        s += ": " + msg
-        raise LexError(s)
-
     def next(self):
         """
-        Returns the unchomped token at the front of the stream of tokens.
+        Returns the uneaten token at the front of the stream of tokens.
         """
-        return self.tokens[0]
+        return self.tokens[self.index]
 
     def advance(self):
         """
@@ -85,8 +97,7 @@ class TokenStream:
         one at the front.
         """
         tk = self.next()
-        del self.tokens[0]
-        del self.starts[0]
+        self.index += 1
         return tk
 
     def report(self):
@@ -94,8 +105,7 @@ class TokenStream:
         Helper function used to report the location of errors in the
         source code.
         """
-        lnum = self.starts[0][0]
-        cnum = self.starts[0][1]
+        lnum, cnum = self.starts[self.index]
         return self.sourcename + " line " + str(lnum) + " column " + str(cnum)
 
     def eat(self, tk):
@@ -165,10 +175,10 @@ class TokenStream:
 
     def checkEOF(self):
         """
-        Checks if next token is an integer literal token.
+        Checks if all the tokens before eof have been eaten.
         """
         if self.next() != 'eof':
-            raise ParseError("Parsing failed to consume tokens " + str(self.tokens[:-1]) + ".")
+            raise ParseError("Parsing failed to consume tokens " + str(self.tokens[self.index:-1]) + ".")
 
     def nextIsName(self):
         """
@@ -187,138 +197,86 @@ class TokenStream:
         tk = self.next()
         return tk[0] == '"' and tk[-1] == '"'
 
+
+class TokenStream(TokenCursor):
+
+    def __init__(self, src, filename="STDIN"):
+        """
+        Builds a new TokenStream object from a source code string.
+        """
+        super().__init__([], [], filename)
+        self.source = src  # The char sequence that gets scanned by the lexical analyzer.
+
+        # Sets up and then runs the lexical analyzer.
+        self.initIssue()
+        self.analyze()
+        self.tokens.append("eof")
+        self.starts.append((self.line, self.column))
+
+    def cursor(self):
+        """
+        Gives a new cursor at the front of this stream's tokens.
+        """
+        return TokenCursor(self.tokens, self.starts, self.sourcename)
+
+    def raiseLex(self, msg):
+        s = self.sourcename + " line " + str(self.line) + " column " + str(self.column)
+        s += ": " + msg
+        raise LexError(s)
+
     #
     # TOKENIZER helper functions
     #
     # These are used by the 'analysis' method defined below them.
     #
     # The parsing functions EAT the token stream, whereas
-    # the lexcial analysis functions CHOMP the source text
+    # the lexcial analysis functions SCAN the source text
     # and ISSUE the individual tokens that form the stream.
     #
 
     def initIssue(self):
         self.line = 1
         self.column = 1
-        self.markIssue()
-
-    def markIssue(self):
-        self.mark = (self.line, self.column)
 
     def issue(self, token):
         self.tokens.append(token)
-        self.starts.append(self.mark)
-        self.markIssue()
+        self.starts.append((self.line, self.column))
 
-    def nxt(self, lookahead=1):
-        if len(self.source) == 0:
-            return ''
-        else:
-            return self.source[lookahead - 1]
-
-    def chompSelector(self):
-        self.lexassert(self.nxt() == '#' and self.nxt(2).isdigit())
-        token = self.chompChar()
-        token = '#'
-        while self.nxt().isdigit():
-            token += self.chompChar()
-        self.issue(token)
-
-    def chompWord(self):
-        self.lexassert(self.nxt().isalpha() or self.nxt() == '_')
-        token = self.chompChar()
-        while self.nxt().isalnum() or self.nxt() == '_':
-            token += self.chompChar()
-        self.issue(token)
-
-    def chompInt(self):
-        ck = self.nxt().isdigit()
-        self.lexassert(ck)
-        token = ""
-        token += self.chompChar()  # first digit
-        while self.nxt().isdigit():
-            token += self.chompChar()  # remaining digits=
-        self.issue(token)
-
-    def chompString(self):
-        self.lexassert(self.nxt() == '"')
-        self.chompChar()  # eat quote
-        token = ""
-        while self.nxt() != '' and self.nxt() != '"':
-            if self.nxt() == '\\':
-                self.chompChar()
-                if self.nxt() == '\n':
-                    self.chompWhitespace(True)
-                elif self.nxt() == '\\':
-                    token += self.chompChar()
-                elif self.nxt() == 'n':
-                    self.chompChar()
-                    token += '\n'
-                elif self.nxt() == 't':
-                    self.chompChar()
-                    token += '\t'
-                elif self.nxt() == '"':
-                    self.chompChar()
-                    token += '"'
-                else:
-                    self.raiseLex("Bad string escape character")
-            elif self.nxt() == '\n':
-                self.raiseLex("End of line encountered within string")
-            elif self.nxt() == '\t':
-                self.raiseLex("Tab encountered within string")
-            else:
-                token += self.chompChar()
-
-        if self.nxt() == '':
-            self.raiseLex("EOF encountered within string")
-        else:
-            self.chompChar()  # eat endquote
-            self.issue('"' + token + '"')
-
-    def chompComment(self):
-        self.lexassert(len(self.source) > 1 and self.source[0:2] == '(*')
-        self.chompChar()  # eat (*
-        self.chompChar()  #
-        while len(self.source) >= 2 and self.source[0:2] != '*)':
-            self.chomp()
-        if len(self.source) < 2:
-            self.raiseLex("EOF encountered within comment")
-        else:
-            self.chompChar()  # eat *)
-            self.chompChar()  #
-
-    def chomp(self):
-        if self.nxt() in "\n\t\r ":
-            self.chompWhitespace()
-        else:
-            self.chompChar()
-
-    def chompChar(self):
-        self.lexassert(len(self.source) > 0)
-        c = self.source[0]
-        self.source = self.source[1:]
-        self.column += 1
-        return c
-
-    def chompWhitespace(self, withinToken=False):
-        self.lexassert(len(self.source) > 0)
-        c = self.source[0]
-        self.source = self.source[1:]
-        if c == ' ':
-            self.column += 1
-        elif c == '\t':
-            self.column += 4
-        elif c == '\n':
-            self.line += 1
+    def skip(self, text):
+        """
+        Moves the line and column position past the scanned text.
+        Tabs count as four columns and carriage returns as none.
+        """
+        newlines = text.count('\n')
+        if newlines:
+            self.line += newlines
             self.column = 1
-        if not withinToken:
-            self.markIssue()
+            text = text[text.rindex('\n') + 1:]
+        self.column += len(text) + 3 * text.count('\t') - text.count('\r')
 
-    def chompOperator(self):
-        token = ''
-        while self.nxt() in OPERATORS:
-            token += self.chompChar()
-        self.issue(token)
+    def raiseString(self, pos):
+        """
+        Reports why the string literal starting at pos is malformed.
+        """
+        end = len(self.source)
+        i = pos + 1
+        while i < end and self.source[i] != '"':
+            c = self.source[i]
+            if c == '\\':
+                if i + 1 < end and self.source[i + 1] in _STRING_ESCAPES:
+                    i += 2
+                    continue
+                self.skip(self.source[pos:i + 1])
+                self.raiseLex("Bad string escape character")
+            elif c == '\n':
+                self.skip(self.source[pos:i])
+                self.raiseLex("End of line encountered within string")
+            elif c == '\t':
+                self.skip(self.source[pos:i])
+                self.raiseLex("Tab encountered within string")
+            i += 1
+        self.skip(self.source[pos:i])
+        self.raiseLex("EOF encountered within string")
 
     #
     # TOKENIZER
@@ -328,25 +286,35 @@ class TokenStream:
     # the source text into a list of token strings.
 
     def analyze(self):
-        while self.source != '':
-            # CHOMP a string literal
-            if self.source[0] == '"':
-                self.chompString()
-            # CHOMP a comment
-            elif self.source[0:2] == '(*':
-                self.chompComment()
-            # CHOMP whitespace
-            elif self.source[0] in ' \t\n\r':
-                self.chompWhitespace()
-            # CHOMP an integer literal
-            elif self.source[0].isdigit():
-                self.chompInt()
-            # CHOMP a single "delimiter" character
-            elif self.source[0] in DELIMITERS:
-                self.issue(self.chompChar())
-            # CHOMP an operator
-            elif self.source[0] in OPERATORS:
-                self.chompOperator()
-            # CHOMP a reserved word or a name.
+        source = self.source
+        scan = _LEXEME.match
+        pos = 0
+        end = len(source)
+        while pos < end:
+            m = scan(source, pos)
+            if m is None:
+                self.raiseLex(f"Unrecognized character {source[pos]!r}.")
+
+            kind = m.lastgroup
+            text = m.group()
+            # SCAN whitespace
+            if kind == 'newline':
+                self.line += 1
+                self.column = 1
+            elif kind == 'space' or kind == 'comment':
+                self.skip(text)
+            # SCAN a string literal
+            elif kind == 'string':
+                self.issue('"' + _STRING_ESCAPE.sub(lambda e: _STRING_ESCAPES[e.group(1)], text[1:-1]) + '"')
+                self.skip(text)
+            # SCAN a malformed comment or string literal
+            elif kind == 'open_comment':
+                self.skip(source[pos:])
+                self.raiseLex("EOF encountered within comment")
+            elif kind == 'open_string':
+                self.raiseString(pos)
+            # SCAN an integer literal, delimiter, operator, reserved word or a name.
             else:
-                self.chompWord()
+                self.issue(text)
+                self.column += len(text)
+            pos = m.end()
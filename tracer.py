@@ -0,0 +1,186 @@
+# CSCI 384 streaming reduction traces for Lambda Calculus
+
+"""
+A reduction trace is written out one step at a time as it is made, never
+collected, so tracing takes the same memory however long the reduction
+runs. Trace keeps no more than the last term it wrote, for the deltas,
+and a trace file holds the traces of every reduction run, each headed by
+a `# <title>` line.
+
+Trace lines are the terms as the verbose mode prints them. Sampling every
+k-th step prefixes each line with its step number, `<step>: <term>`. In
+delta mode every line but the first says how a term differs from the one
+written before it, `<step> <p> <s> <middle>`: the term is the first p
+characters of the previous one, then middle, then its last s characters.
+
+SMLStream reads the trace of an sml run line by line while sml prints it,
+and keeps the lines of the result for when the trace is done.
+"""
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import threading
+from typing import IO, Iterator, List, Optional, Union
+
+from budget import LimitExceeded
+
+
+class Trace:
+    """ Trace class
+    Where and which steps of a reduction are written
+    """
+
+    __slots__ = ['_out', '_owned', '_every', '_delta', '_last']
+
+    def __init__(self, path: Optional[Union[str, os.PathLike, IO]] = None, every: int = 1,
+                 delta: bool = False) -> None:
+        """ init trace
+
+        :param path: file the trace is written to, or a stream it is written to and left open, stdout by default
+        :param every: write every k-th step only
+        :param delta: write the differences between the terms of the steps written
+        """
+        self._owned = isinstance(path, (str, os.PathLike))
+        self._out: IO = open(path, 'w') if self._owned else path if path is not None else sys.stdout
+        self._every = max(every, 1)
+        self._delta = delta
+        self._last: Optional[str] = None
+
+    def begin(self, title: str) -> None:
+        """ start the trace of another reduction, headed by a `# <title>` line in a trace file
+
+        :param title: what is reduced
+        :return: None
+        """
+        self._last = None
+        if self._owned:
+            self._out.write(f'# {title}\n')
+
+    def wants(self, step: int) -> bool:
+        """ if a step is written, so its term is only formatted when needed
+
+        :param step: the step number, from 1
+        :return: if the step is written
+        """
+        return (step - 1) % self._every == 0
+
+    def write(self, step: int, text: str) -> None:
+        """ write the term of a step
+
+        :param step: the step number, from 1
+        :param text: the term
+        :return: None
+        """
+        last = self._last
+        if self._delta and last is not None:
+            end = min(len(last), len(text))
+            p = 0
+            while p < end and last[p] == text[p]:
+                p += 1
+            s = 0
+            while s < end - p and last[-1 - s] == text[-1 - s]:
+                s += 1
+            self._out.write(f'{step} {p} {s} {text[p:len(text) - s]}\n')
+        elif self._every > 1 or self._delta:
+            self._out.write(f'{step}: {text}\n')
+        else:
+            self._out.write(text + '\n')
+        if self._delta:
+            self._last = text
+
+    def close(self) -> None:
+        """ flush the trace, closing its file """
+        if self._owned:
+            self._out.close()
+        else:
+            self._out.flush()
+
+    def __enter__(self) -> Trace:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class SMLStream:
+    """ SMLStream class
+    One sml run, its output read while it is printed. Iterating over the
+    stream gives the lines printed by the reduction, the trace; after that
+    `result` holds the lines sml printed for the main clause.
+    """
+
+    __slots__ = ['_process', '_timer', '_timed_out', 'result']
+
+    def __init__(self, sml_bin: str, sml_src: str, timeout: Optional[float] = None) -> None:
+        """ start sml on the code
+
+        :param sml_bin: path to sml/nj or sosml
+        :param sml_src: the interpreter code followed by the program in the sml exec stream format
+        :param timeout: seconds before sml is killed, None to wait forever
+        """
+        self._process = subprocess.Popen([sml_bin], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        threading.Thread(target=self._feed, args=(sml_src,), daemon=True).start()
+        self._timed_out = False
+        self._timer = None
+        if timeout is not None:
+            self._timer = threading.Timer(timeout, self._kill)
+            self._timer.start()
+        self.result: Optional[str] = None
+
+    def _feed(self, sml_src: str) -> None:
+        """ write the code to sml, while its output is read """
+        try:
+            self._process.stdin.write(sml_src)
+            self._process.stdin.close()
+        except OSError:
+            pass
+
+    def _kill(self) -> None:
+        self._timed_out = True
+        self._process.kill()
+
+    def __iter__(self) -> Iterator[str]:
+        """ the lines printed by the reduction, as sml prints them
+
+        :return: trace lines, without their line ends
+        :raise LimitExceeded: if sml is killed for the timeout, with the last trace line as the term
+        """
+        state = 'load'
+        steps = 0
+        last = None
+        result: List[str] = []
+        try:
+            for line in self._process.stdout:
+                line = line.rstrip('\n')
+                if not line:
+                    continue
+                if state == 'load':
+                    if line.startswith('val start_'):
+                        state = 'trace'
+                elif state == 'trace':
+                    if line.startswith('val main_'):
+                        state = 'result'
+                        result.append(line)
+                    else:
+                        steps += 1
+                        last = line
+                        yield line
+                elif state == 'result':
+                    if line.startswith('val end_'):
+                        state = 'done'
+                    else:
+                        result.append(line)
+            self._process.wait()
+        finally:
+            if self._timer is not None:
+                self._timer.cancel()
+            if self._process.poll() is None:
+                self._process.kill()
+                self._process.wait()
+
+        if self._timed_out:
+            raise LimitExceeded('timeout', max(steps - 1, 0) if last is not None else None, last)
+        if state == 'done':
+            self.result = '\n'.join(result)